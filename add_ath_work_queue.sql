@@ -0,0 +1,15 @@
+-- Work queue for parallel-ath-processor.py
+-- Workers claim batches with FOR UPDATE SKIP LOCKED and hold a lease;
+-- rows of crashed or failed workers become claimable again once it expires
+
+CREATE TABLE IF NOT EXISTS ath_work_queue (
+    call_id TEXT PRIMARY KEY,                       -- crypto_calls.id
+    call_created_at TIMESTAMPTZ,                    -- process oldest calls first
+    lease_until TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+    leased_by TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+
+-- Claim scans only this index for claimable rows in call order
+CREATE INDEX IF NOT EXISTS idx_ath_work_queue_claim
+ON ath_work_queue(lease_until, call_created_at);
@@ -0,0 +1,50 @@
+-- Multi-row update functions for bulk_writer.BulkWriter
+-- Called through supabase.rpc() by scripts that don't use the Management API
+
+-- refresh-prices-parallel.py: updates is a JSON array of
+-- {krom_id, current_price, price_updated_at, roi_percent}; a null roi_percent keeps the old value
+CREATE OR REPLACE FUNCTION bulk_update_prices(updates JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE crypto_calls AS t
+        SET current_price = v.current_price,
+            price_updated_at = v.price_updated_at,
+            roi_percent = COALESCE(v.roi_percent, t.roi_percent)
+        FROM jsonb_populate_recordset(NULL::crypto_calls, updates) AS v
+        WHERE t.krom_id = v.krom_id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- token_enrichment.py: updates is a JSON array of crypto_calls rows keyed by id
+-- (price, ROI, liquidity, volume, supply, market cap and social columns);
+-- a null or missing field keeps the old value
+CREATE OR REPLACE FUNCTION bulk_enrich_tokens(updates JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE crypto_calls AS t
+        SET current_price = COALESCE(v.current_price, t.current_price),
+            price_updated_at = COALESCE(v.price_updated_at, t.price_updated_at),
+            roi_percent = COALESCE(v.roi_percent, t.roi_percent),
+            liquidity_usd = COALESCE(v.liquidity_usd, t.liquidity_usd),
+            volume_24h = COALESCE(v.volume_24h, t.volume_24h),
+            total_supply = COALESCE(v.total_supply, t.total_supply),
+            circulating_supply = COALESCE(v.circulating_supply, t.circulating_supply),
+            current_market_cap = COALESCE(v.current_market_cap, t.current_market_cap),
+            supply_updated_at = COALESCE(v.supply_updated_at, t.supply_updated_at),
+            website_url = COALESCE(v.website_url, t.website_url),
+            twitter_url = COALESCE(v.twitter_url, t.twitter_url),
+            telegram_url = COALESCE(v.telegram_url, t.telegram_url),
+            discord_url = COALESCE(v.discord_url, t.discord_url),
+            socials_fetched_at = COALESCE(v.socials_fetched_at, t.socials_fetched_at)
+        FROM jsonb_populate_recordset(NULL::crypto_calls, updates) AS v
+        WHERE t.id = v.id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
@@ -0,0 +1,22 @@
+-- Row change timestamp for incremental backups (table_backup.py)
+-- Every UPDATE sets updated_at, so a backup can export only the rows
+-- changed since the previous one started
+
+ALTER TABLE crypto_calls ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS crypto_calls_set_updated_at ON crypto_calls;
+CREATE TRIGGER crypto_calls_set_updated_at
+BEFORE UPDATE ON crypto_calls
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_crypto_calls_updated_at ON crypto_calls(updated_at);
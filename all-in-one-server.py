@@ -8,6 +8,7 @@ from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
 import json
 import os
+import time
 from datetime import datetime
 import requests
 from dotenv import load_dotenv
@@ -15,8 +16,16 @@ import anthropic
 import re
 from typing import Dict, Any, List, Optional
 import sqlite3
-import threading
 import logging
+import threading
+from krom_db import read_connection, write_connection
+from krom_rollups import rollup_source
+from krom_pagination import SORT_COLUMNS as PAGINATION_SORT_COLUMNS, cached_total, fetch_page
+from krom_search import search_tokens
+from krom_query_cache import MAX_QUERY_ROWS, result_cache, run_query
+import analysis_workers
+import dexscreener_signals
+from conversation_store import ConversationStore, LRUDict
 
 # Load environment variables
 load_dotenv()
@@ -25,17 +34,16 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database lock for thread safety
-db_lock = threading.Lock()
-
 app = Flask(__name__)
 CORS(app)
 
-# In-memory conversation history (in production, use a database)
-conversation_history = {}
+# Conversation history: LRU in memory, trimmed per session, persisted to SQLite
+conversation_store = ConversationStore()
 
-# Session-based dynamic tools (created on-the-fly)
-dynamic_tools = {}
+# Session-based dynamic tools (created on-the-fly), least recently used dropped first.
+# Reads reorder the LRU, so every access goes through the lock
+dynamic_tools = LRUDict(maxsize=100)
+dynamic_tools_lock = threading.Lock()
 
 # System prompt template (capability-focused)
 system_prompt_template = """You are KROM Crypto Assistant, an AI with sophisticated analytical capabilities.
@@ -212,7 +220,7 @@ AVAILABLE_TOOLS = {
     "download_krom_calls": {
         "description": "Download KROM calls from API and store in local SQLite database",
         "parameters": {
-            "limit": {"type": "integer", "description": "Number of calls to download (max: 10000)", "default": 1000}
+            "limit": {"type": "integer", "description": "Number of most recent calls to download, fetched in pages (use 100000 for a full resync)", "default": 1000}
         },
         "required": []
     },
@@ -1037,7 +1045,8 @@ def create_tool(tool_name: str, description: str, base_url: str, endpoint: str,
             tool_def["test_result"] = test_result
         
         # Store the dynamic tool (session-based)
-        dynamic_tools[tool_name] = tool_def
+        with dynamic_tools_lock:
+            dynamic_tools[tool_name] = tool_def
         
         return {
             "success": True,
@@ -1051,10 +1060,11 @@ def create_tool(tool_name: str, description: str, base_url: str, endpoint: str,
 
 def call_dynamic_tool(tool_name: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
     """Execute a dynamically created tool"""
-    if tool_name not in dynamic_tools:
+    with dynamic_tools_lock:
+        tool_def = dynamic_tools[tool_name] if tool_name in dynamic_tools else None
+    if tool_def is None:
         return {"success": False, "error": f"Dynamic tool '{tool_name}' not found"}
     
-    tool_def = dynamic_tools[tool_name]
     params = params or {}
     
     # Check required parameters
@@ -1453,117 +1463,132 @@ def solscan_api_call(endpoint: str, token: Optional[str] = None, account: Option
         return {"success": False, "error": f"Solscan API call failed: {str(e)}"}
 
 # Database functions
+# Calls requested from the KROM API per page while downloading
+KROM_PAGE_SIZE = 500
+
+CALL_COLUMNS = [
+    'id', 'ticker', 'name', 'contract', 'network', 'market_cap',
+    'buy_price', 'top_price', 'current_price', 'roi', 'profit_percent',
+    'status', 'call_timestamp', 'message', 'image_url'
+]
+
+def upsert_krom_calls(cursor, calls: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Upsert one page of formatted KROM calls with executemany
+    
+    Existing calls get their price/ROI fields refreshed, new calls are
+    inserted, and each group seen in the new calls is written once.
+    """
+    valid = [call for call in calls if isinstance(call, dict) and call.get('id')]
+    if len(valid) < len(calls):
+        logger.warning(f"Skipping {len(calls) - len(valid)} malformed calls")
+    if not valid:
+        return {"new_calls": 0, "updated_calls": 0}
+    
+    ids = [call['id'] for call in valid]
+    placeholders = ','.join('?' for _ in ids)
+    cursor.execute(f"SELECT id FROM calls WHERE id IN ({placeholders})", ids)
+    existing = {row[0] for row in cursor.fetchall()}
+    
+    cursor.executemany(f'''
+        INSERT INTO calls ({', '.join(CALL_COLUMNS)})
+        VALUES ({', '.join('?' for _ in CALL_COLUMNS)})
+        ON CONFLICT(id) DO UPDATE SET
+            current_price = excluded.current_price,
+            roi = excluded.roi,
+            profit_percent = excluded.profit_percent,
+            status = excluded.status,
+            updated_at = CURRENT_TIMESTAMP
+    ''', [tuple(call[column] for column in CALL_COLUMNS) for call in valid])
+    
+    # One row per group; calls arrive newest first so keep the first stats seen
+    groups = {}
+    for call in valid:
+        group_data = call.get('group', {})
+        if call['id'] not in existing and group_data.get('name') and group_data['name'] not in groups:
+            groups[group_data['name']] = (
+                group_data['name'], group_data.get('win_rate_30d', 0),
+                group_data.get('profit_30d', 0), group_data.get('total_calls', 0),
+                group_data.get('call_frequency', 0)
+            )
+    if groups:
+        cursor.executemany('''
+            INSERT OR REPLACE INTO groups (
+                name, win_rate_30d, profit_30d, total_calls, call_frequency
+            ) VALUES (?, ?, ?, ?, ?)
+        ''', list(groups.values()))
+    
+    new_calls = sum(1 for call_id in set(ids) if call_id not in existing)
+    return {"new_calls": new_calls, "updated_calls": len(valid) - new_calls}
+
 def download_krom_calls(limit: int = 1000) -> Dict[str, Any]:
-    """Download KROM calls and store in SQLite database"""
+    """Download KROM calls and store in SQLite database
+    
+    Streams the KROM API newest-first, KROM_PAGE_SIZE calls at a time, and
+    upserts each page in its own transaction so only one page is held in
+    memory and an interrupted resync keeps what it already stored.
+    """
     try:
         # Ensure database exists
         if not os.path.exists('krom_calls.db'):
             return {"success": False, "error": "Database not found. Run setup-krom-database.py first."}
         
-        # Fetch calls from API
-        krom_result = get_krom_calls(min(limit, 10000))
-        if not krom_result.get("success"):
-            return krom_result
-        
-        # Extract calls from the nested structure
-        data = krom_result.get("data", {})
-        calls_data = data.get("calls", []) if isinstance(data, dict) else data
-        
-        # Debug logging
-        print(f"DEBUG: data type: {type(data)}")
-        print(f"DEBUG: data keys: {data.keys() if isinstance(data, dict) else 'Not a dict'}")
-        print(f"DEBUG: calls_data type: {type(calls_data)}")
-        if calls_data and len(calls_data) > 0:
-            print(f"DEBUG: First call type: {type(calls_data[0])}")
-            print(f"DEBUG: First call keys: {calls_data[0].keys() if isinstance(calls_data[0], dict) else 'Not a dict'}")
-        
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
-            cursor = conn.cursor()
-            
-            inserted_count = 0
-            updated_count = 0
-            
-            for i, call in enumerate(calls_data):
-                try:
-                    # Validate call structure
-                    if not isinstance(call, dict):
-                        print(f"DEBUG: Call {i} is not a dict: {type(call)} - {call}")
-                        continue
-                    
-                    call_id = call.get('id')
-                    if not call_id:
-                        print(f"DEBUG: Call {i} missing 'id' field. Keys: {call.keys()}")
-                        continue
-                    
-                    # Check if call already exists
-                    cursor.execute("SELECT id FROM calls WHERE id = ?", (call_id,))
-                    exists = cursor.fetchone()
-                except Exception as e:
-                    print(f"DEBUG: Error processing call {i}: {e}")
-                    print(f"DEBUG: call type: {type(call)}")
-                    print(f"DEBUG: call keys: {call.keys() if isinstance(call, dict) else 'Not a dict'}")
-                    if isinstance(call, dict) and 'id' in call:
-                        print(f"DEBUG: call id: {call['id']}")
-                    raise
+        total_processed = 0
+        inserted_count = 0
+        updated_count = 0
+        before_timestamp = None
+        seen_ids = set()
+        error = None
+        
+        while total_processed < limit:
+            krom_result = get_krom_calls(KROM_PAGE_SIZE, before_timestamp)
+            if not krom_result.get("success"):
+                if total_processed == 0:
+                    return krom_result
+                error = krom_result.get("error")
+                break
+            
+            # Extract calls from the nested structure
+            data = krom_result.get("data", {})
+            calls_data = data.get("calls", []) if isinstance(data, dict) else data
+            if not calls_data:
+                break
+            
+            # Pages overlap by one second (see below); keep only calls not seen yet
+            new_calls = [call for call in calls_data
+                         if isinstance(call, dict) and call.get('id') and call['id'] not in seen_ids]
+            new_calls = new_calls[:limit - total_processed]
+            if new_calls:
+                seen_ids.update(call['id'] for call in new_calls)
                 
-                if exists:
-                    # Update existing call
-                    cursor.execute('''
-                        UPDATE calls SET 
-                            current_price = ?, roi = ?, profit_percent = ?, 
-                            status = ?, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (
-                        call['current_price'], call['roi'], call['profit_percent'],
-                        call['status'], call['id']
-                    ))
-                    updated_count += 1
-                else:
-                    # Insert new call
-                    cursor.execute('''
-                        INSERT INTO calls (
-                            id, ticker, name, contract, network, market_cap,
-                            buy_price, top_price, current_price, roi, profit_percent,
-                            status, call_timestamp, message, image_url
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        call['id'], call['ticker'], call['name'], call['contract'],
-                        call['network'], call['market_cap'], call['buy_price'],
-                        call['top_price'], call['current_price'], call['roi'],
-                        call['profit_percent'], call['status'], call['call_timestamp'],
-                        call['message'], call['image_url']
-                    ))
-                    inserted_count += 1
-                    
-                    # Handle group data
-                    group_data = call.get('group', {})
-                    if group_data.get('name'):
-                        # Insert or update group
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO groups (
-                                name, win_rate_30d, profit_30d, total_calls, call_frequency
-                            ) VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            group_data['name'], group_data.get('win_rate_30d', 0),
-                            group_data.get('profit_30d', 0), group_data.get('total_calls', 0),
-                            group_data.get('call_frequency', 0)
-                        ))
-                        
-                        # Group is already stored in the calls table, no need for separate linking
-            
-            conn.commit()
-            conn.close()
-            
-        return {
+                with write_connection() as conn:
+                    counts = upsert_krom_calls(conn.cursor(), new_calls)
+                
+                total_processed += len(new_calls)
+                inserted_count += counts["new_calls"]
+                updated_count += counts["updated_calls"]
+            
+            timestamps = [call.get('call_timestamp') for call in calls_data if isinstance(call, dict) and call.get('call_timestamp')]
+            oldest = min(timestamps) if timestamps else None
+            if len(calls_data) < KROM_PAGE_SIZE or oldest is None:
+                break
+            # Next page: everything up to and including the oldest second on
+            # this one, so calls sharing that second that didn't fit aren't
+            # skipped. A full page with nothing new is all re-read calls from
+            # that second, so move strictly before it instead.
+            before_timestamp = int(oldest) + 1 if new_calls else int(oldest)
+        
+        result = {
             "success": True,
             "data": {
-                "total_processed": len(calls_data),
+                "total_processed": total_processed,
                 "new_calls": inserted_count,
                 "updated_calls": updated_count,
-                "message": f"Successfully downloaded {len(calls_data)} calls"
+                "message": f"Successfully downloaded {total_processed} calls"
             }
         }
+        if error:
+            result["data"]["message"] += f" (stopped early: {error})"
+        return result
         
     except Exception as e:
         return {"success": False, "error": f"Database operation failed: {str(e)}"}
@@ -1581,30 +1606,19 @@ def query_krom_database(query: str, params: List = None) -> Dict[str, Any]:
             if keyword in query_upper and not query_upper.startswith('SELECT'):
                 return {"success": False, "error": f"Query contains forbidden keyword: {keyword}"}
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            columns = [description[0] for description in cursor.description] if cursor.description else []
-            rows = cursor.fetchall()
-            conn.close()
-            
-            # Convert rows to dictionaries
-            results = [dict(row) for row in rows]
-            
+        # Cached per data version; row cap and time budget enforced by run_query
+        result = run_query(query, params)
+        data = {
+            "columns": result['columns'],
+            "rows": result['rows'],
+            "count": len(result['rows'])
+        }
+        if result['truncated']:
+            data["truncated"] = True
+            data["message"] = f"Result truncated to {MAX_QUERY_ROWS} rows; aggregate in SQL or add a LIMIT"
         return {
             "success": True,
-            "data": {
-                "columns": columns,
-                "rows": results,
-                "count": len(results)
-            }
+            "data": data
         }
         
     except Exception as e:
@@ -1616,9 +1630,7 @@ def analyze_krom_stats(analysis_type: str, timeframe: str = "all", group_name: s
         if not os.path.exists('krom_calls.db'):
             return {"success": False, "error": "Database not found. Run download_krom_calls first."}
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
-            conn.row_factory = sqlite3.Row
+        with read_connection(row_factory=sqlite3.Row) as conn:
             cursor = conn.cursor()
             
             # Build timeframe filter
@@ -1738,22 +1750,20 @@ def analyze_krom_stats(analysis_type: str, timeframe: str = "all", group_name: s
             else:
                 return {"success": False, "error": f"Unknown analysis type: {analysis_type}"}
             
-            conn.close()
-            
     except Exception as e:
         return {"success": False, "error": f"Analysis failed: {str(e)}"}
 
 def create_chart(query: str, chart_type: str = "bar", title: str = "Chart") -> Dict[str, Any]:
     """Simpler chart creation tool that just runs SQL and returns visualization"""
     try:
-        conn = get_db_connection()
-        df = pd.read_sql(query, conn)
+        data = run_query(query)
+        columns = data['columns']
         
         # Assume first column is labels, second is values
-        if len(df.columns) >= 2:
+        if len(columns) >= 2:
             result = {
-                'labels': df.iloc[:, 0].tolist(),
-                'values': df.iloc[:, 1].tolist()
+                'labels': [row[columns[0]] for row in data['rows']],
+                'values': [row[columns[1]] for row in data['rows']]
             }
             
             return {
@@ -1777,12 +1787,6 @@ def execute_analysis(code: str, visualization_type: str = "chart", title: str =
     logger.info(f"Title: {title}")
     logger.debug(f"Code to execute:\n{code[:500]}...")
     
-    import pandas as pd
-    import numpy as np
-    from io import StringIO
-    import sys
-    import ast
-    
     # Security check - basic validation
     forbidden_imports = ['os', 'subprocess', 'eval', 'exec', '__import__', 'open', 'file', 'input', 'raw_input']
     code_lower = code.lower()
@@ -1790,114 +1794,55 @@ def execute_analysis(code: str, visualization_type: str = "chart", title: str =
         if forbidden in code_lower:
             return {"success": False, "error": f"Forbidden operation: {forbidden}"}
     
-    # Create sandboxed environment
-    sandbox_globals = {
-        'pd': pd,
-        'np': np,
-        'get_db_connection': get_db_connection,
-        # Don't include datetime directly to avoid os module issues
-        # 'datetime': datetime,
-        'json': json,
-        'sqlite3': sqlite3,
-        '__builtins__': {
-            'print': print,
-            'len': len,
-            'range': range,
-            'enumerate': enumerate,
-            'zip': zip,
-            'map': map,
-            'filter': filter,
-            'sum': sum,
-            'min': min,
-            'max': max,
-            'abs': abs,
-            'round': round,
-            'sorted': sorted,
-            'list': list,
-            'dict': dict,
-            'set': set,
-            'tuple': tuple,
-            'str': str,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'type': type,
-            'isinstance': isinstance,
-            'hasattr': hasattr,
-            'getattr': getattr,
-            'any': any,
-            'all': all,
-        }
-    }
-    
-    # Capture output
-    old_stdout = sys.stdout
-    sys.stdout = StringIO()
-    
-    try:
-        # Execute the code
-        exec(code, sandbox_globals)
-        output = sys.stdout.getvalue()
-        
-        # Check if result variable exists
-        if 'result' in sandbox_globals:
-            result = sandbox_globals['result']
-            
-            # Log result info
-            if isinstance(result, pd.DataFrame):
-                logger.info(f"Result is DataFrame: {len(result)} rows, {len(result.columns)} columns")
-                result = {
-                    'columns': result.columns.tolist(),
-                    'data': result.to_dict('records'),
-                    'index': result.index.tolist()
-                }
-            elif isinstance(result, dict):
-                logger.info(f"Result is dict with {len(result)} keys")
-            elif isinstance(result, list):
-                logger.info(f"Result is list with {len(result)} items")
-            else:
-                logger.info(f"Result type: {type(result)}")
-            
-            logger.info(f"Successfully executed analysis, returning visualization data")
-            return {
-                "success": True,
-                "data": result,
-                "output": output,
-                "visualization": {
-                    "type": visualization_type,
-                    "title": title,
-                    "data": result
-                }
-            }
-        else:
-            return {
-                "success": True,
-                "output": output,
-                "message": "Code executed successfully. Set 'result' variable to return data."
-            }
+    # Identical code against unchanged data returns the cached result
+    return result_cache.get_or_compute(
+        ('analysis', code, visualization_type, title),
+        lambda: run_analysis_code(code, visualization_type, title),
+        cacheable=lambda response: response.get("success", False)
+    )
+
+def run_analysis_code(code: str, visualization_type: str, title: str) -> Dict[str, Any]:
+    """Run validated analysis code on the worker pool and package its result"""
+    job = analysis_workers.run_analysis(code)
+    output = job.get('output', '')
     
-    except Exception as e:
-        output = sys.stdout.getvalue()
-        error_detail = f"{type(e).__name__}: {str(e)}"
-        
-        # Add line number if available
-        import traceback
-        tb = traceback.format_exc()
-        if "line" in tb:
-            lines = tb.split('\n')
-            for line in lines:
-                if "line" in line and "<string>" in line:
-                    error_detail += f"\n{line.strip()}"
-                    break
-        
+    if 'error' in job:
+        error_detail = job['error']
         if output:
             error_detail += f"\n\nPython output:\n{output}"
         
         logger.error(f"Execute analysis error: {error_detail}")
         return {"success": False, "error": error_detail, "output": output}
     
-    finally:
-        sys.stdout = old_stdout
+    # Check if result variable exists
+    if 'result' in job:
+        result = job['result']
+        
+        # Log result info
+        if isinstance(result, dict):
+            logger.info(f"Result is dict with {len(result)} keys")
+        elif isinstance(result, list):
+            logger.info(f"Result is list with {len(result)} items")
+        else:
+            logger.info(f"Result type: {type(result)}")
+        
+        logger.info(f"Successfully executed analysis, returning visualization data")
+        return {
+            "success": True,
+            "data": result,
+            "output": output,
+            "visualization": {
+                "type": visualization_type,
+                "title": title,
+                "data": result
+            }
+        }
+    else:
+        return {
+            "success": True,
+            "output": output,
+            "message": "Code executed successfully. Set 'result' variable to return data."
+        }
 
 # Execute tool function
 def execute_tool(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -1934,6 +1879,7 @@ def execute_tool(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
     
     # Check dynamic tools
     elif tool_name in dynamic_tools:
+        # call_dynamic_tool re-checks under the lock in case it was just evicted
         return call_dynamic_tool(tool_name, params)
     
     else:
@@ -1952,9 +1898,11 @@ def create_tool_descriptions() -> str:
         descriptions.append(f"- {tool_name}({params_str}): {tool_info['description']}")
     
     # Dynamic tools (session-specific)
-    if dynamic_tools:
+    with dynamic_tools_lock:
+        session_tools = list(dynamic_tools.items())
+    if session_tools:
         descriptions.append("\n## Dynamic Tools (Created This Session)")
-        for tool_name, tool_def in dynamic_tools.items():
+        for tool_name, tool_def in session_tools:
             required_str = ", ".join(tool_def['required_params']) if tool_def['required_params'] else "none"
             optional_str = ", ".join(tool_def['optional_params']) if tool_def['optional_params'] else "none"
             descriptions.append(f"- {tool_name}(required: {required_str}, optional: {optional_str}): {tool_def['description']}")
@@ -2211,21 +2159,9 @@ Once configured, I'll be able to use all available crypto analysis tools intelli
     try:
         client = anthropic.Anthropic(api_key=anthropic_key)
         
-        # Get or create conversation history
-        if session_id not in conversation_history:
-            conversation_history[session_id] = []
-        
-        # Aggressively limit conversation history to prevent token overflow
-        # Keep only last 4 messages (2 exchanges)
-        if len(conversation_history[session_id]) > 4:
-            logger.info(f"Trimming conversation history from {len(conversation_history[session_id])} to 4 messages")
-            conversation_history[session_id] = conversation_history[session_id][-4:]
-        
-        # Also truncate very long messages (e.g., large tool results)
-        for i, msg in enumerate(conversation_history[session_id]):
-            if len(msg['content']) > 10000:  # ~2500 tokens
-                logger.warning(f"Truncating message {i} from {len(msg['content'])} to 10000 chars")
-                conversation_history[session_id][i]['content'] = msg['content'][:10000] + "...[truncated]"
+        # Get or create conversation history; the store already trimmed it to
+        # the per-session budget (last 2 exchanges, long messages truncated)
+        history = conversation_store.get(session_id)
         
         # Use the system prompt template with tool descriptions
         tool_descriptions = create_tool_descriptions()
@@ -2289,14 +2225,14 @@ You can call multiple tools in a single response. Each tool call should be in it
 Remember: You have full autonomy to use these tools creatively to provide the best possible crypto analysis and insights."""
         
         # Add user message to history
-        conversation_history[session_id].append({
+        history.append({
             "role": "user",
             "content": user_message
         })
         
         
         # First pass - let Claude decide what tools to use
-        initial_messages = conversation_history[session_id].copy()
+        initial_messages = history.copy()
         
         # Debug: Check total message size
         total_chars = len(system_prompt) + sum(len(msg['content']) for msg in initial_messages)
@@ -2381,11 +2317,11 @@ Please explain these errors to the user clearly and suggest how to fix them. If
 Please answer the user's original question using this data. Be concise."""
             
             # Add tool results to conversation
-            conversation_history[session_id].append({
+            history.append({
                 "role": "assistant",
                 "content": response_text
             })
-            conversation_history[session_id].append({
+            history.append({
                 "role": "user", 
                 "content": enhanced_message
             })
@@ -2396,16 +2332,17 @@ Please answer the user's original question using this data. Be concise."""
                 max_tokens=2000,
                 temperature=0.7,
                 system=system_prompt + "\n\nIMPORTANT: The user has provided tool results. Use this data to answer the user's question CONCISELY. Do NOT call tools again - just use the provided data. Remember: Be brief unless asked for details.",
-                messages=conversation_history[session_id]
+                messages=history
             )
             
             final_text = final_response.content[0].text
             
             # Update conversation history with final response
-            conversation_history[session_id][-1] = {
+            history[-1] = {
                 "role": "assistant",
                 "content": final_text
             }
+            conversation_store.save(session_id, history)
             
             # Check for visualization data in tool results
             visualization = None
@@ -2440,10 +2377,11 @@ Please answer the user's original question using this data. Be concise."""
             return response_data
         else:
             # No tools were called, use the initial response
-            conversation_history[session_id].append({
+            history.append({
                 "role": "assistant",
                 "content": response_text
             })
+            conversation_store.save(session_id, history)
             
             return {
                 "response": response_text,
@@ -2500,68 +2438,65 @@ def get_visualization_data(viz_type):
             
         elif viz_type == 'roi_distribution':
             # Get ROI distribution data
-            conn = sqlite3.connect('krom_calls.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN roi < 0.5 THEN '0-0.5x'
-                        WHEN roi < 1 THEN '0.5-1x'
-                        WHEN roi < 2 THEN '1-2x'
-                        WHEN roi < 3 THEN '2-3x'
-                        WHEN roi < 5 THEN '3-5x'
-                        ELSE '5x+'
-                    END as roi_range,
-                    COUNT(*) as count
-                FROM calls
-                GROUP BY roi_range
-                ORDER BY 
-                    CASE roi_range
-                        WHEN '0-0.5x' THEN 1
-                        WHEN '0.5-1x' THEN 2
-                        WHEN '1-2x' THEN 3
-                        WHEN '2-3x' THEN 4
-                        WHEN '3-5x' THEN 5
-                        ELSE 6
-                    END
-            """)
-            data = [{'range': row[0], 'count': row[1]} for row in cursor.fetchall()]
-            conn.close()
+            with read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT 
+                        CASE 
+                            WHEN roi < 0.5 THEN '0-0.5x'
+                            WHEN roi < 1 THEN '0.5-1x'
+                            WHEN roi < 2 THEN '1-2x'
+                            WHEN roi < 3 THEN '2-3x'
+                            WHEN roi < 5 THEN '3-5x'
+                            ELSE '5x+'
+                        END as roi_range,
+                        COUNT(*) as count
+                    FROM calls
+                    GROUP BY roi_range
+                    ORDER BY 
+                        CASE roi_range
+                            WHEN '0-0.5x' THEN 1
+                            WHEN '0.5-1x' THEN 2
+                            WHEN '1-2x' THEN 3
+                            WHEN '2-3x' THEN 4
+                            WHEN '3-5x' THEN 5
+                            ELSE 6
+                        END
+                """)
+                data = [{'range': row[0], 'count': row[1]} for row in cursor.fetchall()]
             return jsonify({"success": True, "data": data})
             
         elif viz_type == 'daily_performance':
             # Get daily performance data
-            conn = sqlite3.connect('krom_calls.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    date(call_timestamp) as date,
-                    COUNT(*) as calls,
-                    COUNT(CASE WHEN status = 'profit' THEN 1 END) as wins,
-                    ROUND(AVG(roi), 2) as avg_roi
-                FROM calls
-                WHERE call_timestamp IS NOT NULL
-                GROUP BY date(call_timestamp)
-                ORDER BY date DESC
-                LIMIT 30
-            """)
-            data = [{'date': row[0], 'calls': row[1], 'wins': row[2], 'avg_roi': row[3]} 
-                   for row in cursor.fetchall()]
-            conn.close()
+            with read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT 
+                        date(call_timestamp) as date,
+                        COUNT(*) as calls,
+                        COUNT(CASE WHEN status = 'profit' THEN 1 END) as wins,
+                        ROUND(AVG(roi), 2) as avg_roi
+                    FROM calls
+                    WHERE call_timestamp IS NOT NULL
+                    GROUP BY date(call_timestamp)
+                    ORDER BY date DESC
+                    LIMIT 30
+                """)
+                data = [{'date': row[0], 'calls': row[1], 'wins': row[2], 'avg_roi': row[3]} 
+                       for row in cursor.fetchall()]
             return jsonify({"success": True, "data": data})
             
         elif viz_type == 'network_distribution':
             # Get network distribution
-            conn = sqlite3.connect('krom_calls.db')
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT network, COUNT(*) as count
-                FROM calls
-                GROUP BY network
-                ORDER BY count DESC
-            """)
-            data = [{'network': row[0], 'count': row[1]} for row in cursor.fetchall()]
-            conn.close()
+            with read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT network, COUNT(*) as count
+                    FROM calls
+                    GROUP BY network
+                    ORDER BY count DESC
+                """)
+                data = [{'network': row[0], 'count': row[1]} for row in cursor.fetchall()]
             return jsonify({"success": True, "data": data})
             
         elif viz_type == 'top_groups':
@@ -2577,12 +2512,17 @@ def get_visualization_data(viz_type):
 
 @app.route('/api/calls', methods=['GET'])
 def get_calls_paginated():
-    """Get paginated KROM calls from database"""
+    """Get paginated KROM calls from database
+    
+    Pass the returned pagination.next_cursor as ?cursor= to fetch the next
+    page with a keyset seek; ?page= still works for direct jumps.
+    """
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         sort_by = request.args.get('sort_by', 'call_timestamp')
         sort_order = request.args.get('sort_order', 'DESC')
+        after = request.args.get('cursor')
         
         # Validate inputs
         if page < 1:
@@ -2593,44 +2533,32 @@ def get_calls_paginated():
         offset = (page - 1) * per_page
         
         # Allowed sort columns
-        allowed_sorts = ['buy_timestamp', 'roi', 'symbol', 'network']
-        if sort_by not in allowed_sorts:
+        if sort_by not in PAGINATION_SORT_COLUMNS:
             sort_by = 'buy_timestamp'
         if sort_order not in ['ASC', 'DESC']:
             sort_order = 'DESC'
             
-        conn = sqlite3.connect('krom_calls.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Get total count
-        cursor.execute("SELECT COUNT(*) as total FROM calls")
-        total_count = cursor.fetchone()['total']
-        
-        # Get paginated data
-        query = f"""
-            SELECT *
-            FROM calls
-            ORDER BY {sort_by} {sort_order}
-            LIMIT ? OFFSET ?
-        """
-        cursor.execute(query, (per_page, offset))
-        
-        calls = []
-        for row in cursor.fetchall():
-            call = dict(row)
-            # Format timestamps
-            if call.get('buy_timestamp'):
-                try:
-                    from datetime import datetime
-                    # buy_timestamp is in milliseconds
-                    dt = datetime.fromtimestamp(call['buy_timestamp'] / 1000)
-                    call['formatted_date'] = dt.strftime('%Y-%m-%d %H:%M')
-                except:
-                    call['formatted_date'] = str(call['buy_timestamp'])
-            calls.append(call)
-            
-        conn.close()
+        with read_connection(row_factory=sqlite3.Row) as conn:
+            cursor = conn.cursor()
+        
+            # Total count is cached between writes
+            total_count = cached_total(cursor)
+        
+            # Get paginated data
+            rows, next_cursor = fetch_page(cursor, sort_by, sort_order, per_page, after=after, offset=offset)
+        
+            calls = []
+            for call in rows:
+                # Format timestamps
+                if call.get('buy_timestamp'):
+                    try:
+                        from datetime import datetime
+                        # buy_timestamp is in milliseconds
+                        dt = datetime.fromtimestamp(call['buy_timestamp'] / 1000)
+                        call['formatted_date'] = dt.strftime('%Y-%m-%d %H:%M')
+                    except:
+                        call['formatted_date'] = str(call['buy_timestamp'])
+                calls.append(call)
         
         total_pages = (total_count + per_page - 1) // per_page
         
@@ -2642,11 +2570,14 @@ def get_calls_paginated():
                 "per_page": per_page,
                 "total": total_count,
                 "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": next_cursor is not None,
+                "has_prev": page > 1,
+                "next_cursor": next_cursor
             }
         })
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -2679,59 +2610,57 @@ def dict_factory(cursor, row):
 def get_stats():
     """Get database statistics"""
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        # Basic stats
-        cursor.execute("SELECT COUNT(*) as total_calls FROM calls")
-        total_calls = cursor.fetchone()['total_calls']
-        
-        cursor.execute("SELECT COUNT(*) as calls_with_raw_data FROM calls WHERE raw_data IS NOT NULL")
-        calls_with_raw_data = cursor.fetchone()['calls_with_raw_data']
-        
-        cursor.execute("SELECT AVG(roi) as avg_roi FROM calls WHERE roi IS NOT NULL AND roi > 0")
-        avg_roi_result = cursor.fetchone()
-        avg_roi = avg_roi_result['avg_roi'] if avg_roi_result['avg_roi'] else 0
-        
-        cursor.execute("SELECT COUNT(*) as profitable_calls FROM calls WHERE roi > 1")
-        profitable_calls = cursor.fetchone()['profitable_calls']
-        
-        cursor.execute("SELECT COUNT(DISTINCT network) as networks FROM calls WHERE network IS NOT NULL")
-        networks = cursor.fetchone()['networks']
-        
-        cursor.execute("SELECT COUNT(DISTINCT group_name) as groups FROM calls WHERE group_name IS NOT NULL")
-        groups = cursor.fetchone()['groups']
-        
-        # ROI distribution
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN roi >= 2 THEN 'High (2x+)'
-                    WHEN roi >= 1.5 THEN 'Good (1.5-2x)'
-                    WHEN roi >= 1 THEN 'Profit (1-1.5x)'
-                    WHEN roi >= 0.5 THEN 'Loss (0.5-1x)'
-                    ELSE 'Major Loss (<0.5x)'
-                END as roi_range,
-                COUNT(*) as count
-            FROM calls 
-            WHERE roi IS NOT NULL 
-            GROUP BY roi_range
-        """)
-        roi_distribution = cursor.fetchall()
-        
-        # Network distribution  
-        cursor.execute("""
-            SELECT network, COUNT(*) as count 
-            FROM calls 
-            WHERE network IS NOT NULL 
-            GROUP BY network 
-            ORDER BY count DESC 
-            LIMIT 10
-        """)
-        network_distribution = cursor.fetchall()
-        
-        conn.close()
+        with read_connection(row_factory=dict_factory) as conn:
+            cursor = conn.cursor()
+        
+            # Basic stats
+            cursor.execute("SELECT COUNT(*) as total_calls FROM calls")
+            total_calls = cursor.fetchone()['total_calls']
+        
+            cursor.execute("SELECT COUNT(*) as calls_with_raw_data FROM calls WHERE raw_data IS NOT NULL")
+            calls_with_raw_data = cursor.fetchone()['calls_with_raw_data']
+        
+            cursor.execute("SELECT AVG(roi) as avg_roi FROM calls WHERE roi IS NOT NULL AND roi > 0")
+            avg_roi_result = cursor.fetchone()
+            avg_roi = avg_roi_result['avg_roi'] if avg_roi_result['avg_roi'] else 0
+        
+            cursor.execute("SELECT COUNT(*) as profitable_calls FROM calls WHERE roi > 1")
+            profitable_calls = cursor.fetchone()['profitable_calls']
+        
+            cursor.execute("SELECT COUNT(DISTINCT network) as networks FROM calls WHERE network IS NOT NULL")
+            networks = cursor.fetchone()['networks']
+        
+            cursor.execute("SELECT COUNT(DISTINCT group_name) as groups FROM calls WHERE group_name IS NOT NULL")
+            groups = cursor.fetchone()['groups']
+        
+            # ROI distribution
+            cursor.execute("""
+                SELECT 
+                    CASE 
+                        WHEN roi >= 2 THEN 'High (2x+)'
+                        WHEN roi >= 1.5 THEN 'Good (1.5-2x)'
+                        WHEN roi >= 1 THEN 'Profit (1-1.5x)'
+                        WHEN roi >= 0.5 THEN 'Loss (0.5-1x)'
+                        ELSE 'Major Loss (<0.5x)'
+                    END as roi_range,
+                    COUNT(*) as count
+                FROM calls 
+                WHERE roi IS NOT NULL 
+                GROUP BY roi_range
+            """)
+            roi_distribution = cursor.fetchall()
+        
+            # Network distribution  
+            cursor.execute("""
+                SELECT network, COUNT(*) as count 
+                FROM calls 
+                WHERE network IS NOT NULL 
+                GROUP BY network 
+                ORDER BY count DESC 
+                LIMIT 10
+            """)
+            network_distribution = cursor.fetchall()
+        
         
         return jsonify({
             'total_calls': total_calls,
@@ -2761,61 +2690,59 @@ def get_calls():
         
         offset = (page - 1) * per_page
         
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        # Log table structure
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        logger.info(f"Available tables: {[t['name'] for t in tables]}")
-        
-        # Build query with search
-        where_clause = ""
-        params = []
-        if search:
-            where_clause = """
-                WHERE token_symbol LIKE ? 
-                OR group_name LIKE ? 
-                OR text LIKE ?
-                OR contract_address LIKE ?
+        with read_connection(row_factory=dict_factory) as conn:
+            cursor = conn.cursor()
+        
+            # Log table structure
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = cursor.fetchall()
+            logger.info(f"Available tables: {[t['name'] for t in tables]}")
+        
+            # Build query with search
+            where_clause = ""
+            params = []
+            if search:
+                where_clause = """
+                    WHERE token_symbol LIKE ? 
+                    OR group_name LIKE ? 
+                    OR text LIKE ?
+                    OR contract_address LIKE ?
+                """
+                search_param = f'%{search}%'
+                params = [search_param, search_param, search_param, search_param]
+        
+            # Get total count
+            count_query = f"SELECT COUNT(*) as total FROM calls {where_clause}"
+            logger.info(f"Count query: {count_query}, params: {params}")
+            cursor.execute(count_query, params)
+            total_count = cursor.fetchone()['total']
+            logger.info(f"Total count: {total_count}")
+        
+            # Get paginated results
+            query = f"""
+                SELECT * FROM calls 
+                {where_clause}
+                ORDER BY buy_timestamp DESC 
+                LIMIT ? OFFSET ?
             """
-            search_param = f'%{search}%'
-            params = [search_param, search_param, search_param, search_param]
-        
-        # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM calls {where_clause}"
-        logger.info(f"Count query: {count_query}, params: {params}")
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()['total']
-        logger.info(f"Total count: {total_count}")
-        
-        # Get paginated results
-        query = f"""
-            SELECT * FROM calls 
-            {where_clause}
-            ORDER BY buy_timestamp DESC 
-            LIMIT ? OFFSET ?
-        """
-        params.extend([per_page, offset])
-        logger.info(f"Main query: {query}, params: {params}")
-        cursor.execute(query, params)
-        calls = cursor.fetchall()
-        logger.info(f"Retrieved {len(calls)} calls")
-        
-        # Process calls for display
-        for call in calls:
-            # Format timestamps
-            if call.get('buy_timestamp'):
-                call['buy_timestamp_formatted'] = datetime.fromtimestamp(
-                    call['buy_timestamp'] / 1000
-                ).strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Round ROI
-            if call.get('roi'):
-                call['roi'] = round(call['roi'], 2)
-        
-        conn.close()
+            params.extend([per_page, offset])
+            logger.info(f"Main query: {query}, params: {params}")
+            cursor.execute(query, params)
+            calls = cursor.fetchall()
+            logger.info(f"Retrieved {len(calls)} calls")
+        
+            # Process calls for display
+            for call in calls:
+                # Format timestamps
+                if call.get('buy_timestamp'):
+                    call['buy_timestamp_formatted'] = datetime.fromtimestamp(
+                        call['buy_timestamp'] / 1000
+                    ).strftime('%Y-%m-%d %H:%M:%S')
+            
+                # Round ROI
+                if call.get('roi'):
+                    call['roi'] = round(call['roi'], 2)
+        
         
         return jsonify({
             'calls': calls,
@@ -2836,14 +2763,12 @@ def get_calls():
 def get_call_raw_data(call_id):
     """Get raw data for a specific call"""
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
+        with read_connection(row_factory=dict_factory) as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("SELECT raw_data FROM calls WHERE id = ?", (call_id,))
-        result = cursor.fetchone()
+            cursor.execute("SELECT raw_data FROM calls WHERE id = ?", (call_id,))
+            result = cursor.fetchone()
         
-        conn.close()
         
         if result and result['raw_data']:
             raw_data = json.loads(result['raw_data'])
@@ -2862,27 +2787,25 @@ def get_call_raw_data(call_id):
 def get_groups():
     """Get group statistics"""
     try:
-        conn = get_db_connection()
-        conn.row_factory = dict_factory
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                group_name,
-                COUNT(*) as call_count,
-                AVG(roi) as avg_roi,
-                MAX(roi) as max_roi,
-                MIN(buy_timestamp) as first_call,
-                MAX(buy_timestamp) as last_call
-            FROM calls
-            WHERE group_name IS NOT NULL
-            GROUP BY group_name
-            ORDER BY call_count DESC
-            LIMIT 100
-        """)
-        groups = cursor.fetchall()
-        
-        conn.close()
+        with read_connection(row_factory=dict_factory) as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute("""
+                SELECT 
+                    group_name,
+                    COUNT(*) as call_count,
+                    AVG(roi) as avg_roi,
+                    MAX(roi) as max_roi,
+                    MIN(buy_timestamp) as first_call,
+                    MAX(buy_timestamp) as last_call
+                FROM calls
+                WHERE group_name IS NOT NULL
+                GROUP BY group_name
+                ORDER BY call_count DESC
+                LIMIT 100
+            """)
+            groups = cursor.fetchall()
+        
         
         return jsonify({'groups': groups})
         
@@ -3002,22 +2925,19 @@ def health_check():
 def get_stats_overview():
     """Get overview statistics for header"""
     try:
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             # Get total calls and win rate
             cursor.execute('''
                 SELECT 
-                    COUNT(*) as total_calls,
-                    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate,
+                    COALESCE(SUM(call_count), 0) as total_calls,
+                    SUM(wins) * 100.0 / SUM(call_count) as win_rate,
                     COUNT(DISTINCT group_name) as active_groups
-                FROM calls
-                WHERE roi IS NOT NULL
+                FROM call_rollups
             ''')
             
             result = cursor.fetchone()
-            conn.close()
             
             return jsonify({
                 'total_calls': result[0],
@@ -3037,50 +2957,46 @@ def get_key_metrics():
         min_roi = float(request.args.get('min_roi', '2'))
         
         # Calculate time filter
-        time_filter = ""
+        since = None
         if period == '24h':
-            time_filter = "AND buy_timestamp > strftime('%s', 'now', '-1 day')"
+            since = int(time.time()) - 86400
         elif period == '7d':
-            time_filter = "AND buy_timestamp > strftime('%s', 'now', '-7 days')"
+            since = int(time.time()) - 7 * 86400
         elif period == '30d':
-            time_filter = "AND buy_timestamp > strftime('%s', 'now', '-30 days')"
+            since = int(time.time()) - 30 * 86400
+        rollups, rollup_params = rollup_source(since)
         
         network_filter = "" if network == 'all' else f"AND network = '{network}'"
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             # Get total profit and moonshots
             cursor.execute(f'''
                 SELECT 
-                    AVG(roi) as total_profit,
-                    COUNT(CASE WHEN roi >= 10 THEN 1 END) as moonshot_count,
-                    COUNT(*) as total_calls,
-                    AVG(CASE WHEN top_timestamp > buy_timestamp 
-                        THEN (top_timestamp - buy_timestamp) / 60.0 
-                        ELSE NULL END) as avg_time_to_peak
-                FROM calls
-                WHERE roi IS NOT NULL {time_filter} {network_filter}
-            ''')
+                    SUM(roi_sum) / SUM(call_count) as total_profit,
+                    SUM(moonshots) as moonshot_count,
+                    COALESCE(SUM(call_count), 0) as total_calls,
+                    SUM(peak_minutes_sum) / SUM(peak_count) as avg_time_to_peak
+                FROM {rollups}
+                WHERE 1=1 {network_filter}
+            ''', rollup_params)
             
             metrics = cursor.fetchone()
             
             # Get best performing group
             cursor.execute(f'''
-                SELECT group_name, AVG(roi) as avg_roi
-                FROM calls
-                WHERE roi IS NOT NULL {time_filter} {network_filter}
+                SELECT group_name, SUM(roi_sum) / SUM(call_count) as avg_roi
+                FROM {rollups}
+                WHERE 1=1 {network_filter}
                 GROUP BY group_name
-                HAVING COUNT(*) >= 5
+                HAVING SUM(call_count) >= 5
                 ORDER BY avg_roi DESC
                 LIMIT 1
-            ''')
+            ''', rollup_params)
             
             best_group = cursor.fetchone()
             
-            conn.close()
-            
             return jsonify({
                 'total_profit': metrics[0] or 0,
                 'profit_change': 0,  # Coming soon
@@ -3097,6 +3013,64 @@ def get_key_metrics():
         logger.error(f"Error in key metrics: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# ROI bands used by the pump timeline, in CASE evaluation order
+PUMP_TIMELINE_BANDS = [
+    ('moonshot', 'roi >= 10'),
+    ('high', 'roi >= 5'),
+    ('medium', 'roi >= 2'),
+    ('low', 'roi < 2'),
+]
+
+def pump_timeline_buckets(cursor, time_points: List[int], filters: str, params: List) -> Dict[str, List[Optional[float]]]:
+    """Average ROI per band for calls that peaked within each time point.
+    
+    One scan of the calls table: every call is assigned to its ROI band and
+    to the first checkpoint its time-to-peak fits under, then the per-bucket
+    sums and counts are accumulated so checkpoint N covers buckets 0..N.
+    Returns None for checkpoints with no calls, like AVG() over zero rows.
+    """
+    band_case = "CASE " + " ".join(
+        f"WHEN {condition} THEN {index}" for index, (_, condition) in enumerate(PUMP_TIMELINE_BANDS)
+    ) + " END"
+    bucket_case = "CASE " + " ".join(
+        f"WHEN minutes_to_peak <= ? THEN {index}" for index in range(len(time_points))
+    ) + " END"
+    
+    cursor.execute(f'''
+        SELECT band, bucket, SUM(roi), COUNT(*)
+        FROM (
+            SELECT roi, {band_case} as band, {bucket_case} as bucket
+            FROM (
+                SELECT roi, (top_timestamp - buy_timestamp) / 60 as minutes_to_peak
+                FROM calls
+                WHERE top_timestamp > buy_timestamp
+                AND roi IS NOT NULL
+                {filters}
+            )
+        )
+        WHERE bucket IS NOT NULL
+        GROUP BY band, bucket
+    ''', list(time_points) + list(params))
+    
+    sums = [[0.0] * len(time_points) for _ in PUMP_TIMELINE_BANDS]
+    counts = [[0] * len(time_points) for _ in PUMP_TIMELINE_BANDS]
+    for band, bucket, roi_sum, count in cursor.fetchall():
+        sums[band][bucket] = roi_sum
+        counts[band][bucket] = count
+    
+    result = {}
+    for band, (name, _) in enumerate(PUMP_TIMELINE_BANDS):
+        data = []
+        running_sum = 0.0
+        running_count = 0
+        for bucket in range(len(time_points)):
+            running_sum += sums[band][bucket]
+            running_count += counts[band][bucket]
+            data.append(running_sum / running_count if running_count > 0 else None)
+        result[name] = data
+    
+    return result
+
 @app.route('/api/analysis/pump-timeline', methods=['GET'])
 def get_pump_timeline():
     """Get pump timeline analysis data"""
@@ -3133,8 +3107,7 @@ def get_pump_timeline():
         elif period == '180d':
             time_filter = "AND buy_timestamp > strftime('%s', 'now', '-180 days')"
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             # Time checkpoints in minutes - adjust based on timeframe
@@ -3159,118 +3132,36 @@ def get_pump_timeline():
                 time_points = [60, 120, 240, 480, 1440, 2880, 4320, 10080]
                 time_labels = ['1h', '2h', '4h', '8h', '1d', '2d', '3d', '7d']
             
+            params = list(group_list) if groups else []
+            band_data = pump_timeline_buckets(
+                cursor, time_points, f"{network_filter} {time_filter} {group_filter}", params
+            )
+            
             datasets = []
             
-            # Calculate average ROI for calls that peaked at or before each time point
+            # Average ROI for calls that peaked at or before each time point
             if filter_type in ['all', 'moonshots']:
-                moonshot_data = []
-                for minutes in time_points:
-                    query = f'''
-                        SELECT AVG(roi) as avg_roi, COUNT(*) as count
-                        FROM calls
-                        WHERE top_timestamp > buy_timestamp 
-                        AND (top_timestamp - buy_timestamp) / 60 <= ?
-                        AND roi >= 10
-                        {network_filter} {time_filter} {group_filter}
-                    '''
-                    params = [minutes]
-                    if groups:
-                        params.extend(group_list)
-                    cursor.execute(query, params)
-                    result = cursor.fetchone()
-                    # Only add data if we have enough samples
-                    if result[1] and result[1] > 0:
-                        moonshot_data.append(result[0])
-                    else:
-                        moonshot_data.append(None)
-                
                 datasets.append({
                     'label': '10x+ Calls',
-                    'data': moonshot_data
+                    'data': band_data['moonshot']
                 })
             
             if filter_type in ['all', 'winners']:
-                # 5-10x calls
-                high_data = []
-                for minutes in time_points:
-                    query = f'''
-                        SELECT AVG(roi) as avg_roi, COUNT(*) as count
-                        FROM calls
-                        WHERE top_timestamp > buy_timestamp 
-                        AND (top_timestamp - buy_timestamp) / 60 <= ?
-                        AND roi >= 5 AND roi < 10
-                        {network_filter} {time_filter} {group_filter}
-                    '''
-                    params = [minutes]
-                    if groups:
-                        params.extend(group_list)
-                    cursor.execute(query, params)
-                    result = cursor.fetchone()
-                    if result[1] and result[1] > 0:
-                        high_data.append(result[0])
-                    else:
-                        high_data.append(None)
-                
                 datasets.append({
                     'label': '5-10x Calls',
-                    'data': high_data
+                    'data': band_data['high']
                 })
-                
-                # 2-5x calls
-                medium_data = []
-                for minutes in time_points:
-                    query = f'''
-                        SELECT AVG(roi) as avg_roi, COUNT(*) as count
-                        FROM calls
-                        WHERE top_timestamp > buy_timestamp 
-                        AND (top_timestamp - buy_timestamp) / 60 <= ?
-                        AND roi >= 2 AND roi < 5
-                        {network_filter} {time_filter} {group_filter}
-                    '''
-                    params = [minutes]
-                    if groups:
-                        params.extend(group_list)
-                    cursor.execute(query, params)
-                    result = cursor.fetchone()
-                    if result[1] and result[1] > 0:
-                        medium_data.append(result[0])
-                    else:
-                        medium_data.append(None)
-                
                 datasets.append({
                     'label': '2-5x Calls',
-                    'data': medium_data
+                    'data': band_data['medium']
                 })
             
             if filter_type == 'all':
-                # <2x calls
-                low_data = []
-                for minutes in time_points:
-                    query = f'''
-                        SELECT AVG(roi) as avg_roi, COUNT(*) as count
-                        FROM calls
-                        WHERE top_timestamp > buy_timestamp 
-                        AND (top_timestamp - buy_timestamp) / 60 <= ?
-                        AND roi < 2
-                        {network_filter} {time_filter} {group_filter}
-                    '''
-                    params = [minutes]
-                    if groups:
-                        params.extend(group_list)
-                    cursor.execute(query, params)
-                    result = cursor.fetchone()
-                    if result[1] and result[1] > 0:
-                        low_data.append(result[0])
-                    else:
-                        low_data.append(None)
-                
                 datasets.append({
                     'label': '<2x Calls',
-                    'data': low_data
+                    'data': band_data['low']
                 })
             
-            conn.close()
-            
             return jsonify({
                 'labels': time_labels,
                 'datasets': datasets
@@ -3287,8 +3178,7 @@ def get_group_matrix():
         period = request.args.get('period', '7d')
         network = request.args.get('network', 'all')
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             network_filter = "" if network == 'all' else f"AND network = '{network}'"
@@ -3296,13 +3186,13 @@ def get_group_matrix():
             cursor.execute(f'''
                 SELECT 
                     group_name,
-                    COUNT(*) as call_count,
-                    AVG(roi) as avg_roi,
-                    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate
-                FROM calls
-                WHERE roi IS NOT NULL {network_filter}
+                    SUM(call_count) as call_count,
+                    SUM(roi_sum) / SUM(call_count) as avg_roi,
+                    SUM(wins) * 100.0 / SUM(call_count) as win_rate
+                FROM call_rollups
+                WHERE 1=1 {network_filter}
                 GROUP BY group_name
-                HAVING COUNT(*) >= 5
+                HAVING SUM(call_count) >= 5
                 ORDER BY avg_roi DESC
                 LIMIT 50
             ''')
@@ -3316,8 +3206,6 @@ def get_group_matrix():
                     'win_rate': round(row[3], 1)
                 })
             
-            conn.close()
-            
             return jsonify({'groups': groups})
     except Exception as e:
         logger.error(f"Error in group matrix: {str(e)}")
@@ -3329,18 +3217,17 @@ def get_network_performance():
     try:
         period = request.args.get('period', '7d')
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT 
                     network,
-                    COUNT(*) as call_count,
-                    AVG(roi) as avg_roi,
-                    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate
-                FROM calls
-                WHERE roi IS NOT NULL AND network IS NOT NULL
+                    SUM(call_count) as call_count,
+                    SUM(roi_sum) / SUM(call_count) as avg_roi,
+                    SUM(wins) * 100.0 / SUM(call_count) as win_rate
+                FROM call_rollups
+                WHERE network IS NOT NULL
                 GROUP BY network
                 ORDER BY call_count DESC
                 LIMIT 10
@@ -3355,8 +3242,6 @@ def get_network_performance():
                     'win_rate': round(row[3], 1)
                 })
             
-            conn.close()
-            
             return jsonify({'networks': networks})
     except Exception as e:
         logger.error(f"Error in network performance: {str(e)}")
@@ -3369,8 +3254,7 @@ def get_hourly_heatmap():
         period = request.args.get('period', '7d')
         network = request.args.get('network', 'all')
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             network_filter = "" if network == 'all' else f"AND network = '{network}'"
@@ -3378,11 +3262,11 @@ def get_hourly_heatmap():
             # Get hourly averages by day of week
             cursor.execute(f'''
                 SELECT 
-                    CAST(strftime('%w', datetime(buy_timestamp, 'unixepoch')) AS INTEGER) as day_of_week,
-                    CAST(strftime('%H', datetime(buy_timestamp, 'unixepoch')) AS INTEGER) as hour,
-                    AVG(roi) as avg_roi
-                FROM calls
-                WHERE roi IS NOT NULL {network_filter}
+                    CAST(strftime('%w', datetime(hour_bucket * 3600, 'unixepoch')) AS INTEGER) as day_of_week,
+                    CAST(strftime('%H', datetime(hour_bucket * 3600, 'unixepoch')) AS INTEGER) as hour,
+                    SUM(roi_sum) / SUM(call_count) as avg_roi
+                FROM call_rollups
+                WHERE 1=1 {network_filter}
                 GROUP BY day_of_week, hour
             ''')
             
@@ -3393,8 +3277,6 @@ def get_hourly_heatmap():
                 if row[0] is not None and row[1] is not None:
                     heatmap[row[0]][row[1]] = round(row[2], 2)
             
-            conn.close()
-            
             return jsonify({'heatmap': heatmap})
     except Exception as e:
         logger.error(f"Error in hourly heatmap: {str(e)}")
@@ -3408,8 +3290,7 @@ def get_top_groups_analysis():
         network = request.args.get('network', 'all')
         limit = int(request.args.get('limit', '10'))
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             network_filter = "" if network == 'all' else f"AND network = '{network}'"
@@ -3418,16 +3299,16 @@ def get_top_groups_analysis():
             cursor.execute(f'''
                 SELECT 
                     group_name,
-                    COUNT(*) as call_count,
-                    AVG(roi) as avg_roi,
-                    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate,
-                    (SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) * 
-                    AVG(roi) * 
-                    SQRT(COUNT(*)) as score
-                FROM calls
-                WHERE roi IS NOT NULL {network_filter}
+                    SUM(call_count) as call_count,
+                    SUM(roi_sum) / SUM(call_count) as avg_roi,
+                    SUM(wins) * 100.0 / SUM(call_count) as win_rate,
+                    (SUM(wins) * 100.0 / SUM(call_count)) * 
+                    (SUM(roi_sum) / SUM(call_count)) * 
+                    SQRT(SUM(call_count)) as score
+                FROM call_rollups
+                WHERE 1=1 {network_filter}
                 GROUP BY group_name
-                HAVING COUNT(*) >= 5
+                HAVING SUM(call_count) >= 5
                 ORDER BY score DESC
                 LIMIT ?
             ''', (limit,))
@@ -3442,8 +3323,6 @@ def get_top_groups_analysis():
                     'score': round(row[4], 0)
                 })
             
-            conn.close()
-            
             return jsonify({'groups': groups})
     except Exception as e:
         logger.error(f"Error in top groups: {str(e)}")
@@ -3456,8 +3335,7 @@ def get_recent_moonshots():
         network = request.args.get('network', 'all')
         limit = int(request.args.get('limit', '10'))
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             network_filter = "" if network == 'all' else f"AND network = '{network}'"
@@ -3489,8 +3367,6 @@ def get_recent_moonshots():
                     'time_to_peak': int(row[5])
                 })
             
-            conn.close()
-            
             return jsonify({'moonshots': moonshots})
     except Exception as e:
         logger.error(f"Error in recent moonshots: {str(e)}")
@@ -3503,8 +3379,7 @@ def get_moonshot_timeline():
         # November 1st, 2024 timestamp
         november_timestamp = 1730419200  # November 1, 2024 00:00:00 UTC
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -3537,8 +3412,6 @@ def get_moonshot_timeline():
                     'time_to_reach_minutes': round(row[6], 1)
                 })
             
-            conn.close()
-            
             return jsonify({'moonshots': moonshots})
     except Exception as e:
         logger.error(f"Error in moonshot timeline: {str(e)}")
@@ -3548,8 +3421,7 @@ def get_moonshot_timeline():
 def get_group_list():
     """Get list of all groups with call counts"""
     try:
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -3567,8 +3439,6 @@ def get_group_list():
                     'call_count': row[1]
                 })
             
-            conn.close()
-            
             return jsonify({'groups': groups})
     except Exception as e:
         logger.error(f"Error getting group list: {str(e)}")
@@ -3580,8 +3450,7 @@ def get_live_feed():
     try:
         filter_type = request.args.get('filter', 'hot')
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
             # Build query based on filter
@@ -3637,8 +3506,6 @@ def get_live_feed():
                     'network': row[5] or 'SOL'
                 })
             
-            conn.close()
-            
             return jsonify({'calls': calls})
     except Exception as e:
         logger.error(f"Error getting live feed: {str(e)}")
@@ -3653,40 +3520,11 @@ def token_search():
         if not query or len(query) < 2:
             return jsonify({'tokens': []})
         
-        with db_lock:
-            conn = sqlite3.connect('krom_calls.db')
+        with read_connection() as conn:
             cursor = conn.cursor()
             
-            # Search by symbol or contract (partial match)
-            cursor.execute('''
-                SELECT 
-                    symbol,
-                    COUNT(*) as call_count,
-                    AVG(roi) as avg_roi,
-                    MAX(roi) as best_roi,
-                    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate,
-                    MIN(buy_timestamp) as first_call,
-                    MAX(buy_timestamp) as last_call
-                FROM calls
-                WHERE symbol LIKE ? OR contract_address LIKE ?
-                GROUP BY symbol
-                ORDER BY call_count DESC
-                LIMIT 10
-            ''', (f'%{query}%', f'%{query}%'))
-            
-            tokens = []
-            for row in cursor.fetchall():
-                tokens.append({
-                    'symbol': row[0],
-                    'call_count': row[1],
-                    'avg_roi': row[2],
-                    'best_roi': row[3],
-                    'win_rate': row[4],
-                    'first_call': row[5],
-                    'last_call': row[6]
-                })
-            
-            conn.close()
+            # Trigram index for substrings, prefix seek for contract addresses
+            tokens = search_tokens(cursor, query)
             
             return jsonify({'tokens': tokens})
     except Exception as e:
@@ -3697,214 +3535,8 @@ def token_search():
 def get_dexscreener_signals():
     """Get comprehensive DexScreener signals for tokens worth researching"""
     try:
-        import time
-        from datetime import datetime, timedelta
-        
-        signals = {
-            'trending': [],
-            'new_launches': [],
-            'volume_spikes': [],
-            'top_gainers': [],
-            'boosted_tokens': [],
-            'high_activity': []
-        }
-        
-        all_tokens = {}  # Use dict to track unique tokens
-        
-        # 1. Get boosted tokens (both latest and top)
-        logger.info("Fetching boosted tokens...")
-        try:
-            # Latest boosted
-            response = requests.get("https://api.dexscreener.com/token-boosts/latest/v1")
-            if response.status_code == 200:
-                boosts = response.json()[:30]  # Get more boosted tokens
-                for boost in boosts:
-                    token_address = boost.get('tokenAddress')
-                    if token_address and token_address not in all_tokens:
-                        all_tokens[token_address] = {'boost': boost, 'source': 'boosted_latest'}
-            
-            # Top boosted
-            response = requests.get("https://api.dexscreener.com/token-boosts/top/v1")
-            if response.status_code == 200:
-                boosts = response.json()[:30]
-                for boost in boosts:
-                    token_address = boost.get('tokenAddress')
-                    if token_address and token_address not in all_tokens:
-                        all_tokens[token_address] = {'boost': boost, 'source': 'boosted_top'}
-                        
-        except Exception as e:
-            logger.error(f"Error fetching boosted tokens: {e}")
-        
-        # 2. Get token profiles (often has newer tokens)
-        logger.info("Fetching token profiles...")
-        try:
-            response = requests.get("https://api.dexscreener.com/token-profiles/latest/v1")
-            if response.status_code == 200:
-                profiles = response.json()[:50]
-                for profile in profiles:
-                    token_address = profile.get('tokenAddress')
-                    if token_address and token_address not in all_tokens:
-                        all_tokens[token_address] = {'profile': profile, 'source': 'profiles'}
-        except Exception as e:
-            logger.error(f"Error fetching profiles: {e}")
-        
-        # 3. Search for various token categories - REDUCED for faster performance
-        logger.info("Searching for tokens by category...")
-        search_terms = [
-            # Focus on most popular categories for speed
-            'MEME', 'AI', 'PEPE', 'NEW', 'PUMP',
-            'MOON', 'ROCKET', 'BASE', 'SOL', 'ETH'
-        ]
-        
-        for term in search_terms:
-            try:
-                response = requests.get(f"https://api.dexscreener.com/latest/dex/search?q={term}")
-                if response.status_code == 200:
-                    data = response.json()
-                    pairs = data.get('pairs', [])[:30]  # Get more from each search
-                    
-                    for pair in pairs:
-                        token_address = pair.get('baseToken', {}).get('address')
-                        if token_address and token_address not in all_tokens:
-                            all_tokens[token_address] = {'pair': pair, 'source': f'search_{term}'}
-                    
-                    logger.info(f"Found {len(pairs)} pairs for {term}")
-                time.sleep(0.1)  # Rate limiting
-            except Exception as e:
-                logger.error(f"Error searching {term}: {e}")
-        
-        # 4. Process tokens we already have data for (much faster!)
-        logger.info(f"Processing {len(all_tokens)} unique tokens...")
-        tokens_with_data = []
-        
-        # First, process all tokens that already have pair data (no extra API calls needed)
-        for token_address, token_info in all_tokens.items():
-            try:
-                pair = None
-                
-                # If we already have pair data from search, use it
-                if 'pair' in token_info:
-                    pair = token_info['pair']
-                elif 'boost' in token_info:
-                    # For boosted tokens, we need to fetch the pair data
-                    # But only fetch for the first 20 boosted tokens to save time
-                    if len([t for t in tokens_with_data if t.get('boost_amount', 0) > 0]) < 20:
-                        response = requests.get(f"https://api.dexscreener.com/latest/dex/tokens/{token_address}")
-                        if response.status_code == 200:
-                            pairs = response.json().get('pairs', [])
-                            if pairs:
-                                pair = pairs[0]
-                                time.sleep(0.05)  # Small rate limit
-                
-                if not pair:
-                    continue
-                
-                # Extract key metrics
-                created_at = pair.get('pairCreatedAt')
-                if created_at:
-                    age_hours = (time.time() * 1000 - created_at) / (1000 * 3600)
-                else:
-                    age_hours = 9999  # Unknown age
-                
-                liquidity_usd = pair.get('liquidity', {}).get('usd', 0)
-                volume_24h = pair.get('volume', {}).get('h24', 0)
-                volume_6h = pair.get('volume', {}).get('h6', 0)
-                volume_1h = pair.get('volume', {}).get('h1', 0)
-                price_change_24h = pair.get('priceChange', {}).get('h24', 0)
-                price_change_6h = pair.get('priceChange', {}).get('h6', 0)
-                price_change_1h = pair.get('priceChange', {}).get('h1', 0)
-                txns_24h = pair.get('txns', {}).get('h24', {})
-                total_txns = txns_24h.get('buys', 0) + txns_24h.get('sells', 0)
-                
-                # Store token data
-                token_data = {
-                    'symbol': pair.get('baseToken', {}).get('symbol', 'N/A'),
-                    'name': pair.get('baseToken', {}).get('name', ''),
-                    'chain': pair.get('chainId', 'N/A'),
-                    'address': token_address,
-                    'age_hours': round(age_hours, 1),
-                    'liquidity_usd': round(liquidity_usd),
-                    'volume_24h': round(volume_24h),
-                    'volume_6h': round(volume_6h),
-                    'volume_1h': round(volume_1h),
-                    'price_change_24h': price_change_24h,
-                    'price_change_6h': price_change_6h,
-                    'price_change_1h': price_change_1h,
-                    'total_txns_24h': total_txns,
-                    'url': pair.get('url', ''),
-                    'source': token_info.get('source', 'unknown'),
-                    'boost_amount': token_info.get('boost', {}).get('totalAmount', 0) if 'boost' in token_info else 0
-                }
-                
-                tokens_with_data.append(token_data)
-                
-            except Exception as e:
-                logger.error(f"Error processing token {token_address}: {e}")
-        
-        # 5. Categorize tokens
-        logger.info(f"Categorizing {len(tokens_with_data)} tokens...")
-        
-        for token in tokens_with_data:
-            # Skip tokens with very low liquidity (likely scams)
-            if token['liquidity_usd'] < 1000:
-                continue
-                
-            # New launches (< 24 hours, with decent liquidity)
-            if token['age_hours'] < 24 and token['liquidity_usd'] > 2000:
-                signals['new_launches'].append(token)
-            
-            # Trending (high volume relative to liquidity)
-            if token['volume_24h'] > 0 and token['liquidity_usd'] > 0:
-                volume_to_liq_ratio = token['volume_24h'] / token['liquidity_usd']
-                if volume_to_liq_ratio > 0.5 and token['liquidity_usd'] > 5000:  # 50% daily volume
-                    signals['trending'].append(token)
-            
-            # Volume spikes
-            if token['volume_6h'] > 0 and token['volume_24h'] > 0:
-                projected_24h = token['volume_6h'] * 4
-                spike_ratio = projected_24h / token['volume_24h']
-                if spike_ratio > 1.5 and token['volume_6h'] > 5000:  # 50% spike
-                    token['volume_spike_ratio'] = round(spike_ratio, 1)
-                    signals['volume_spikes'].append(token)
-            
-            # Top gainers
-            if token['price_change_6h'] > 50 and token['liquidity_usd'] > 3000:
-                signals['top_gainers'].append(token)
-            
-            # Boosted tokens (that also have good metrics)
-            if token['boost_amount'] > 0 and token['liquidity_usd'] > 10000:
-                signals['boosted_tokens'].append(token)
-            
-            # High activity (lots of transactions)
-            if token['total_txns_24h'] > 1000 and token['liquidity_usd'] > 5000:
-                signals['high_activity'].append(token)
-        
-        # 6. Sort and limit results
-        signals['new_launches'] = sorted(signals['new_launches'], key=lambda x: x['volume_24h'], reverse=True)[:20]
-        signals['trending'] = sorted(signals['trending'], key=lambda x: x['volume_24h'], reverse=True)[:20]
-        signals['volume_spikes'] = sorted(signals['volume_spikes'], key=lambda x: x.get('volume_spike_ratio', 0), reverse=True)[:20]
-        signals['top_gainers'] = sorted(signals['top_gainers'], key=lambda x: x['price_change_6h'], reverse=True)[:20]
-        signals['boosted_tokens'] = sorted(signals['boosted_tokens'], key=lambda x: x['boost_amount'], reverse=True)[:15]
-        signals['high_activity'] = sorted(signals['high_activity'], key=lambda x: x['total_txns_24h'], reverse=True)[:15]
-        
-        # Summary
-        total_signals = sum(len(category) for category in signals.values())
-        logger.info(f"Total signals generated: {total_signals}")
-        
-        return jsonify({
-            'success': True,
-            'timestamp': datetime.now().isoformat(),
-            'signals': signals,
-            'summary': {
-                'new_launches': len(signals['new_launches']),
-                'trending': len(signals['trending']),
-                'volume_spikes': len(signals['volume_spikes']),
-                'top_gainers': len(signals['top_gainers']),
-                'boosted_tokens': len(signals['boosted_tokens']),
-                'high_activity': len(signals['high_activity']),
-                'total': total_signals
-            }
-        })
+        # Served from a short-TTL cache that a background thread keeps warm
+        return jsonify(dexscreener_signals.get_signals())
         
     except Exception as e:
         logger.error(f"Error getting DexScreener signals: {str(e)}")
@@ -3979,6 +3611,9 @@ if __name__ == '__main__':
         else:
             print(f"  ❌ {service_name} (optional)")
     
+    # Start the execute_analysis workers before the first chat needs them
+    analysis_workers.warm_up()
+    
     print("\nPress Ctrl+C to stop\n")
     
     app.run(debug=False, host='127.0.0.1', port=5001)
\ No newline at end of file
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Process pool for execute_analysis
+
+LLM-generated pandas code runs in pre-warmed worker processes instead of
+the Flask request thread, so heavy analyses neither block a server thread
+nor compete with the dashboard API for the GIL.
+
+- Workers import pandas/numpy once and keep a read-only connection open
+- Each job gets a CPU-time ceiling (RLIMIT_CPU) and a wall-clock ceiling
+  (SIGALRM) counted from when it starts, each worker an address-space
+  ceiling (RLIMIT_AS)
+- DataFrame results come back as Arrow IPC in shared memory when pyarrow
+  is installed; everything else is pickled through the pool
+"""
+
+import io
+import sys
+import json
+import signal
+import sqlite3
+import logging
+import threading
+import traceback
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from krom_query_cache import install_budget, open_budgeted_connection
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = 4
+JOB_CPU_SECONDS = 30                   # CPU time per job
+JOB_TIMEOUT_SECONDS = 60               # wall clock per job, from when a worker starts it
+STUCK_GRACE_SECONDS = 15               # past that before a worker counts as stuck
+QUERY_SECONDS = 30                     # sqlite time budget per get_db_connection() call
+WORKER_MEMORY_BYTES = 2 * 1024 ** 3    # address space per worker process
+
+SANDBOX_BUILTINS = {
+    'print': print,
+    'len': len,
+    'range': range,
+    'enumerate': enumerate,
+    'zip': zip,
+    'map': map,
+    'filter': filter,
+    'sum': sum,
+    'min': min,
+    'max': max,
+    'abs': abs,
+    'round': round,
+    'sorted': sorted,
+    'list': list,
+    'dict': dict,
+    'set': set,
+    'tuple': tuple,
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'type': type,
+    'isinstance': isinstance,
+    'hasattr': hasattr,
+    'getattr': getattr,
+    'any': any,
+    'all': all,
+}
+
+
+class AnalysisLimitExceeded(Exception):
+    pass
+
+
+# ---------------------------------------------------------------- worker side
+
+_pd = None
+_np = None
+_conn = None
+
+
+def _cpu_exceeded(signum, frame):
+    raise AnalysisLimitExceeded(f"Analysis exceeded the {JOB_CPU_SECONDS}s CPU limit")
+
+
+def _time_exceeded(signum, frame):
+    raise AnalysisLimitExceeded(f"Analysis timed out after {JOB_TIMEOUT_SECONDS}s")
+
+
+def _set_soft_limit(limit: int, soft: int) -> None:
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (soft, hard))
+
+
+def _init_worker() -> None:
+    """Import the analysis stack and open the DB once per worker"""
+    global _pd, _np
+    import pandas
+    import numpy
+    _pd, _np = pandas, numpy
+
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _cpu_exceeded)
+        _set_soft_limit(resource.RLIMIT_AS, WORKER_MEMORY_BYTES)
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _time_exceeded)
+
+    try:
+        _db_connection()
+    except sqlite3.Error as e:
+        logger.warning(f"Analysis worker started without a database: {e}")
+
+
+def _db_connection() -> sqlite3.Connection:
+    """The worker's read-only connection with a fresh time budget.
+
+    Reopened if a previous job closed it.
+    """
+    global _conn
+    if _conn is not None:
+        try:
+            _conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            _conn = None
+
+    if _conn is None:
+        _conn = open_budgeted_connection(QUERY_SECONDS)
+    else:
+        install_budget(_conn, QUERY_SECONDS)
+    return _conn
+
+
+def _start_cpu_budget() -> None:
+    """Move the RLIMIT_CPU soft limit to JOB_CPU_SECONDS past what the worker has used"""
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _set_soft_limit(resource.RLIMIT_CPU, used + JOB_CPU_SECONDS)
+
+
+def _set_alarm(seconds: float) -> None:
+    """Arm (or with 0, cancel) the job's wall-clock limit"""
+    if hasattr(signal, 'setitimer'):
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+
+
+def _export_arrow(df) -> Dict[str, Any]:
+    """Write `df` as an Arrow IPC stream into a new shared memory block"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_stream(sizer, table.schema) as writer:
+        writer.write_table(table)
+    size = sizer.size()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        _write_arrow(shm.buf, table)
+    except Exception:
+        # The traceback still pins the mapping, so only remove the name here
+        shm.unlink()
+        raise
+    shm.close()
+    # The server unlinks the block once it has read it
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return {'name': shm.name, 'size': size}
+
+
+def _write_arrow(buf, table) -> None:
+    # Arrow keeps references to `buf` until these locals are gone
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(buf))
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+def _package_result(result) -> Dict[str, Any]:
+    if isinstance(result, _pd.DataFrame):
+        index = result.index.tolist()
+        if pa is not None:
+            try:
+                return {'kind': 'arrow', 'index': index, **_export_arrow(result)}
+            except Exception as e:
+                logger.debug(f"Arrow export failed, pickling DataFrame instead: {e}")
+        return {
+            'kind': 'records',
+            'columns': result.columns.tolist(),
+            'data': result.to_dict('records'),
+            'index': index
+        }
+    return {'kind': 'value', 'value': result}
+
+
+def _run_job(code: str) -> Dict[str, Any]:
+    """Execute analysis code in the sandbox; runs inside a worker process"""
+    _start_cpu_budget()
+
+    sandbox_globals = {
+        'pd': _pd,
+        'np': _np,
+        'get_db_connection': _db_connection,
+        # Don't include datetime directly to avoid os module issues
+        'json': json,
+        'sqlite3': sqlite3,
+        '__builtins__': SANDBOX_BUILTINS,
+    }
+
+    old_stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        # Blocking sleeps and reads never reach the CPU limit; the alarm
+        # interrupts them without touching the other workers
+        _set_alarm(JOB_TIMEOUT_SECONDS)
+        exec(code, sandbox_globals)
+        _set_alarm(0)
+        output = sys.stdout.getvalue()
+        if 'result' not in sandbox_globals:
+            return {'output': output}
+        return {'output': output, 'result': _package_result(sandbox_globals['result'])}
+
+    except Exception as e:
+        _set_alarm(0)
+        error_detail = f"{type(e).__name__}: {str(e)}"
+
+        # Add line number if available
+        for line in traceback.format_exc().split('\n'):
+            if "line" in line and "<string>" in line:
+                error_detail += f"\n{line.strip()}"
+                break
+        return {'output': sys.stdout.getvalue(), 'error': error_detail}
+
+    finally:
+        _set_alarm(0)
+        sys.stdout = old_stdout
+
+
+def _warm() -> bool:
+    return _pd is not None
+
+
+# ---------------------------------------------------------------- server side
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process is multi-threaded
+            _pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor, terminate: bool = False) -> None:
+    """Stop handing jobs to `pool`; terminate=True also kills its workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # shutdown() drops the executor's process table, so take it first
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    if terminate:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+
+def warm_up() -> None:
+    """Start every worker now so the first analysis doesn't pay for imports"""
+    pool = _get_pool()
+    for _ in range(ANALYSIS_WORKERS):
+        pool.submit(_warm)
+
+
+def _import_arrow(name: str, size: int, index: list) -> Dict[str, Any]:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Arrow buffers must be released before the block is closed
+        columns, data = _read_arrow(shm.buf, size)
+    finally:
+        shm.close()
+        shm.unlink()
+    return {'columns': columns, 'data': data, 'index': index}
+
+
+def _read_arrow(buf, size: int):
+    table = pa.ipc.open_stream(pa.py_buffer(buf)[:size]).read_all()
+    return table.column_names, table.to_pylist()
+
+
+def _wait_for_job(future) -> Dict[str, Any]:
+    """Result of a submitted job; time spent queued behind other jobs doesn't count.
+
+    Workers stop their own jobs after JOB_TIMEOUT_SECONDS, so this only
+    times out for a worker that no longer responds to signals. A running
+    job can still be waiting in the executor's call queue for one job
+    ahead of it, hence the doubled limit.
+    """
+    while not future.running():
+        try:
+            return future.result(timeout=1)
+        except FutureTimeout:
+            continue
+    return future.result(timeout=2 * JOB_TIMEOUT_SECONDS + STUCK_GRACE_SECONDS)
+
+
+def run_analysis(code: str) -> Dict[str, Any]:
+    """Run analysis code on the worker pool.
+
+    Returns {'output', 'result'?, 'error'?}; 'result' is only present if the
+    code set a `result` variable. DataFrames are converted to
+    {'columns', 'data', 'index'}.
+    """
+    pool = _get_pool()
+    try:
+        future = pool.submit(_run_job, code)
+        job = _wait_for_job(future)
+    except FutureTimeout:
+        # The worker ignored its alarm (stuck inside a C call) and would
+        # hold its slot forever; start over with a fresh pool
+        logger.error("Analysis worker stuck past its time limit, restarting the pool")
+        _discard_pool(pool, terminate=True)
+        return {'output': '', 'error': f"Analysis timed out after {JOB_TIMEOUT_SECONDS}s"}
+    except BrokenProcessPool:
+        logger.error("Analysis worker died, restarting the pool")
+        _discard_pool(pool)
+        return {'output': '', 'error': "Analysis worker crashed (memory limit exceeded?)"}
+    except Exception as e:
+        # e.g. a result that can't be pickled back to the server
+        return {'output': '', 'error': f"{type(e).__name__}: {str(e)}"}
+
+    packed = job.pop('result', None)
+    if packed is None:
+        return job
+
+    kind = packed.pop('kind')
+    if kind == 'arrow':
+        job['result'] = _import_arrow(packed['name'], packed['size'], packed['index'])
+    elif kind == 'records':
+        job['result'] = packed
+    else:
+        job['result'] = packed['value']
+    return job
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Async HTTP fetch core for the ATH, price, market-cap and socials scripts
+
+One event loop drives many in-flight requests over a pooled client, so a
+script no longer needs dozens of threads each doing its own TLS handshake.
+
+- Keep-alive connection pooling, HTTP/2 when httpx and h2 are installed
+  (otherwise aiohttp, otherwise httpx over HTTP/1.1)
+- Bounded concurrency for the whole fetcher
+- Shared per-host quotas through rate_limiter, so async and threaded
+  scripts running side by side still respect the same limits
+- Retries with exponential backoff for 429, 5xx and network errors
+
+Usage from synchronous code:
+
+    from async_fetch import fetch_json_many
+    payloads = fetch_json_many(urls)          # None for failed requests
+
+or inside a coroutine:
+
+    async with AsyncFetcher(max_concurrency=100) as fetcher:
+        response = await fetcher.fetch(url, headers=headers)
+        if response.status == 200:
+            ...
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401 -- lets httpx negotiate HTTP/2
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = 100          # requests in flight per fetcher
+MAX_CONNECTIONS_PER_HOST = 20  # pooled keep-alive connections per host
+REQUEST_TIMEOUT = 15
+
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF_SECONDS = 1.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy(NamedTuple):
+    attempts: int = RETRY_ATTEMPTS
+    backoff: float = RETRY_BACKOFF_SECONDS
+    statuses: frozenset = RETRY_STATUSES
+
+
+class FetchResponse(NamedTuple):
+    """status is None if no response arrived; data is the parsed JSON body of a 2xx response"""
+    status: Optional[int]
+    data: Any = None
+
+
+def _network_errors() -> tuple:
+    errors = [asyncio.TimeoutError, OSError, ValueError]
+    if httpx is not None:
+        errors.append(httpx.HTTPError)
+    if aiohttp is not None:
+        errors.append(aiohttp.ClientError)
+    return tuple(errors)
+
+
+class AsyncFetcher:
+    """Pooled async HTTP client with bounded concurrency, retries and shared rate limits"""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY,
+                 max_per_host: int = MAX_CONNECTIONS_PER_HOST,
+                 timeout: float = REQUEST_TIMEOUT,
+                 retry: RetryPolicy = RetryPolicy()):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.retry = retry
+        self._client = None
+        self._semaphore = None
+        self._errors = _network_errors()
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if httpx is not None and (HTTP2_AVAILABLE or aiohttp is None):
+            # With HTTP/2 many requests share one connection per host
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_per_host)
+            )
+        elif aiohttp is not None:
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency,
+                                               limit_per_host=self.max_per_host,
+                                               ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        else:
+            raise ImportError("async_fetch needs aiohttp or httpx (pip install aiohttp)")
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if httpx is not None and isinstance(self._client, httpx.AsyncClient):
+            await self._client.aclose()
+        else:
+            await self._client.close()
+        self._client = None
+
+    async def _send(self, method: str, url: str, params, headers, json_body):
+        """One request; returns (status, headers, parsed JSON of a 2xx body or None)"""
+        if httpx is not None and isinstance(self._client, httpx.AsyncClient):
+            response = await self._client.request(method, url, params=params,
+                                                  headers=headers, json=json_body)
+            data = response.json() if 200 <= response.status_code < 300 and response.content else None
+            return response.status_code, response.headers, data
+
+        async with self._client.request(method, url, params=params,
+                                        headers=headers, json=json_body) as response:
+            data = None
+            if 200 <= response.status < 300:
+                data = await response.json(content_type=None)
+            return response.status, response.headers, data
+
+    async def fetch(self, url: str, method: str = 'GET', params: Optional[Dict] = None,
+                    headers: Optional[Dict] = None, json: Any = None) -> FetchResponse:
+        """Send a request under the concurrency bound and shared rate limit, retrying per policy"""
+        bucket = rate_limiter.bucket_for(url, headers)
+        loop = asyncio.get_running_loop()
+        status = None
+
+        for attempt in range(self.retry.attempts):
+            async with self._semaphore:
+                if bucket:
+                    # The SQLite bucket is blocking I/O; keep it off the loop
+                    wait = await loop.run_in_executor(None, rate_limiter.reserve, bucket)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                try:
+                    status, response_headers, data = await self._send(method, url, params, headers, json)
+                except self._errors as e:
+                    logger.debug(f"{method} {url} failed: {e}")
+                    status, response_headers, data = None, {}, None
+
+            if status is not None and 200 <= status < 300:
+                if bucket:
+                    await loop.run_in_executor(None, rate_limiter.report_success, bucket)
+                return FetchResponse(status, data)
+
+            if status is not None and status not in self.retry.statuses:
+                return FetchResponse(status)
+
+            if attempt + 1 == self.retry.attempts:
+                break
+            if status == 429 and bucket:
+                # The bucket now blocks every client until Retry-After
+                retry_after = rate_limiter.retry_after_seconds(response_headers)
+                await loop.run_in_executor(None, rate_limiter.report_throttled, bucket, retry_after)
+            else:
+                await asyncio.sleep(self.retry.backoff * 2 ** attempt)
+
+        return FetchResponse(status)
+
+    async def get_json(self, url: str, **kwargs) -> Optional[Any]:
+        """Parsed JSON of a successful GET, or None"""
+        response = await self.fetch(url, **kwargs)
+        return response.data
+
+    async def get_json_many(self, requests: Sequence[Union[str, Dict[str, Any]]]) -> List[Optional[Any]]:
+        """get_json for every request concurrently, in input order.
+
+        Each request is a URL or a dict of fetch() arguments with a 'url' key.
+        """
+        async def one(request):
+            if isinstance(request, str):
+                return await self.get_json(request)
+            return await self.get_json(**request)
+
+        return await asyncio.gather(*(one(request) for request in requests))
+
+
+def fetch_json_many(requests: Sequence[Union[str, Dict[str, Any]]],
+                    max_concurrency: int = MAX_CONCURRENCY) -> List[Optional[Any]]:
+    """Fetch many URLs concurrently from synchronous code.
+
+    Returns the parsed JSON for each request in input order, None where the
+    request failed.
+    """
+    async def run():
+        async with AsyncFetcher(max_concurrency=max_concurrency) as fetcher:
+            return await fetcher.get_json_many(requests)
+
+    return asyncio.run(run())
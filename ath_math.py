@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Vectorized ATH and ROI computation over OHLCV candle arrays
+
+Candles are float64 arrays of shape (n, 6) with the columns of the
+GeckoTerminal ohlcv_list (TS, OPEN, HIGH, LOW, CLOSE, VOLUME); missing
+values are NaN and never pass a filter.
+
+Single series, as in the tiered daily -> hourly -> minute search:
+
+    daily = candle_array(ohlcv_list)
+    daily_ath = peak(daily, since=call_timestamp)
+    hourly_ath = peak(hourly, around=daily_ath[TS], window=86400)
+
+Many tokens at once:
+
+    aths = batch_ath(candle_arrays, call_timestamps, prices_at_call)
+    aths['ath_price'], aths['ath_timestamp'], aths['ath_roi_percent']
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+TS, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+def candle_array(ohlcv_list: Optional[List[list]]) -> np.ndarray:
+    """ohlcv_list from the API (or the candle cache) as an (n, 6) float array"""
+    if not ohlcv_list:
+        return np.empty((0, 6))
+    return np.array([candle[:6] for candle in ohlcv_list], dtype=float)
+
+
+def select(candles: np.ndarray, since: Optional[float] = None,
+           around: Optional[float] = None, window: Optional[float] = None,
+           positive: Sequence[int] = (HIGH,)) -> np.ndarray:
+    """Candles at or after `since`, within `window` seconds of `around`,
+    and with every column in `positive` above zero"""
+    mask = np.ones(len(candles), dtype=bool)
+    if since is not None:
+        mask &= candles[:, TS] >= since
+    if around is not None:
+        mask &= np.abs(candles[:, TS] - around) <= window
+    for column in positive:
+        mask &= candles[:, column] > 0
+    return candles[mask]
+
+
+def peak(candles: np.ndarray, since: Optional[float] = None,
+         around: Optional[float] = None, window: Optional[float] = None,
+         positive: Sequence[int] = (HIGH,)) -> Optional[np.ndarray]:
+    """The selected candle with the highest high, or None.
+
+    Ties go to the first candle in input order (the newest for API data).
+    """
+    selected = select(candles, since, around, window, positive)
+    if not len(selected):
+        return None
+    return selected[np.argmax(selected[:, HIGH])]
+
+
+def body_high(candle: np.ndarray) -> float:
+    """max(open, close): the ATH price taken from the peak minute candle"""
+    return float(np.nanmax(candle[[OPEN, CLOSE]]))
+
+
+def roi_percent(ath_price, price_at_call):
+    """ATH ROI in percent, never negative, NaN without a positive call price;
+    works on scalars and arrays"""
+    ath_price = np.asarray(ath_price, dtype=float)
+    price_at_call = np.asarray(price_at_call, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.maximum((ath_price - price_at_call) / price_at_call * 100, 0)
+    roi = np.where(price_at_call > 0, roi, np.nan)
+    return roi if roi.ndim else float(roi)
+
+
+def batch_ath(candle_arrays: Sequence[np.ndarray], call_timestamps: Iterable[float],
+              prices_at_call: Iterable[float]) -> Dict[str, np.ndarray]:
+    """Highest high after the call for every token in one pass.
+
+    Returns columns 'ath_price', 'ath_timestamp' and 'ath_roi_percent'
+    aligned with the input; tokens without a qualifying candle get an
+    ath_price and ath_timestamp of 0 and a NaN ROI. Ties go to the latest
+    candle.
+    """
+    count = len(candle_arrays)
+    ath_price = np.zeros(count)
+    ath_timestamp = np.zeros(count, dtype=np.int64)
+    ath_roi = np.full(count, np.nan)
+
+    lengths = np.array([len(candles) for candles in candle_arrays], dtype=np.int64)
+    if not lengths.sum():
+        return {'ath_price': ath_price, 'ath_timestamp': ath_timestamp, 'ath_roi_percent': ath_roi}
+
+    candles = np.concatenate([candles for candles in candle_arrays if len(candles)])
+    token = np.repeat(np.arange(count), lengths)
+    calls = np.asarray(list(call_timestamps), dtype=float)
+
+    valid = (candles[:, TS] >= calls[token]) & (candles[:, HIGH] > 0)
+    token, ts, high = token[valid], candles[valid, TS], candles[valid, HIGH]
+
+    if len(token):
+        # Sorted by token, then high, then time: each token's last row is its ATH
+        order = np.lexsort((ts, high, token))
+        sorted_token = token[order]
+        best = order[np.flatnonzero(np.r_[sorted_token[1:] != sorted_token[:-1], True])]
+
+        found = token[best]
+        ath_price[found] = high[best]
+        ath_timestamp[found] = ts[best].astype(np.int64)
+        prices = np.asarray(list(prices_at_call), dtype=float)
+        ath_roi[found] = roi_percent(high[best], prices[found])
+
+    return {'ath_price': ath_price, 'ath_timestamp': ath_timestamp, 'ath_roi_percent': ath_roi}
@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 """
 Database Backup Script
-Creates a JSON backup of critical market cap related fields
+Creates a backup of critical market cap related fields
+
+Streams every crypto_calls row page by page into database-backups/ as
+gzip-compressed NDJSON (see table_backup.py); pass --parquet for Parquet.
+Always a full snapshot, since it is taken right before bulk updates.
 """
 
 import os
-import json
+import sys
 import warnings
 warnings.filterwarnings("ignore")
-from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
+from table_backup import BACKUP_DIR, backup
 
 load_dotenv()
 
@@ -20,48 +24,45 @@ supabase = create_client(
     os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 )
 
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-backup_file = f"database_backup_{timestamp}.json"
+sample = []
+
+def fetch_page(after_id, limit, changed_since):
+    """Next page of tokens with the market cap fields, in id order"""
+    query = supabase.table('crypto_calls').select(
+        'id,krom_id,ticker,contract_address,pool_address,network,'
+        'price_at_call,current_price,ath_price,'
+        'market_cap_at_call,current_market_cap,ath_market_cap,'
+        'total_supply,circulating_supply,supply_updated_at,'
+        'volume_24h,liquidity_usd,is_dead'
+    )
+    if after_id is not None:
+        query = query.gt('id', after_id)
+    if changed_since:
+        query = query.gte('updated_at', changed_since)
+    rows = query.order('id').limit(limit).execute().data
+    if not sample:
+        sample.extend(rows[:5])
+    return rows
 
 print("=" * 60)
-print(f"Creating Database Backup: {backup_file}")
+print("Creating Database Backup of market cap fields")
 print("=" * 60)
 
-# Fetch all tokens with relevant market cap fields
-print("\nFetching all crypto_calls data...")
-result = supabase.table('crypto_calls').select(
-    'id,krom_id,ticker,contract_address,pool_address,network,'
-    'price_at_call,current_price,ath_price,'
-    'market_cap_at_call,current_market_cap,ath_market_cap,'
-    'total_supply,circulating_supply,supply_updated_at,'
-    'volume_24h,liquidity_usd,is_dead'
-).limit(5000).execute()
-
-tokens = result.data
-print(f"Retrieved {len(tokens)} tokens")
+print("\nStreaming all crypto_calls data...")
+entry = backup('crypto_calls_market_caps', fetch_page, BACKUP_DIR,
+               fmt='parquet' if '--parquet' in sys.argv else 'ndjson', full=True)
 
-# Save to JSON file
-print(f"\nSaving backup to {backup_file}...")
-with open(backup_file, 'w') as f:
-    json.dump({
-        'timestamp': timestamp,
-        'total_records': len(tokens),
-        'data': tokens
-    }, f, indent=2, default=str)
-
-# Get file size
-file_size = os.path.getsize(backup_file)
 print(f"✅ Backup created successfully!")
-print(f"   File: {backup_file}")
-print(f"   Size: {file_size / 1024 / 1024:.2f} MB")
-print(f"   Records: {len(tokens)}")
+print(f"   File: {BACKUP_DIR}/{entry['file']}")
+print(f"   Size: {entry['bytes'] / 1024 / 1024:.2f} MB")
+print(f"   Records: {entry['records']}")
 
 # Show sample of backed up data
 print("\nSample of backed up tokens:")
-for token in tokens[:5]:
+for token in sample:
     print(f"  {token['ticker']}: MC@Call={token.get('market_cap_at_call')}, "
           f"Supply={token.get('total_supply')}")
 
 print("\n" + "=" * 60)
 print("Backup complete! You can now safely proceed with updates.")
-print("=" * 60)
\ No newline at end of file
+print("=" * 60)
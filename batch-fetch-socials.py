@@ -6,12 +6,11 @@ This populates the database so the UI doesn't need to fetch on every modal open
 
 import os
 import json
-import requests
-import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 from dotenv import load_dotenv
 from supabase import create_client
+from async_fetch import fetch_json_many
 
 load_dotenv()
 
@@ -20,20 +19,23 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def fetch_batch_from_dexscreener(addresses: List[str]) -> Dict[str, Any]:
+def fetch_batches_from_dexscreener(address_batches: List[List[str]]) -> List[Dict[str, Any]]:
     """
-    Fetch multiple tokens from DexScreener in one API call
+    Fetch all batches from DexScreener concurrently, one API call per batch
     DexScreener supports up to 30 addresses per request
     """
+    # DexScreener expects lowercase addresses
+    urls = [
+        "https://api.dexscreener.com/latest/dex/tokens/" + ','.join(addr.lower() for addr in addresses)
+        for addresses in address_batches
+    ]
+    return [parse_socials(data) if data else {} for data in fetch_json_many(urls)]
+
+def parse_socials(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Social links per contract address from a DexScreener tokens response
+    """
     try:
-        # DexScreener expects lowercase addresses
-        addresses_str = ','.join([addr.lower() for addr in addresses])
-        url = f"https://api.dexscreener.com/latest/dex/tokens/{addresses_str}"
-        
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        
         results = {}
         
         for pair_data in data.get('pairs', []):
@@ -90,7 +92,7 @@ def fetch_batch_from_dexscreener(addresses: List[str]) -> Dict[str, Any]:
         return results
         
     except Exception as e:
-        print(f"Error fetching batch: {e}")
+        print(f"Error parsing batch: {e}")
         return {}
 
 def update_socials_batch():
@@ -120,14 +122,16 @@ def update_socials_batch():
     updated_count = 0
     failed_count = 0
     
-    for i in range(0, len(tokens), batch_size):
-        batch = tokens[i:i+batch_size]
-        addresses = [t['contract_address'] for t in batch]
-        
-        print(f"\n📡 Fetching batch {i//batch_size + 1}/{(len(tokens)-1)//batch_size + 1} ({len(batch)} tokens)...")
-        
-        # Fetch from DexScreener
-        results = fetch_batch_from_dexscreener(addresses)
+    batches = [tokens[i:i+batch_size] for i in range(0, len(tokens), batch_size)]
+    
+    # Fetch every batch from DexScreener up front (rate limited by async_fetch)
+    print(f"\n📡 Fetching {len(batches)} batches from DexScreener...")
+    all_results = fetch_batches_from_dexscreener(
+        [[t['contract_address'] for t in batch] for batch in batches]
+    )
+    
+    for batch_number, (batch, results) in enumerate(zip(batches, all_results), 1):
+        print(f"\n📡 Batch {batch_number}/{len(batches)} ({len(batch)} tokens)...")
         
         if not results:
             print(f"  ⚠️ No results from DexScreener")
@@ -183,10 +187,6 @@ def update_socials_batch():
                 except Exception as e:
                     print(f"  ❌ {token['ticker']:8} - Update failed: {e}")
                     failed_count += 1
-        
-        # Rate limiting - be nice to DexScreener
-        if i + batch_size < len(tokens):
-            time.sleep(1)
     
     # Summary
     print(f"\n{'='*60}")
@@ -22,6 +22,7 @@ warnings.filterwarnings("ignore", message="urllib3 v2 only supports OpenSSL")
 
 import requests
 from supabase import create_client, Client
+from batch_runner import BatchRunner, ItemFailed, per_item
 
 # Load environment variables
 load_dotenv()
@@ -282,41 +283,44 @@ def main():
     print("KROM Market Cap Updater")
     print("=" * 60)
     
-    # Get tokens that need market cap data
-    # Prioritize tokens with prices but no market cap
-    query = supabase.table('crypto_calls').select(
-        'id,ticker,contract_address,pool_address,network,current_price,price_at_call'
-    ).not_.is_('current_price', 'null').is_('current_market_cap', 'null').order('created_at', desc=True)
+    # Tokens with prices but no market cap, paged by id from the last
+    # checkpoint so repeated runs continue instead of starting over
+    def fetch_tokens(after_id, limit):
+        query = supabase.table('crypto_calls').select(
+            'id,ticker,contract_address,pool_address,network,current_price,price_at_call'
+        ).not_.is_('current_price', 'null').is_('current_market_cap', 'null')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data
     
-    result = query.execute()
-    tokens = result.data
+    counts = {'processed': 0, 'success': 0}
     
-    print(f"\nFound {len(tokens)} tokens needing market cap data")
-    
-    if not tokens:
-        print("No tokens to process")
-        return
-    
-    # Process tokens
-    success_count = 0
-    processed_count = 0
-    
-    # Limit for testing
-    test_limit = 5
-    for i, token in enumerate(tokens[:test_limit], 1):  # Process first 5 for testing
-        print(f"\n[{i}/{min(test_limit, len(tokens))}]", end="")
-        
+    def update_token(token):
         success = update_token_supply_and_market_cap(token)
-        if success:
-            success_count += 1
-        processed_count += 1
+        counts['processed'] += 1
         
         # Rate limiting
-        if processed_count % 10 == 0:
-            print(f"\n--- Processed {processed_count} tokens, {success_count} successful ---")
+        if counts['processed'] % 10 == 0:
+            print(f"\n--- Processed {counts['processed']} tokens, {counts['success'] + success} successful ---")
             time.sleep(2)  # Brief pause every 10 tokens
         else:
             time.sleep(0.5)  # Small delay between requests
+        
+        if not success:
+            raise ItemFailed("No supply data or database update failed")
+        counts['success'] += 1
+    
+    # Limit for testing; pass --restart to start from the first token again
+    test_limit = 5
+    runner = BatchRunner('batch-marketcap-updater', fetch_tokens, per_item(update_token),
+                         page_size=10, max_items=test_limit, restart='--restart' in sys.argv)
+    runner.run()
+    
+    processed_count = counts['processed']
+    success_count = counts['success']
+    if not processed_count:
+        print("No tokens to process")
+        return
     
     # Final summary
     print("\n" + "=" * 60)
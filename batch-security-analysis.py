@@ -1,45 +1,17 @@
 #!/usr/bin/env python3
-"""Batch process tokens for security analysis using GoPlus API"""
+"""Batch process tokens for security analysis using GoPlus API
+
+Tokens are grouped by chain and looked up many addresses per GoPlus call,
+chains in parallel, through the goplus_security cache; each round of
+results is written back with a single UPDATE. Runs until every eligible
+token has been checked.
+"""
 import requests
-import time
-import json
-from datetime import datetime
-# Import the functions directly
-import requests as req
+from datetime import datetime, timezone
+from bulk_writer import bulk_update_sql
+from goplus_security import chain_id_for, lookup
 
-def fetch_goplus_security(contract_address, network):
-    """Fetch security data from GoPlus API"""
-    # Map network names to chain IDs
-    chain_map = {
-        'ethereum': '1',
-        'eth': '1',
-        'bsc': '56',
-        'polygon': '137',
-        'arbitrum': '42161',
-        'solana': 'solana',
-        'base': '8453',
-        'avalanche': '43114'
-    }
-    
-    chain_id = chain_map.get(network.lower(), network)
-    
-    # Skip unsupported networks
-    if chain_id not in ['1', '56', '137', '42161', 'solana', '8453', '43114']:
-        return None
-    
-    url = f"https://api.gopluslabs.io/api/v1/token_security/{chain_id}"
-    params = {'contract_addresses': contract_address.lower()}
-    
-    try:
-        response = req.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'result' in data and contract_address.lower() in data['result']:
-                return data['result'][contract_address.lower()]
-    except Exception as e:
-        print(f"GoPlus API error for {contract_address}: {e}")
-    
-    return None
+SWEEP_BATCH_SIZE = 300  # tokens per round (one UPDATE each)
 
 def analyze_liquidity_lock(security_data):
     """Analyze security data to determine liquidity lock status"""
@@ -142,7 +114,7 @@ def run_query(query):
         print(f"Query error: {e}")
         return []
 
-def process_batch(limit=10):
+def process_batch(limit=SWEEP_BATCH_SIZE):
     """Process a batch of tokens for security analysis"""
     
     # Get tokens that haven't been checked yet, prioritizing high-score tokens
@@ -160,63 +132,76 @@ def process_batch(limit=10):
     
     tokens = run_query(query)
     
-    if not tokens:
+    if not tokens or not isinstance(tokens, list):
         print("No tokens to process")
         return 0
     
     print(f"Processing {len(tokens)} tokens...")
-    processed = 0
     
+    # One set of GoPlus calls per chain, chains in parallel
+    addresses_by_chain = {}
     for token in tokens:
-        print(f"\nAnalyzing {token['ticker']} on {token['network']}...")
+        chain_id = chain_id_for(token['network'])
+        if chain_id:
+            addresses_by_chain.setdefault(chain_id, []).append(token['contract_address'])
+    results = lookup(addresses_by_chain)
+    
+    checked_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    
+    for token in tokens:
+        key = (chain_id_for(token['network']), token['contract_address'].lower())
+        if key not in results:
+            # GoPlus request failed; leave unchecked for the next run
+            print(f"  {token['ticker']}: GoPlus lookup failed, will retry")
+            continue
         
         try:
-            # Fetch security data
-            security_data = fetch_goplus_security(token['contract_address'], token['network'])
+            security_data = results[key]
             
             # Analyze
             analysis = analyze_liquidity_lock(security_data)
             
-            # Update database with both analyzed data and raw data
-            raw_data_json = json.dumps(security_data).replace("'", "''") if security_data else 'null'
-            
-            update_query = f"""
-            UPDATE crypto_calls SET
-                liquidity_locked = {analysis['is_locked']},
-                liquidity_lock_percent = {analysis['lock_percent']},
-                ownership_renounced = {analysis['ownership_renounced']},
-                security_score = {analysis['security_score']},
-                security_warnings = '{json.dumps(analysis['warnings']).replace("'", "''")}',
-                security_raw_data = '{raw_data_json}'::jsonb,
-                security_checked_at = NOW()
-            WHERE id = '{token['id']}'
-            """
-            
-            result = run_query(update_query)
+            # Update with both analyzed data and raw data
+            rows.append({
+                'id': token['id'],
+                'liquidity_locked': analysis['is_locked'],
+                'liquidity_lock_percent': analysis['lock_percent'],
+                'ownership_renounced': analysis['ownership_renounced'],
+                'security_score': analysis['security_score'],
+                'security_warnings': analysis['warnings'],
+                'security_raw_data': security_data,
+                'security_checked_at': checked_at
+            })
             
+            print(f"\n{token['ticker']} on {token['network']}:")
             print(f"  Security Score: {analysis['security_score']}/100")
             print(f"  Liquidity Locked: {'Yes' if analysis['is_locked'] else 'No'} ({analysis['lock_percent']:.2f}%)")
             print(f"  Ownership Renounced: {'Yes' if analysis['ownership_renounced'] else 'No'}")
             if analysis['warnings']:
                 print(f"  Warnings: {', '.join(analysis['warnings'])}")
             
-            processed += 1
-            
-            # Respect API rate limits (free tier)
-            time.sleep(1)
-            
         except Exception as e:
             print(f"  Error processing {token['ticker']}: {e}")
             # Mark as checked even on error to avoid retrying bad tokens
-            error_query = f"""
-            UPDATE crypto_calls SET
-                security_checked_at = NOW(),
-                security_warnings = '["Error during security check"]'
-            WHERE id = '{token['id']}'
-            """
-            run_query(error_query)
+            rows.append({
+                'id': token['id'],
+                'security_warnings': ['Error during security check'],
+                'security_checked_at': checked_at
+            })
     
-    return processed
+    if not rows:
+        return 0
+    
+    result = run_query(bulk_update_sql('crypto_calls', 'id', [
+        'liquidity_locked', 'liquidity_lock_percent', 'ownership_renounced', 'security_score',
+        'security_warnings', 'security_raw_data', 'security_checked_at'
+    ], rows))
+    if isinstance(result, dict) and result.get('message'):
+        print(f"  Database update failed: {result['message']}")
+        return 0
+    
+    return len(rows)
 
 def get_stats():
     """Get security analysis statistics"""
@@ -265,8 +250,13 @@ if __name__ == "__main__":
     
     print("\n" + "-" * 60)
     
-    # Process batch - 50 latest tokens as requested
-    processed = process_batch(limit=50)
+    # Sweep until every eligible token is checked (or only failing lookups remain)
+    processed = 0
+    while True:
+        batch_processed = process_batch()
+        if not batch_processed:
+            break
+        processed += batch_processed
     
     print("\n" + "-" * 60)
     print(f"Processed {processed} tokens")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Checkpointed, resumable batch runner for the long price / ATH / market cap jobs
+
+A job walks its tokens in key order one page at a time. After every page
+the last key, the page's failures (with reason) and throughput counters
+are committed to a local SQLite checkpoint, so an interrupted run resumes
+after the last finished page instead of starting over or relying on
+`IS NULL` filters. Failed items are retried with exponential backoff at
+the end of the run (and by later runs) until they succeed or run out of
+attempts.
+
+A finished job stays finished (later runs only retry failures) unless it
+is restarted; jobs that should go over every item on each run, like a
+price refresh, pass recurring=True to start a new pass whenever the last
+one completed. An unfinished pass is always resumed.
+
+Usage in a script:
+
+    from batch_runner import BatchRunner, ItemFailed, per_item
+
+    def fetch_page(after_key, limit):
+        # tokens with key > after_key (all if None), ordered by key
+        ...
+
+    def update_token(token):
+        ...
+        if not price:
+            raise ItemFailed("no price")
+
+    runner = BatchRunner('refresh-all-prices', fetch_page, per_item(update_token, max_workers=10),
+                         restart='--restart' in sys.argv)
+    runner.run()
+"""
+
+import os
+import json
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CHECKPOINT_DB_PATH = os.getenv(
+    "BATCH_CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_checkpoints.db")
+)
+
+PAGE_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 30    # doubled after every failed attempt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job TEXT PRIMARY KEY,
+    last_key TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    recovered INTEGER NOT NULL DEFAULT 0,
+    elapsed_seconds REAL NOT NULL DEFAULT 0,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS job_failures (
+    job TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    item TEXT NOT NULL,             -- JSON, so retries don't need to refetch
+    reason TEXT,
+    attempts INTEGER NOT NULL,
+    next_retry_at REAL NOT NULL,
+    PRIMARY KEY (job, item_key)
+);
+"""
+
+Item = Dict[str, Any]
+PageFetcher = Callable[[Optional[str], int], List[Item]]
+PageProcessor = Callable[[List[Item]], List[Tuple[Item, Exception]]]
+
+
+class ItemFailed(Exception):
+    """Raised for an item that failed; retry=False records it without retrying"""
+
+    def __init__(self, reason: str, retry: bool = True):
+        super().__init__(reason)
+        self.retry = retry
+
+
+def per_item(process: Callable[[Item], Any], max_workers: int = 1) -> PageProcessor:
+    """Turn a one-item function into a page processor; any exception marks the item failed"""
+    def run(item):
+        try:
+            process(item)
+            return None
+        except Exception as e:
+            return e
+
+    def process_page(items: List[Item]) -> List[Tuple[Item, Exception]]:
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                errors = list(executor.map(run, items))
+        else:
+            errors = [run(item) for item in items]
+        return [(item, error) for item, error in zip(items, errors) if error is not None]
+
+    return process_page
+
+
+class BatchRunner:
+    """Runs `process_page` over pages from `fetch_page`, checkpointing after each page"""
+
+    def __init__(self, job: str, fetch_page: PageFetcher, process_page: PageProcessor,
+                 key: Callable[[Item], Any] = lambda item: item['id'],
+                 page_size: int = PAGE_SIZE, max_attempts: int = MAX_ATTEMPTS,
+                 retry_backoff: float = RETRY_BACKOFF_SECONDS,
+                 max_items: Optional[int] = None, restart: bool = False, recurring: bool = False):
+        self.job = job
+        self.fetch_page = fetch_page
+        self.process_page = process_page
+        self.key = key
+        self.page_size = page_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_items = max_items
+        self.recurring = recurring
+
+        self.conn = sqlite3.connect(CHECKPOINT_DB_PATH, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        if restart:
+            self.reset()
+
+    def reset(self) -> None:
+        """Forget the checkpoint and failures; the next run starts from the first item"""
+        with self.conn:
+            self.conn.execute("DELETE FROM job_checkpoints WHERE job = ?", (self.job,))
+            self.conn.execute("DELETE FROM job_failures WHERE job = ?", (self.job,))
+
+    def new_pass(self) -> None:
+        """Start again from the first item, keeping outstanding failures"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute("""
+                UPDATE job_checkpoints SET
+                    last_key = NULL, completed = 0, processed = 0, recovered = 0,
+                    elapsed_seconds = 0, started_at = ?, updated_at = ?
+                WHERE job = ?
+            """, (now, now, self.job))
+
+    def checkpoint(self) -> sqlite3.Row:
+        row = self.conn.execute("SELECT * FROM job_checkpoints WHERE job = ?", (self.job,)).fetchone()
+        if row is None:
+            now = time.time()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO job_checkpoints (job, started_at, updated_at) VALUES (?, ?, ?)",
+                    (self.job, now, now)
+                )
+            row = self.conn.execute("SELECT * FROM job_checkpoints WHERE job = ?", (self.job,)).fetchone()
+        return row
+
+    def failures(self) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT item_key, reason, attempts FROM job_failures WHERE job = ? ORDER BY item_key", (self.job,)
+        ).fetchall()
+
+    def _record(self, items: List[Item], failed: List[Tuple[Item, Exception]], elapsed: float,
+                last_key: Optional[str] = None, completed: bool = False, retry: bool = False) -> None:
+        """Commit one page: failures, cleared items, counters and (for new pages) the checkpoint key"""
+        now = time.time()
+        failed_keys = {str(self.key(item)) for item, _ in failed}
+        cleared = [str(self.key(item)) for item in items if str(self.key(item)) not in failed_keys]
+
+        with self.conn:
+            recovered = 0
+            if cleared:
+                placeholders = ','.join('?' * len(cleared))
+                recovered = self.conn.execute(
+                    f"DELETE FROM job_failures WHERE job = ? AND item_key IN ({placeholders})",
+                    [self.job] + cleared
+                ).rowcount
+
+            for item, error in failed:
+                item_key = str(self.key(item))
+                row = self.conn.execute(
+                    "SELECT attempts FROM job_failures WHERE job = ? AND item_key = ?", (self.job, item_key)
+                ).fetchone()
+                attempts = (row['attempts'] if row else 0) + 1
+                if not getattr(error, 'retry', True):
+                    attempts = self.max_attempts
+                reason = str(error) if isinstance(error, ItemFailed) else f"{type(error).__name__}: {error}"
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO job_failures (job, item_key, item, reason, attempts, next_retry_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (self.job, item_key, json.dumps(item, default=str), reason[:500],
+                      attempts, now + self.retry_backoff * 2 ** (attempts - 1)))
+
+            self.conn.execute("""
+                UPDATE job_checkpoints SET
+                    last_key = COALESCE(?, last_key),
+                    completed = MAX(completed, ?),
+                    processed = processed + ?,
+                    recovered = recovered + ?,
+                    elapsed_seconds = elapsed_seconds + ?,
+                    updated_at = ?
+                WHERE job = ?
+            """, (last_key, int(completed), 0 if retry else len(items), recovered, elapsed, now, self.job))
+
+    def _report(self, prefix: str) -> None:
+        cp = self.checkpoint()
+        outstanding = self.conn.execute(
+            "SELECT COUNT(*) FROM job_failures WHERE job = ?", (self.job,)
+        ).fetchone()[0]
+        rate = cp['processed'] / cp['elapsed_seconds'] if cp['elapsed_seconds'] else 0
+        print(f"[{self.job}] {prefix}: {cp['processed']:,} processed, {outstanding:,} failed, "
+              f"{cp['recovered']:,} recovered on retry - {rate:.1f} items/s (last key {cp['last_key']})")
+
+    def _run_pages(self) -> None:
+        cp = self.checkpoint()
+        if cp['completed'] and self.recurring:
+            print(f"[{self.job}] Last pass complete; starting a new pass")
+            self.new_pass()
+            cp = self.checkpoint()
+        elif cp['completed']:
+            print(f"[{self.job}] Already complete; retrying failures only (use a restart to run again)")
+            return
+        if cp['last_key'] is not None:
+            print(f"[{self.job}] Resuming after key {cp['last_key']} ({cp['processed']:,} already processed)")
+
+        last_key, done = cp['last_key'], 0
+        while self.max_items is None or done < self.max_items:
+            limit = self.page_size if self.max_items is None else min(self.page_size, self.max_items - done)
+            items = self.fetch_page(last_key, limit)
+            if not items:
+                self._record([], [], 0, completed=True)
+                break
+
+            start = time.time()
+            failed = self.process_page(items)
+            last_key = str(self.key(items[-1]))
+            self._record(items, failed, time.time() - start, last_key=last_key)
+            done += len(items)
+            self._report("Progress")
+
+    def _retry_failures(self) -> None:
+        """Retry failed items as they come due until they succeed or run out of attempts"""
+        while True:
+            pending = self.conn.execute("""
+                SELECT item, next_retry_at FROM job_failures
+                WHERE job = ? AND attempts < ?
+                ORDER BY next_retry_at
+            """, (self.job, self.max_attempts)).fetchall()
+            if not pending:
+                return
+
+            wait = pending[0]['next_retry_at'] - time.time()
+            if wait > 0:
+                print(f"[{self.job}] {len(pending)} failed items to retry, next in {wait:.0f}s")
+                time.sleep(wait)
+
+            due = [json.loads(row['item']) for row in pending if row['next_retry_at'] <= time.time()]
+            for i in range(0, len(due), self.page_size):
+                items = due[i:i + self.page_size]
+                start = time.time()
+                failed = self.process_page(items)
+                self._record(items, failed, time.time() - start, retry=True)
+            self._report("Retries")
+
+    def run(self) -> sqlite3.Row:
+        """Process from the checkpoint on, then retry failures; returns the final checkpoint"""
+        self._run_pages()
+        self._retry_failures()
+        self._report("Done")
+
+        failures = self.failures()
+        if failures:
+            print(f"[{self.job}] {len(failures)} items failed for good:")
+            for row in failures[:20]:
+                print(f"  {row['item_key']}: {row['reason']} ({row['attempts']} attempts)")
+        return self.checkpoint()
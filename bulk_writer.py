@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Buffered bulk writes for the ATH and price scripts
+
+Workers add one row per token; the writer flushes them as a single
+multi-row statement every `max_rows` rows or `max_seconds` seconds,
+whichever comes first, so a batch of 50 tokens costs one database
+round-trip instead of 50.
+
+Row values never become SQL syntax: the rows travel as one JSON document
+that Postgres expands into rows of the target table's column types.
+
+Usage with the Management API query endpoint:
+
+    writer = BulkWriter(lambda rows: run_query(
+        bulk_update_sql('crypto_calls', 'id', ['ath_price'], rows)))
+    writer.add({'id': token_id, 'ath_price': price})
+    ...
+    writer.close()
+
+or with supabase-py through an RPC function (see add_bulk_update_functions.sql):
+
+    writer = BulkWriter(lambda rows: supabase.rpc('bulk_update_prices', {'updates': rows}).execute())
+"""
+
+import json
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+FLUSH_ROWS = 50
+FLUSH_SECONDS = 10.0
+
+
+def json_literal(value: Any) -> str:
+    """`value` as a dollar-quoted jsonb literal whose tag can't occur in the payload"""
+    payload = json.dumps(value, default=str)
+    tag = f"$j{secrets.token_hex(4)}$"
+    while tag in payload:
+        tag = f"$j{secrets.token_hex(4)}$"
+    return f"{tag}{payload}{tag}::jsonb"
+
+
+def bulk_update_sql(table: str, key: str, columns: List[str], rows: List[Dict[str, Any]]) -> str:
+    """One UPDATE for all `rows`, matched on the `key` column.
+
+    Values are typed by the table's own column types. A None (or missing)
+    value leaves the column as it is; of several rows for one key the last wins.
+    """
+    rows = list({row[key]: row for row in rows}.values())
+    assignments = ',\n        '.join(f"{name} = COALESCE(v.{name}, t.{name})" for name in columns)
+    return f"""
+    UPDATE {table} AS t
+    SET {assignments}
+    FROM jsonb_populate_recordset(NULL::{table}, {json_literal(rows)}) AS v
+    WHERE t.{key} = v.{key}
+    """
+
+
+class BulkWriter:
+    """Thread-safe row buffer flushed by size or age through `flush_rows(rows)`"""
+
+    def __init__(self, flush_rows: Callable[[List[Dict[str, Any]]], Any],
+                 max_rows: int = FLUSH_ROWS, max_seconds: float = FLUSH_SECONDS):
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.written = 0
+        self.failed = 0
+
+        self._rows: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self._rows.append(row)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything buffered so far"""
+        # Flushes run one at a time so rows for the same key land in order
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows, self._oldest = self._rows, [], None
+            if not rows:
+                return
+            try:
+                self.flush_rows(rows)
+                self.written += len(rows)
+            except Exception as e:
+                self.failed += len(rows)
+                print(f"Bulk write of {len(rows)} rows failed: {e}")
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(min(1.0, self.max_seconds)):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_seconds
+            if due:
+                self.flush()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+
+    def __enter__(self) -> 'BulkWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
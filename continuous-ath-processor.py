@@ -7,6 +7,8 @@ import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from ohlcv_cache import get_ohlcv
+import rate_limiter
 
 load_dotenv()
 
@@ -19,7 +21,6 @@ BATCH_SIZE = 500  # Process 500 at a time
 # Use Pro API
 API_BASE = "https://pro-api.coingecko.com/api/v3/onchain"
 HEADERS = {"x-cg-pro-api-key": GECKO_API_KEY}
-DELAY = 0.5  # 500ms for Pro API
 
 NETWORK_MAP = {
     'ethereum': 'eth',
@@ -39,24 +40,24 @@ def run_query(query):
     )
     return response.json()
 
-def fetch_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
-    """Fetch OHLCV data"""
+def download_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
+    """Download raw OHLCV candles"""
     url = f"{API_BASE}/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}"
     params = {'aggregate': 1, 'limit': limit}
     if before_timestamp:
         params['before_timestamp'] = before_timestamp
     
-    response = requests.get(url, params=params, headers=HEADERS)
-    if response.status_code == 429:
-        print("  Rate limit hit, waiting 60s...")
-        time.sleep(60)
-        return fetch_ohlcv(network, pool_address, timeframe, limit, before_timestamp)
-    
+    # Shared rate limiter; waits out 429s (Retry-After) before giving up
+    response = rate_limiter.get(url, params=params, headers=HEADERS)
     if response.status_code != 200:
         raise Exception(f"API error {response.status_code}")
     
     data = response.json()
-    ohlcv_list = data.get('data', {}).get('attributes', {}).get('ohlcv_list', [])
+    return data.get('data', {}).get('attributes', {}).get('ohlcv_list', [])
+
+def fetch_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
+    """Fetch OHLCV data through the local candle cache"""
+    ohlcv_list = get_ohlcv(network, pool_address, timeframe, limit, before_timestamp, download_ohlcv)
     
     return [{
         'timestamp': candle[0],
@@ -144,7 +145,7 @@ def process_token(token):
 print("🚀 Starting continuous ATH processing")
 print(f"Using CoinGecko Pro API")
 print(f"Batch size: {BATCH_SIZE}")
-print(f"Delay between tokens: {DELAY}s\n")
+print(f"Rate limit: {rate_limiter.LIMITS_PER_MINUTE['coingecko:pro']} requests/minute (shared)\n")
 
 total_processed = 0
 total_failed = 0
@@ -190,9 +191,6 @@ while True:
             print(f"  Progress: {i+1}/{len(tokens_data)} | "
                   f"Success: {batch_success} | "
                   f"Rate: {rate:.1f}/min")
-        
-        # Rate limiting
-        time.sleep(DELAY)
     
     # Batch summary
     batch_time = time.time() - batch_start
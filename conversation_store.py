@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Bounded, persistent chat session store for analyze_with_mcp
+
+- In-memory LRU of recently active sessions (older ones are reloaded from disk)
+- Per-session budget: message count, characters per message, total characters
+- Every save is written to SQLite so a restart does not lose conversations
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DB_PATH = "krom_sessions.db"
+
+MAX_CACHED_SESSIONS = 500     # sessions kept in memory
+MAX_HISTORY_MESSAGES = 4      # 2 exchanges
+MAX_MESSAGE_CHARS = 10000     # ~2500 tokens
+MAX_HISTORY_CHARS = 20000     # ~5000 tokens sent as history per turn
+SESSION_TTL_DAYS = 7          # persisted sessions idle longer than this are deleted
+
+
+class LRUDict(OrderedDict):
+    """Dict that keeps at most `maxsize` entries, evicting the least recently used"""
+
+    def __init__(self, maxsize: int = 128):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+def trim_history(messages: List[Dict[str, Any]],
+                 max_messages: int = MAX_HISTORY_MESSAGES,
+                 max_chars: int = MAX_HISTORY_CHARS) -> List[Dict[str, Any]]:
+    """Newest messages that fit the budget, starting with a user turn"""
+    trimmed = []
+    for msg in messages:
+        content = msg['content']
+        if len(content) > MAX_MESSAGE_CHARS:
+            content = content[:MAX_MESSAGE_CHARS] + "...[truncated]"
+        trimmed.append({'role': msg['role'], 'content': content})
+
+    trimmed = trimmed[-max_messages:] if max_messages else []
+    while trimmed and sum(len(msg['content']) for msg in trimmed) > max_chars:
+        trimmed.pop(0)
+    # The API requires the conversation to open with a user message
+    while trimmed and trimmed[0]['role'] != 'user':
+        trimmed.pop(0)
+    return trimmed
+
+
+class ConversationStore:
+    """Session id -> message list, bounded in memory and persisted to SQLite"""
+
+    def __init__(self, db_path: str = SESSIONS_DB_PATH, max_sessions: int = MAX_CACHED_SESSIONS):
+        self.lock = threading.Lock()
+        self.sessions = LRUDict(max_sessions)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "DELETE FROM chat_sessions WHERE updated_at < ?",
+            (time.time() - SESSION_TTL_DAYS * 86400,)
+        )
+        self.conn.commit()
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        """Trimmed copy of the session's history (empty for new sessions)"""
+        with self.lock:
+            if session_id in self.sessions:
+                return list(self.sessions[session_id])
+
+            row = self.conn.execute(
+                "SELECT messages FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            messages = trim_history(json.loads(row[0])) if row else []
+            self.sessions[session_id] = messages
+            return list(messages)
+
+    def save(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Trim to the budget and persist"""
+        messages = trim_history(messages)
+        with self.lock:
+            self.sessions[session_id] = messages
+            self.conn.execute("""
+                INSERT INTO chat_sessions (session_id, messages, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    messages = excluded.messages,
+                    updated_at = excluded.updated_at
+            """, (session_id, json.dumps(messages), time.time()))
+            self.conn.commit()
+
+    def clear(self, session_id: str) -> None:
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            self.conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self.conn.commit()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Dead-token probe state with exponential backoff
+
+The dead-token sweeps re-asked GeckoTerminal about every dead token on
+every run, and a token that doesn't answer costs up to three calls (pool,
+token pools list, best pool). Almost all of them stay dead, so each
+consecutive probe that finds no trading doubles the wait before the next
+one, from BASE_BACKOFF_SECONDS up to MAX_BACKOFF_SECONDS.
+
+A token is trading again once its most liquid pair holds
+LIQUIDITY_THRESHOLD (the same $1000 the ultra tracker and
+token-revival-checker use). Any fetcher that sees that can call revive(),
+which clears is_dead in crypto_calls and resets the token's backoff.
+
+Usage:
+
+    import dead_tokens
+    for token in dead_tokens.due(dead):
+        data = probe(token)
+        if data and dead_tokens.is_trading(data['liquidity_usd']):
+            dead_tokens.revive(supabase, [token['id']])
+        elif data is not None:
+            dead_tokens.record_miss(token['id'])
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+DEAD_PROBE_PATH = os.getenv(
+    "DEAD_PROBE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dead_probes.db")
+)
+
+LIQUIDITY_THRESHOLD = 1000           # USD liquidity for a token to count as alive
+BASE_BACKOFF_SECONDS = 6 * 3600      # wait after the first miss
+MAX_BACKOFF_SECONDS = 30 * 86400     # longest wait between probes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dead_probes (
+    token_id TEXT PRIMARY KEY,
+    misses INTEGER NOT NULL,        -- consecutive probes without trading
+    last_probe_at REAL NOT NULL,
+    next_probe_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DEAD_PROBE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def is_trading(liquidity_usd: Optional[float]) -> bool:
+    """Whether a pair with this liquidity means the token is alive"""
+    return (liquidity_usd or 0) >= LIQUIDITY_THRESHOLD
+
+
+def backoff_seconds(misses: int) -> float:
+    """Wait before the next probe after `misses` consecutive misses"""
+    if misses <= 0:
+        return 0
+    return min(BASE_BACKOFF_SECONDS * 2 ** min(misses - 1, 32), MAX_BACKOFF_SECONDS)
+
+
+def due(tokens: Iterable[Dict[str, Any]], key: str = 'id') -> List[Dict[str, Any]]:
+    """Tokens whose backoff has expired (or that were never probed)"""
+    tokens = list(tokens)
+    now = time.time()
+    waiting = set()
+    conn = _connection()
+    ids = [str(token[key]) for token in tokens]
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows = conn.execute(f"""
+            SELECT token_id FROM dead_probes
+            WHERE next_probe_at > ? AND token_id IN ({','.join('?' * len(chunk))})
+        """, [now] + chunk).fetchall()
+        waiting.update(token_id for token_id, in rows)
+    return [token for token in tokens if str(token[key]) not in waiting]
+
+
+def record_miss(token_id: Any) -> float:
+    """Record a probe that found no trading; returns when to probe next"""
+    now = time.time()
+    conn = _connection()
+    with conn:
+        row = conn.execute("SELECT misses FROM dead_probes WHERE token_id = ?", (str(token_id),)).fetchone()
+        misses = (row[0] if row else 0) + 1
+        next_probe_at = now + backoff_seconds(misses)
+        conn.execute("""
+            INSERT OR REPLACE INTO dead_probes (token_id, misses, last_probe_at, next_probe_at)
+            VALUES (?, ?, ?, ?)
+        """, (str(token_id), misses, now, next_probe_at))
+    return next_probe_at
+
+
+def record_alive(token_ids: Iterable[Any]) -> None:
+    """Forget the backoff of tokens seen trading"""
+    conn = _connection()
+    with conn:
+        conn.executemany("DELETE FROM dead_probes WHERE token_id = ?", [(str(t),) for t in token_ids])
+
+
+def revive(supabase, token_ids: Iterable[Any]) -> int:
+    """Clear is_dead for tokens seen trading again (one UPDATE) and reset their backoff"""
+    token_ids = list(token_ids)
+    if not token_ids:
+        return 0
+    supabase.table('crypto_calls').update({'is_dead': False}).in_('id', token_ids).execute()
+    record_alive(token_ids)
+    return len(token_ids)
+
+
+def summary() -> Dict[str, int]:
+    """Dead tokens tracked and how many are waiting out their backoff"""
+    now = time.time()
+    tracked, waiting = _connection().execute(
+        "SELECT COUNT(*), COALESCE(SUM(next_probe_at > ?), 0) FROM dead_probes", (now,)
+    ).fetchone()
+    return {'tracked': tracked, 'waiting': waiting}
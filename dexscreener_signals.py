@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+DexScreener research signals for /api/dexscreener/signals
+
+All upstream requests of one build run concurrently on a thread pool,
+paced by the rate_limiter buckets shared with the other scripts. The
+finished payload is cached for SIGNALS_TTL seconds and refreshed in the
+background while the page has viewers, so the upstream is hit at most
+once per TTL regardless of traffic.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+
+import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEXSCREENER_API = "https://api.dexscreener.com"
+
+# Focus on most popular categories for speed
+SEARCH_TERMS = [
+    'MEME', 'AI', 'PEPE', 'NEW', 'PUMP',
+    'MOON', 'ROCKET', 'BASE', 'SOL', 'ETH'
+]
+
+# Only look up pair data for this many boosted tokens
+MAX_BOOSTED_LOOKUPS = 20
+
+# /latest/dex/tokens accepts up to 30 comma-separated addresses
+TOKENS_PER_LOOKUP = 30
+
+SIGNALS_TTL = 60          # seconds a built payload is served from cache
+IDLE_TIMEOUT = 600        # stop background refreshes after this long without viewers
+FETCH_WORKERS = 8
+
+
+_session = requests.Session()
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="dexscreener")
+
+_cache_lock = threading.Lock()
+_build_lock = threading.Lock()
+_cache: Dict[str, Any] = {'payload': None, 'built_at': 0.0, 'last_access': 0.0}
+_refresher: Optional[threading.Thread] = None
+
+
+def _get_json(path: str) -> Optional[Any]:
+    """GET a DexScreener endpoint, returning parsed JSON or None"""
+    try:
+        response = rate_limiter.get(f"{DEXSCREENER_API}{path}", session=_session, timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        logger.warning(f"DexScreener {path} returned {response.status_code}")
+    except Exception as e:
+        logger.error(f"Error fetching {path}: {e}")
+    return None
+
+
+def _collect_tokens() -> Dict[str, Dict[str, Any]]:
+    """Fetch boosts, profiles and searches concurrently, merged in priority order"""
+    paths = ["/token-boosts/latest/v1", "/token-boosts/top/v1", "/token-profiles/latest/v1"]
+    paths += [f"/latest/dex/search?q={term}" for term in SEARCH_TERMS]
+    boosts_latest, boosts_top, profiles, *searches = _executor.map(_get_json, paths)
+
+    all_tokens = {}  # Use dict to track unique tokens
+
+    for boosts, source in ((boosts_latest, 'boosted_latest'), (boosts_top, 'boosted_top')):
+        for boost in (boosts or [])[:30]:
+            token_address = boost.get('tokenAddress')
+            if token_address and token_address not in all_tokens:
+                all_tokens[token_address] = {'boost': boost, 'source': source}
+
+    for profile in (profiles or [])[:50]:
+        token_address = profile.get('tokenAddress')
+        if token_address and token_address not in all_tokens:
+            all_tokens[token_address] = {'profile': profile, 'source': 'profiles'}
+
+    for term, data in zip(SEARCH_TERMS, searches):
+        pairs = (data or {}).get('pairs', [])[:30]
+        for pair in pairs:
+            token_address = pair.get('baseToken', {}).get('address')
+            if token_address and token_address not in all_tokens:
+                all_tokens[token_address] = {'pair': pair, 'source': f'search_{term}'}
+        logger.info(f"Found {len(pairs)} pairs for {term}")
+
+    return all_tokens
+
+
+def _lookup_pairs(addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+    """First pair per token address (lowercased), TOKENS_PER_LOOKUP addresses per request"""
+    chunks = [addresses[i:i + TOKENS_PER_LOOKUP] for i in range(0, len(addresses), TOKENS_PER_LOOKUP)]
+    paths = [f"/latest/dex/tokens/{','.join(chunk)}" for chunk in chunks]
+
+    pairs_by_token = {}
+    for data in _executor.map(_get_json, paths):
+        for pair in (data or {}).get('pairs') or []:
+            token_address = pair.get('baseToken', {}).get('address')
+            if token_address and token_address.lower() not in pairs_by_token:
+                pairs_by_token[token_address.lower()] = pair
+    return pairs_by_token
+
+
+def _attach_boosted_pairs(all_tokens: Dict[str, Dict[str, Any]]) -> None:
+    """Fill in pair data for the first MAX_BOOSTED_LOOKUPS boosted tokens that have one"""
+    boosted = [address for address, info in all_tokens.items() if 'boost' in info and 'pair' not in info]
+    found = 0
+    while boosted and found < MAX_BOOSTED_LOOKUPS:
+        wave, boosted = boosted[:MAX_BOOSTED_LOOKUPS - found], boosted[MAX_BOOSTED_LOOKUPS - found:]
+        pairs = _lookup_pairs(wave)
+        for address in wave:
+            if address.lower() in pairs:
+                all_tokens[address]['pair'] = pairs[address.lower()]
+                if all_tokens[address]['boost'].get('totalAmount', 0) > 0:
+                    found += 1
+
+
+def _token_data(token_address: str, token_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Flatten pair metrics for one token"""
+    pair = token_info.get('pair')
+    if not pair:
+        return None
+
+    # Extract key metrics
+    created_at = pair.get('pairCreatedAt')
+    if created_at:
+        age_hours = (time.time() * 1000 - created_at) / (1000 * 3600)
+    else:
+        age_hours = 9999  # Unknown age
+
+    liquidity_usd = pair.get('liquidity', {}).get('usd', 0)
+    volume_24h = pair.get('volume', {}).get('h24', 0)
+    volume_6h = pair.get('volume', {}).get('h6', 0)
+    volume_1h = pair.get('volume', {}).get('h1', 0)
+    price_change_24h = pair.get('priceChange', {}).get('h24', 0)
+    price_change_6h = pair.get('priceChange', {}).get('h6', 0)
+    price_change_1h = pair.get('priceChange', {}).get('h1', 0)
+    txns_24h = pair.get('txns', {}).get('h24', {})
+    total_txns = txns_24h.get('buys', 0) + txns_24h.get('sells', 0)
+
+    return {
+        'symbol': pair.get('baseToken', {}).get('symbol', 'N/A'),
+        'name': pair.get('baseToken', {}).get('name', ''),
+        'chain': pair.get('chainId', 'N/A'),
+        'address': token_address,
+        'age_hours': round(age_hours, 1),
+        'liquidity_usd': round(liquidity_usd),
+        'volume_24h': round(volume_24h),
+        'volume_6h': round(volume_6h),
+        'volume_1h': round(volume_1h),
+        'price_change_24h': price_change_24h,
+        'price_change_6h': price_change_6h,
+        'price_change_1h': price_change_1h,
+        'total_txns_24h': total_txns,
+        'url': pair.get('url', ''),
+        'source': token_info.get('source', 'unknown'),
+        'boost_amount': token_info.get('boost', {}).get('totalAmount', 0) if 'boost' in token_info else 0
+    }
+
+
+def build_signals() -> Dict[str, Any]:
+    """Fetch everything from DexScreener and categorize it (uncached)"""
+    start = time.time()
+    signals = {
+        'trending': [],
+        'new_launches': [],
+        'volume_spikes': [],
+        'top_gainers': [],
+        'boosted_tokens': [],
+        'high_activity': []
+    }
+
+    all_tokens = _collect_tokens()
+    _attach_boosted_pairs(all_tokens)
+
+    logger.info(f"Processing {len(all_tokens)} unique tokens...")
+    tokens_with_data = []
+    for token_address, token_info in all_tokens.items():
+        try:
+            token_data = _token_data(token_address, token_info)
+            if token_data:
+                tokens_with_data.append(token_data)
+        except Exception as e:
+            logger.error(f"Error processing token {token_address}: {e}")
+
+    # Categorize tokens
+    for token in tokens_with_data:
+        # Skip tokens with very low liquidity (likely scams)
+        if token['liquidity_usd'] < 1000:
+            continue
+
+        # New launches (< 24 hours, with decent liquidity)
+        if token['age_hours'] < 24 and token['liquidity_usd'] > 2000:
+            signals['new_launches'].append(token)
+
+        # Trending (high volume relative to liquidity)
+        if token['volume_24h'] > 0 and token['liquidity_usd'] > 0:
+            volume_to_liq_ratio = token['volume_24h'] / token['liquidity_usd']
+            if volume_to_liq_ratio > 0.5 and token['liquidity_usd'] > 5000:  # 50% daily volume
+                signals['trending'].append(token)
+
+        # Volume spikes
+        if token['volume_6h'] > 0 and token['volume_24h'] > 0:
+            projected_24h = token['volume_6h'] * 4
+            spike_ratio = projected_24h / token['volume_24h']
+            if spike_ratio > 1.5 and token['volume_6h'] > 5000:  # 50% spike
+                token['volume_spike_ratio'] = round(spike_ratio, 1)
+                signals['volume_spikes'].append(token)
+
+        # Top gainers
+        if token['price_change_6h'] > 50 and token['liquidity_usd'] > 3000:
+            signals['top_gainers'].append(token)
+
+        # Boosted tokens (that also have good metrics)
+        if token['boost_amount'] > 0 and token['liquidity_usd'] > 10000:
+            signals['boosted_tokens'].append(token)
+
+        # High activity (lots of transactions)
+        if token['total_txns_24h'] > 1000 and token['liquidity_usd'] > 5000:
+            signals['high_activity'].append(token)
+
+    # Sort and limit results
+    signals['new_launches'] = sorted(signals['new_launches'], key=lambda x: x['volume_24h'], reverse=True)[:20]
+    signals['trending'] = sorted(signals['trending'], key=lambda x: x['volume_24h'], reverse=True)[:20]
+    signals['volume_spikes'] = sorted(signals['volume_spikes'], key=lambda x: x.get('volume_spike_ratio', 0), reverse=True)[:20]
+    signals['top_gainers'] = sorted(signals['top_gainers'], key=lambda x: x['price_change_6h'], reverse=True)[:20]
+    signals['boosted_tokens'] = sorted(signals['boosted_tokens'], key=lambda x: x['boost_amount'], reverse=True)[:15]
+    signals['high_activity'] = sorted(signals['high_activity'], key=lambda x: x['total_txns_24h'], reverse=True)[:15]
+
+    total_signals = sum(len(category) for category in signals.values())
+    logger.info(f"Total signals generated: {total_signals} in {time.time() - start:.1f}s")
+
+    return {
+        'success': True,
+        'timestamp': datetime.now().isoformat(),
+        'signals': signals,
+        'summary': {
+            'new_launches': len(signals['new_launches']),
+            'trending': len(signals['trending']),
+            'volume_spikes': len(signals['volume_spikes']),
+            'top_gainers': len(signals['top_gainers']),
+            'boosted_tokens': len(signals['boosted_tokens']),
+            'high_activity': len(signals['high_activity']),
+            'total': total_signals
+        }
+    }
+
+
+def _refresh() -> Dict[str, Any]:
+    """Rebuild the cached payload; concurrent callers share one build"""
+    built_at = _cache['built_at']
+    with _build_lock:
+        # Another thread finished a build while we waited
+        if _cache['built_at'] != built_at and _cache['payload'] is not None:
+            return _cache['payload']
+        payload = build_signals()
+        with _cache_lock:
+            _cache['payload'] = payload
+            _cache['built_at'] = time.time()
+        return payload
+
+
+def _refresh_loop():
+    """Keep the cache warm while someone has looked at it recently"""
+    global _refresher
+    while True:
+        with _cache_lock:
+            idle = time.time() - _cache['last_access']
+            age = time.time() - _cache['built_at']
+        if idle > IDLE_TIMEOUT:
+            break
+        if age < SIGNALS_TTL * 0.8:
+            time.sleep(SIGNALS_TTL * 0.8 - age)
+            continue
+        try:
+            _refresh()
+        except Exception as e:
+            logger.error(f"Background DexScreener refresh failed: {e}")
+            time.sleep(SIGNALS_TTL * 0.2)
+    with _cache_lock:
+        _refresher = None
+    logger.info("DexScreener refresher stopped (no viewers)")
+
+
+def get_signals() -> Dict[str, Any]:
+    """Cached signals payload, building it on a cold cache"""
+    global _refresher
+    with _cache_lock:
+        _cache['last_access'] = time.time()
+        payload = _cache['payload']
+        fresh = payload is not None and time.time() - _cache['built_at'] < SIGNALS_TTL
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="dexscreener-refresh", daemon=True)
+            _refresher.start()
+
+    if fresh:
+        return payload
+    return _refresh()
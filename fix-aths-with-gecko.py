@@ -9,6 +9,7 @@ import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from ohlcv_cache import get_ohlcv
 
 # Load environment variables
 load_dotenv()
@@ -32,18 +33,24 @@ NETWORK_MAP = {
     'avalanche': 'avalanche-c'
 }
 
-def fetch_ohlcv(network, pool_address, timeframe='day', limit=1000):
-    """Fetch OHLCV data from GeckoTerminal"""
+def download_ohlcv(network, pool_address, timeframe, limit, before_timestamp=None):
+    """Download raw OHLCV data from GeckoTerminal; None if the API call failed"""
     url = f"https://api.geckoterminal.com/api/v2/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}"
     params = {"aggregate": 1, "limit": limit, "currency": "usd"}
+    if before_timestamp:
+        params["before_timestamp"] = before_timestamp
     headers = {"x-cg-pro-api-key": GECKO_API_KEY} if GECKO_API_KEY else {}
     
     response = requests.get(url, params=params, headers=headers, timeout=10)
     if response.status_code != 200:
-        return []
+        return None
     
     data = response.json()
-    ohlcv_list = data.get("data", {}).get("attributes", {}).get("ohlcv_list", [])
+    return data.get("data", {}).get("attributes", {}).get("ohlcv_list", [])
+
+def fetch_ohlcv(network, pool_address, timeframe='day', limit=1000):
+    """Fetch OHLCV data from GeckoTerminal through the local candle cache"""
+    ohlcv_list = get_ohlcv(network, pool_address, timeframe, limit, None, download_ohlcv) or []
     
     # Parse into candles
     candles = []
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Batched, cached GoPlus token security lookups
+
+The token_security endpoint takes a comma-separated list of addresses per
+chain, so lookups are grouped by chain and sent GOPLUS_BATCH_SIZE
+addresses at a time, with the chains fetched concurrently (all drawing
+from the shared 'goplus' rate limiter bucket).
+
+Honeypot flags, owner renounce and LP lock status rarely change once a
+token is live, so results are kept in SQLite for SECURITY_TTL_SECONDS;
+tokens GoPlus has not indexed yet are asked again sooner.
+
+Usage:
+
+    from goplus_security import chain_id_for, lookup
+    results = lookup({'1': ['0xabc...', ...], '56': [...]})
+    results[('1', '0xabc...')]   # GoPlus result dict, or None if unknown
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import rate_limiter
+
+SECURITY_CACHE_PATH = os.getenv(
+    "SECURITY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "security_cache.db")
+)
+
+GOPLUS_API = "https://api.gopluslabs.io/api/v1/token_security"
+
+GOPLUS_BATCH_SIZE = 30               # addresses per request
+SECURITY_TTL_SECONDS = 7 * 86400     # cached result reused for a week
+MISSING_TTL_SECONDS = 6 * 3600       # not indexed by GoPlus yet: ask again sooner
+
+CHAIN_IDS = {
+    'ethereum': '1',
+    'eth': '1',
+    'bsc': '56',
+    'polygon': '137',
+    'arbitrum': '42161',
+    'solana': 'solana',
+    'base': '8453',
+    'avalanche': '43114'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS goplus_security (
+    chain_id TEXT NOT NULL,
+    address TEXT NOT NULL,          -- lowercased
+    result TEXT,                    -- JSON; NULL: GoPlus returned nothing
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, address)
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(SECURITY_CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def chain_id_for(network: str) -> Optional[str]:
+    """GoPlus chain id for a network name, or None if unsupported"""
+    return CHAIN_IDS.get((network or '').lower())
+
+
+def download_security(chain_id: str, addresses: List[str]) -> Optional[Dict[str, dict]]:
+    """GoPlus results keyed by lowercased address; None if the call failed"""
+    try:
+        response = rate_limiter.get(f"{GOPLUS_API}/{chain_id}",
+                                    params={'contract_addresses': ','.join(addresses)}, timeout=30)
+    except Exception as e:
+        print(f"GoPlus API error for chain {chain_id}: {e}")
+        return None
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if data.get('code') not in (1, None):
+        return None
+    return {address.lower(): result for address, result in (data.get('result') or {}).items()}
+
+
+def _cached(chain_id: str, addresses: List[str]) -> Dict[str, Optional[dict]]:
+    """Fresh cache entries for `addresses` (lowercased)"""
+    now = time.time()
+    found = {}
+    conn = _connection()
+    for i in range(0, len(addresses), 500):
+        chunk = addresses[i:i + 500]
+        rows = conn.execute(f"""
+            SELECT address, result, fetched_at FROM goplus_security
+            WHERE chain_id = ? AND address IN ({','.join('?' * len(chunk))})
+        """, [chain_id] + chunk).fetchall()
+        for address, result, fetched_at in rows:
+            ttl = SECURITY_TTL_SECONDS if result else MISSING_TTL_SECONDS
+            if now - fetched_at < ttl:
+                found[address] = json.loads(result) if result else None
+    return found
+
+
+def lookup_chain(chain_id: str, addresses: List[str]) -> Dict[str, Optional[dict]]:
+    """Security results for one chain keyed by lowercased address.
+
+    Addresses whose request failed are left out, so callers can try them
+    again later.
+    """
+    addresses = sorted({address.lower() for address in addresses})
+    results = _cached(chain_id, addresses)
+    missing = [address for address in addresses if address not in results]
+
+    conn = _connection()
+    for i in range(0, len(missing), GOPLUS_BATCH_SIZE):
+        chunk = missing[i:i + GOPLUS_BATCH_SIZE]
+        downloaded = download_security(chain_id, chunk)
+        if downloaded is None:
+            continue
+        now = time.time()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO goplus_security (chain_id, address, result, fetched_at)
+                VALUES (?, ?, ?, ?)
+            """, [(chain_id, address, json.dumps(downloaded[address]) if downloaded.get(address) else None, now)
+                  for address in chunk])
+        for address in chunk:
+            results[address] = downloaded.get(address) or None
+    return results
+
+
+def lookup(addresses_by_chain: Dict[str, List[str]]) -> Dict[Tuple[str, str], Optional[dict]]:
+    """Security results for many chains at once, keyed by (chain_id, lowercased address)"""
+    if not addresses_by_chain:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(addresses_by_chain)) as executor:
+        per_chain = dict(zip(addresses_by_chain, executor.map(
+            lambda item: lookup_chain(*item), addresses_by_chain.items()
+        )))
+    return {(chain_id, address): result
+            for chain_id, results in per_chain.items()
+            for address, result in results.items()}
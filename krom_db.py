@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite access layer for krom_calls.db
+
+- WAL journal mode so readers never block behind the writer
+- Pool of read-only connections, one checked out per request thread
+- Single serialized writer connection for download_krom_calls
+- Schema hooks so feature modules can create their tables/indexes once
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "krom_calls.db"
+
+# Maximum number of idle read connections kept around
+READ_POOL_SIZE = 16
+
+_pool_lock = threading.Lock()
+_idle_readers: List[sqlite3.Connection] = []
+
+_write_lock = threading.RLock()
+_writer: Optional[sqlite3.Connection] = None
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_schema_hooks: List[Callable[[sqlite3.Connection], None]] = []
+
+# Bumped after every committed write so caches can key on it
+_write_generation = 0
+
+
+def _open(readonly: bool) -> sqlite3.Connection:
+    """Open a new connection to the calls database"""
+    if not os.path.exists(DB_PATH):
+        raise FileNotFoundError(f"Database not found: {DB_PATH}")
+
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def register_schema(hook: Callable[[sqlite3.Connection], None]) -> None:
+    """Register a function that creates tables/indexes on first use.
+
+    Hooks run once per process on the writer connection, in registration
+    order, and must be idempotent (CREATE ... IF NOT EXISTS).
+    """
+    global _schema_ready
+    with _schema_lock:
+        _schema_hooks.append(hook)
+        _schema_ready = False
+
+
+def _ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with _transaction() as conn:
+            for hook in _schema_hooks:
+                hook(conn)
+        _schema_ready = True
+
+
+@contextmanager
+def read_connection(row_factory=None):
+    """Check out a read-only connection from the pool.
+
+    No global lock is taken, so any number of threads can read concurrently
+    while download_krom_calls is writing.
+    """
+    _ensure_schema()
+
+    with _pool_lock:
+        conn = _idle_readers.pop() if _idle_readers else None
+    if conn is None:
+        conn = _open(readonly=True)
+
+    conn.row_factory = row_factory
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.row_factory = None
+        with _pool_lock:
+            if len(_idle_readers) < READ_POOL_SIZE:
+                _idle_readers.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+@contextmanager
+def _transaction():
+    global _writer, _write_generation
+    with _write_lock:
+        if _writer is None:
+            _writer = _open(readonly=False)
+        try:
+            yield _writer
+            _writer.commit()
+        except Exception:
+            _writer.rollback()
+            raise
+        _write_generation += 1
+
+
+@contextmanager
+def write_connection():
+    """Serialized access to the single writer connection.
+
+    Everything inside the block is one transaction: committed on success,
+    rolled back on error.
+    """
+    _ensure_schema()
+    with _transaction() as conn:
+        yield conn
+
+
+def data_version() -> int:
+    """Counter that changes whenever this process commits a write"""
+    return _write_generation
+
+
+def close_all() -> None:
+    """Close every pooled connection (used on shutdown and in scripts)"""
+    global _writer
+    with _pool_lock:
+        while _idle_readers:
+            _idle_readers.pop().close()
+    with _write_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Keyset (cursor) pagination for the calls table
+
+Pages are addressed by the (sort value, rowid) of the last row seen, so
+every page is an index seek instead of an OFFSET scan. Row counts are
+cached per data version so the list endpoint does not COUNT(*) on every
+request.
+"""
+
+import json
+import time
+import base64
+import threading
+from typing import Any, List, Optional, Tuple
+
+from krom_db import register_schema, data_version
+
+# Columns /api/calls may sort by; each gets an index created at startup
+SORT_COLUMNS = ['buy_timestamp', 'roi', 'symbol', 'network']
+
+# Re-count at least this often so writes from other processes show up
+COUNT_TTL_SECONDS = 60
+
+_count_lock = threading.Lock()
+_count_cache = {'version': None, 'time': 0.0, 'total': 0}
+
+
+def ensure_sort_indexes(conn) -> None:
+    """One index per sortable column; rowid rides along as the tie-breaker"""
+    for column in SORT_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_calls_sort_{column} ON calls({column})")
+
+
+def encode_cursor(value: Any, rowid: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    raw = json.dumps([value, rowid]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Inverse of encode_cursor; raises ValueError on garbage"""
+    try:
+        value, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(rowid)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_segments(sort_by: str, sort_order: str, cursor: str) -> List[Tuple[str, List]]:
+    """WHERE conditions selecting the rows after the cursor, in page order.
+
+    SQLite sorts NULLs first ascending and last descending, and a row-value
+    comparison never matches NULL, so the NULL run is its own segment. Each
+    segment is a single ordered range on the sort index.
+    """
+    value, rowid = decode_cursor(cursor)
+    if sort_order == 'ASC':
+        if value is None:
+            return [
+                (f"{sort_by} IS NULL AND rowid > ?", [rowid]),
+                (f"{sort_by} IS NOT NULL", []),
+            ]
+        return [(f"({sort_by}, rowid) > (?, ?)", [value, rowid])]
+
+    if value is None:
+        return [(f"{sort_by} IS NULL AND rowid < ?", [rowid])]
+    return [
+        (f"({sort_by}, rowid) < (?, ?)", [value, rowid]),
+        (f"{sort_by} IS NULL", []),
+    ]
+
+
+def fetch_page(cursor, sort_by: str, sort_order: str, per_page: int,
+               after: Optional[str] = None, offset: int = 0) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page of calls and the cursor for the next page.
+
+    With `after` the page is a keyset seek. Without it, `offset` is applied
+    to an index-only scan of rowids so only the returned rows are read from
+    the table.
+    """
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort column: {sort_by}")
+    direction = 'ASC' if sort_order == 'ASC' else 'DESC'
+    order = f"{sort_by} {direction}, rowid {direction}"
+
+    if after:
+        rows = []
+        for where, params in keyset_segments(sort_by, direction, after):
+            cursor.execute(f"""
+                SELECT rowid AS cursor_rowid, *
+                FROM calls
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT ?
+            """, params + [per_page + 1 - len(rows)])
+            rows.extend(dict(row) for row in cursor.fetchall())
+            if len(rows) > per_page:
+                break
+    else:
+        cursor.execute(f"""
+            SELECT rowid AS cursor_rowid, *
+            FROM calls
+            WHERE rowid IN (
+                SELECT rowid FROM calls
+                ORDER BY {order}
+                LIMIT ? OFFSET ?
+            )
+            ORDER BY {order}
+        """, (per_page + 1, offset))
+        rows = [dict(row) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_by], last['cursor_rowid'])
+    for row in rows:
+        row.pop('cursor_rowid', None)
+    return rows, next_cursor
+
+
+def cached_total(cursor) -> int:
+    """Row count of calls, recomputed only after writes or every COUNT_TTL_SECONDS"""
+    version = data_version()
+    with _count_lock:
+        fresh = (
+            _count_cache['version'] == version
+            and time.time() - _count_cache['time'] < COUNT_TTL_SECONDS
+        )
+        if fresh:
+            return _count_cache['total']
+
+    cursor.execute("SELECT COUNT(*) FROM calls")
+    total = cursor.fetchone()[0]
+    with _count_lock:
+        _count_cache.update(version=version, time=time.time(), total=total)
+    return total
+
+
+register_schema(ensure_sort_indexes)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Result cache and query budget for the LLM database tools
+
+query_krom_database, create_chart and execute_analysis often re-run the
+same SQL or analysis code. Results are cached under the normalized query
+text plus krom_db.data_version(), so any download_krom_calls write
+invalidates them. Every query runs under a sqlite progress handler that
+aborts it once its time budget is spent, and result sets are capped at a
+maximum row count.
+"""
+
+import re
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from krom_db import DB_PATH, read_connection, data_version
+from conversation_store import LRUDict
+
+MAX_QUERY_ROWS = 5000
+MAX_QUERY_SECONDS = 5.0
+
+# Cached results also expire so writes from other processes show up
+CACHE_TTL_SECONDS = 300
+CACHE_SIZE = 256
+
+# VM instructions between progress handler checks
+PROGRESS_INTERVAL = 10000
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# String literals ('' escapes a quote) and quoted identifiers, kept verbatim;
+# an unterminated one runs to the end of the text
+QUOTED = re.compile(r"""('(?:[^']|'')*(?:'|$)|"(?:[^"]|"")*(?:"|$))""")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside quotes and drop trailing semicolons so equivalent text shares a cache entry"""
+    parts = QUOTED.split(sql)
+    # split() with a group alternates unquoted text (even) and quoted text (odd)
+    parts[::2] = [re.sub(r'\s+', ' ', part) for part in parts[::2]]
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+class ResultCache:
+    """LRU of results keyed by (key, data version) with a TTL"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL_SECONDS):
+        self.lock = threading.Lock()
+        self.entries = LRUDict(maxsize)
+        self.ttl = ttl
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Cached value for `key`, or compute() it and cache it if cacheable(value)"""
+        full_key = (key, data_version())
+        with self.lock:
+            entry = self.entries.get(full_key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self.entries.move_to_end(full_key)
+                return entry[1]
+
+        value = compute()
+        if cacheable(value):
+            with self.lock:
+                self.entries[full_key] = (time.time(), value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+result_cache = ResultCache()
+
+
+def install_budget(conn: sqlite3.Connection, max_seconds: float) -> None:
+    """Abort any statement on `conn` that runs past the deadline"""
+    deadline = time.monotonic() + max_seconds
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_INTERVAL)
+
+
+@contextmanager
+def budget(conn: sqlite3.Connection, max_seconds: float = MAX_QUERY_SECONDS):
+    """Time budget for the statements run inside the block"""
+    install_budget(conn, max_seconds)
+    try:
+        yield conn
+    except sqlite3.OperationalError as e:
+        if 'interrupted' in str(e):
+            raise QueryBudgetExceeded(f"Query exceeded the {max_seconds:g}s time limit")
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+class BudgetedCursor(sqlite3.Cursor):
+    """Cursor whose fetchall() refuses result sets over the connection's row limit"""
+
+    def fetchall(self):
+        max_rows = self.connection.max_rows
+        rows = self.fetchmany(max_rows + 1)
+        if len(rows) > max_rows:
+            raise QueryBudgetExceeded(
+                f"Query returned more than {max_rows} rows; aggregate in SQL or add a LIMIT"
+            )
+        return rows
+
+
+class BudgetedConnection(sqlite3.Connection):
+    """Connection whose cursors (including the ones pd.read_sql makes) are BudgetedCursors"""
+
+    max_rows = MAX_QUERY_ROWS
+
+    def cursor(self, factory=BudgetedCursor):
+        return super().cursor(factory)
+
+
+def open_budgeted_connection(max_seconds: float = MAX_QUERY_SECONDS,
+                             max_rows: int = MAX_QUERY_ROWS) -> sqlite3.Connection:
+    """Fresh read-only connection with a row cap and a time budget shared by all its statements"""
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True,
+                           check_same_thread=False, factory=BudgetedConnection)
+    conn.max_rows = max_rows
+    install_budget(conn, max_seconds)
+    return conn
+
+
+def run_query(sql: str, params: Optional[List] = None,
+              max_rows: int = MAX_QUERY_ROWS,
+              max_seconds: float = MAX_QUERY_SECONDS) -> Dict[str, Any]:
+    """Run a read-only query with caching, a time budget and a row cap.
+
+    Returns {'columns', 'rows' (list of dicts), 'truncated'}. Raises
+    QueryBudgetExceeded if the time budget runs out.
+    """
+    key = ('sql', normalize_sql(sql), tuple(params or ()), max_rows)
+
+    def compute():
+        with read_connection(row_factory=sqlite3.Row) as conn:
+            with budget(conn, max_seconds):
+                cursor = conn.execute(sql, params or [])
+                columns = [description[0] for description in cursor.description] if cursor.description else []
+                rows = cursor.fetchmany(max_rows + 1) if cursor.description else []
+        return {
+            'columns': columns,
+            'rows': [dict(row) for row in rows[:max_rows]],
+            'truncated': len(rows) > max_rows
+        }
+
+    return result_cache.get_or_compute(key, compute)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Materialized analytics rollups for krom_calls.db
+
+call_rollups keeps one row per (group_name, network, hour_bucket) with the
+aggregates the dashboard needs. hour_bucket is buy_timestamp / 3600, so the
+day and hour-of-day of a cell can be derived from it.
+
+Triggers on the calls table recompute only the cells touched by an INSERT,
+UPDATE or DELETE, so download_krom_calls (or any other writer) keeps the
+rollups current without a full rebuild.
+"""
+
+import time
+import logging
+from typing import List, Optional, Tuple
+
+from krom_db import register_schema
+
+logger = logging.getLogger(__name__)
+
+HOUR_BUCKET = "CAST(buy_timestamp / 3600 AS INTEGER)"
+
+# Aggregates over calls that produce one rollup row (roi IS NOT NULL only)
+ROLLUP_AGGREGATES = """
+    COUNT(*),
+    SUM(roi),
+    SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END),
+    MAX(roi),
+    SUM(CASE WHEN roi >= 10 THEN 1 ELSE 0 END),
+    COALESCE(SUM(CASE WHEN top_timestamp > buy_timestamp
+        THEN (top_timestamp - buy_timestamp) / 60.0 END), 0),
+    SUM(CASE WHEN top_timestamp > buy_timestamp THEN 1 ELSE 0 END)
+"""
+
+ROLLUP_COLUMNS = """
+    group_name, network, hour_bucket,
+    call_count, roi_sum, wins, max_roi, moonshots,
+    peak_minutes_sum, peak_count
+"""
+
+
+def _refresh_cell_sql(row: str) -> str:
+    """Statements that rebuild the rollup cell of the OLD or NEW row"""
+    cell = f"""
+        group_name IS {row}.group_name
+        AND network IS {row}.network
+        AND hour_bucket IS CAST({row}.buy_timestamp / 3600 AS INTEGER)
+    """
+    return f"""
+        DELETE FROM call_rollups WHERE {cell};
+        INSERT INTO call_rollups ({ROLLUP_COLUMNS})
+        SELECT group_name, network, {HOUR_BUCKET}, {ROLLUP_AGGREGATES}
+        FROM calls
+        WHERE group_name IS {row}.group_name
+        AND network IS {row}.network
+        AND {HOUR_BUCKET} IS CAST({row}.buy_timestamp / 3600 AS INTEGER)
+        AND roi IS NOT NULL
+        GROUP BY group_name, network, {HOUR_BUCKET};
+    """
+
+
+def rebuild_rollups(conn) -> None:
+    """Recompute every rollup cell from the calls table"""
+    conn.execute("DELETE FROM call_rollups")
+    conn.execute(f"""
+        INSERT INTO call_rollups ({ROLLUP_COLUMNS})
+        SELECT group_name, network, {HOUR_BUCKET}, {ROLLUP_AGGREGATES}
+        FROM calls
+        WHERE roi IS NOT NULL
+        GROUP BY group_name, network, {HOUR_BUCKET}
+    """)
+
+
+def ensure_rollups(conn) -> None:
+    """Create rollup table, index and triggers; backfill if empty"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS call_rollups (
+            group_name TEXT,
+            network TEXT,
+            hour_bucket INTEGER,
+            call_count INTEGER NOT NULL,
+            roi_sum REAL NOT NULL,
+            wins INTEGER NOT NULL,
+            max_roi REAL,
+            moonshots INTEGER NOT NULL,
+            peak_minutes_sum REAL NOT NULL,
+            peak_count INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_call_rollups_cell
+        ON call_rollups(group_name, network, hour_bucket)
+    """)
+    # Lets the triggers find the calls of one cell without a table scan
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_calls_rollup_cell
+        ON calls(group_name, network, {HOUR_BUCKET})
+    """)
+
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_insert
+        AFTER INSERT ON calls
+        BEGIN
+            {_refresh_cell_sql('NEW')}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_delete
+        AFTER DELETE ON calls
+        BEGIN
+            {_refresh_cell_sql('OLD')}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_calls_rollup_update
+        AFTER UPDATE OF roi, group_name, network, buy_timestamp, top_timestamp ON calls
+        BEGIN
+            {_refresh_cell_sql('OLD')}
+            {_refresh_cell_sql('NEW')}
+        END;
+    """)
+
+    has_rollups = conn.execute("SELECT 1 FROM call_rollups LIMIT 1").fetchone()
+    has_calls = conn.execute("SELECT 1 FROM calls WHERE roi IS NOT NULL LIMIT 1").fetchone()
+    if has_calls and not has_rollups:
+        logger.info("Backfilling call_rollups from calls table")
+        start = time.time()
+        rebuild_rollups(conn)
+        logger.info(f"Rollups built in {time.time() - start:.1f}s")
+
+
+def rollup_source(since: Optional[int] = None) -> Tuple[str, List]:
+    """Derived table of rollup rows for calls with buy_timestamp > since.
+
+    Whole hours after `since` come straight from call_rollups; the partial
+    hour containing `since` is aggregated from calls so results stay exact.
+    Returns (sql, params) to use as `FROM {sql}`.
+    """
+    if since is None:
+        return "call_rollups", []
+
+    first_full_hour = since // 3600 + 1
+    sql = f"""(
+        SELECT {ROLLUP_COLUMNS} FROM call_rollups
+        WHERE hour_bucket >= ?
+        UNION ALL
+        SELECT group_name, network, {HOUR_BUCKET}, {ROLLUP_AGGREGATES}
+        FROM calls
+        WHERE roi IS NOT NULL
+        AND buy_timestamp > ? AND buy_timestamp < ?
+        GROUP BY group_name, network, {HOUR_BUCKET}
+    )"""
+    return sql, [first_full_hour, since, first_full_hour * 3600]
+
+
+register_schema(ensure_rollups)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Token search index for krom_calls.db
+
+- calls_search: FTS5 trigram index over symbol, name and contract_address,
+  kept in sync with the calls table by triggers
+- idx_calls_contract_nocase: case-insensitive index used for the
+  contract-address prefix fast path
+
+Falls back to the LIKE scan if this SQLite build has no FTS5/trigram.
+"""
+
+import re
+import sqlite3
+import logging
+from typing import Any, Dict, List
+
+from krom_db import register_schema
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COLUMNS = ['symbol', 'name', 'contract_address']
+
+# Trigram tokens need at least 3 characters to be matched by the index
+MIN_FTS_QUERY = 3
+
+# Queries that look like (the start of) a contract address
+ADDRESS_PREFIX = re.compile(r'^(0X[0-9A-F]{4,}|[0-9A-Z]{16,})$')
+
+_fts_enabled = False
+
+TOKEN_AGGREGATE = '''
+    SELECT
+        symbol,
+        COUNT(*) as call_count,
+        AVG(roi) as avg_roi,
+        MAX(roi) as best_roi,
+        SUM(CASE WHEN roi > 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as win_rate,
+        MIN(buy_timestamp) as first_call,
+        MAX(buy_timestamp) as last_call
+    FROM calls
+'''
+
+
+def ensure_search_index(conn) -> None:
+    """Create the FTS table, sync triggers and prefix index; backfill once"""
+    global _fts_enabled
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_calls_contract_nocase
+        ON calls(contract_address COLLATE NOCASE)
+    """)
+
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(calls)")}
+    columns = [c for c in SEARCH_COLUMNS if c in existing]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'calls_search'"
+    ).fetchone()
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS calls_search USING fts5(
+                {column_list},
+                content='calls', content_rowid='rowid', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 trigram search unavailable, using LIKE scans: {e}")
+        _fts_enabled = False
+        return
+
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_calls_search_insert
+        AFTER INSERT ON calls
+        BEGIN
+            INSERT INTO calls_search(rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_calls_search_delete
+        AFTER DELETE ON calls
+        BEGIN
+            INSERT INTO calls_search(calls_search, rowid, {column_list})
+            VALUES ('delete', old.rowid, {old_values});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_calls_search_update
+        AFTER UPDATE OF {column_list} ON calls
+        BEGIN
+            INSERT INTO calls_search(calls_search, rowid, {column_list})
+            VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO calls_search(rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END;
+    """)
+
+    if created:
+        logger.info("Building calls_search index")
+        conn.execute("INSERT INTO calls_search(calls_search) VALUES ('rebuild')")
+    _fts_enabled = True
+
+
+def search_tokens(cursor, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Tokens whose symbol, name or contract address contains `query`.
+
+    Address-looking queries use a prefix seek on the contract index, 3+
+    character queries use the trigram index, anything shorter scans.
+    """
+    if ADDRESS_PREFIX.match(query):
+        where, params = "contract_address LIKE ?", [f'{query}%']
+    elif _fts_enabled and len(query) >= MIN_FTS_QUERY:
+        phrase = '"' + query.replace('"', '""') + '"'
+        where = "rowid IN (SELECT rowid FROM calls_search WHERE calls_search MATCH ?)"
+        params = [phrase]
+    else:
+        where = "symbol LIKE ? OR contract_address LIKE ?"
+        params = [f'%{query}%', f'%{query}%']
+
+    cursor.execute(f'''
+        {TOKEN_AGGREGATE}
+        WHERE {where}
+        GROUP BY symbol
+        ORDER BY call_count DESC
+        LIMIT ?
+    ''', params + [limit])
+
+    tokens = []
+    for row in cursor.fetchall():
+        tokens.append({
+            'symbol': row[0],
+            'call_count': row[1],
+            'avg_roi': row[2],
+            'best_roi': row[3],
+            'win_rate': row[4],
+            'first_call': row[5],
+            'last_call': row[6]
+        })
+    return tokens
+
+
+register_schema(ensure_search_index)
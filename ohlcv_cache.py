@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Local OHLCV candle store shared by the ATH scripts
+
+Candles from GeckoTerminal are kept in SQLite keyed by (network, pool,
+timeframe, timestamp). For every series we also remember the time range
+whose candles are known to be complete, so a request that falls inside it
+is answered locally and a request for recent data only downloads the
+candles after the last cached one.
+
+Minute candles are the finest resolution and are stored once per pool:
+every complete minute range is remembered (a pool may have several, e.g.
+around different calls) and hour/day rollups are derived from them
+locally. Historical price and ATH lookups are then answered from the
+index, downloading only the minutes not covered yet:
+
+    from ohlcv_cache import price_at, max_high
+    price, candle_ts = price_at(network, pool, call_ts, download_ohlcv)
+    ath, ath_ts = max_high(network, pool, call_ts, now, download_ohlcv)
+
+It also keeps per-token ATH high-water marks for incremental ATH refreshes
+(see get_ath_mark / set_ath_mark).
+
+Usage in a script:
+
+    from ohlcv_cache import get_ohlcv
+    candles = get_ohlcv(network, pool, 'day', 1000, None, download_ohlcv)
+
+where download_ohlcv(network, pool, timeframe, limit, before_timestamp)
+returns the raw ohlcv_list from the API, or None if the call failed.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Callable, List, Optional, Tuple
+
+CANDLE_DB_PATH = os.getenv(
+    "OHLCV_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ohlcv_cache.db")
+)
+
+TIMEFRAME_SECONDS = {'day': 86400, 'hour': 3600, 'minute': 60}
+
+# Largest `limit` GeckoTerminal accepts
+MAX_LIMIT = 1000
+
+# Rollups derived from minute candles, coarsest first
+ROLLUP_LEVELS = (('day', 86400), ('hour', 3600))
+
+# price_at: use the minute candle closest to T within this distance
+PRICE_TOLERANCE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ohlcv_candles (
+    network TEXT NOT NULL,
+    pool_address TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume REAL,
+    PRIMARY KEY (network, pool_address, timeframe, timestamp)
+) WITHOUT ROWID;
+
+-- Candles with first_ts <= timestamp < last_ts are all cached;
+-- first_ts = 0 means the series is cached back to its first candle
+CREATE TABLE IF NOT EXISTS ohlcv_coverage (
+    network TEXT NOT NULL,
+    pool_address TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    PRIMARY KEY (network, pool_address, timeframe)
+) WITHOUT ROWID;
+
+-- Every range [first_ts, last_ts) known to be complete; ranges of one
+-- series never overlap (they are merged on insert)
+CREATE TABLE IF NOT EXISTS ohlcv_ranges (
+    network TEXT NOT NULL,
+    pool_address TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    first_ts INTEGER NOT NULL,
+    last_ts INTEGER NOT NULL,
+    PRIMARY KEY (network, pool_address, timeframe, first_ts)
+) WITHOUT ROWID;
+
+-- Hour and day candles derived from cached minute candles; high_ts is the
+-- minute of the high. Only buckets inside a complete minute range are whole.
+CREATE TABLE IF NOT EXISTS ohlcv_rollups (
+    network TEXT NOT NULL,
+    pool_address TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    high_ts INTEGER,
+    low REAL,
+    close REAL,
+    volume REAL,
+    PRIMARY KEY (network, pool_address, timeframe, timestamp)
+) WITHOUT ROWID;
+
+-- Candles up to checked_ts have been compared against ath_price
+CREATE TABLE IF NOT EXISTS ath_marks (
+    token_id TEXT PRIMARY KEY,
+    ath_price REAL NOT NULL,
+    checked_ts INTEGER NOT NULL
+);
+"""
+
+Candle = list  # [timestamp, open, high, low, close, volume], as returned by the API
+Downloader = Callable[[str, str, str, int, Optional[int]], Optional[List[Candle]]]
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process, for multiprocessing pools)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(CANDLE_DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _coverage(conn, key: Tuple[str, str, str]) -> Optional[Tuple[int, int]]:
+    return conn.execute("""
+        SELECT first_ts, last_ts FROM ohlcv_coverage
+        WHERE network = ? AND pool_address = ? AND timeframe = ?
+    """, key).fetchone()
+
+
+def _cached(conn, key: Tuple[str, str, str], first_ts: int, bound: int, limit: int) -> List[Candle]:
+    """Newest `limit` cached candles before `bound`, newest first like the API"""
+    rows = conn.execute("""
+        SELECT timestamp, open, high, low, close, volume FROM ohlcv_candles
+        WHERE network = ? AND pool_address = ? AND timeframe = ?
+          AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp DESC
+        LIMIT ?
+    """, key + (first_ts, bound, limit)).fetchall()
+    return [list(row) for row in rows]
+
+
+def _add_range(conn, key: Tuple[str, str, str], first_ts: int, last_ts: int) -> None:
+    """Record a complete range, merging it with the ranges it touches"""
+    touching = conn.execute("""
+        SELECT first_ts, last_ts FROM ohlcv_ranges
+        WHERE network = ? AND pool_address = ? AND timeframe = ?
+          AND first_ts <= ? AND last_ts >= ?
+    """, key + (last_ts, first_ts)).fetchall()
+    for old_first, old_last in touching:
+        first_ts, last_ts = min(first_ts, old_first), max(last_ts, old_last)
+    conn.execute("""
+        DELETE FROM ohlcv_ranges
+        WHERE network = ? AND pool_address = ? AND timeframe = ?
+          AND first_ts >= ? AND first_ts <= ?
+    """, key + (first_ts, last_ts))
+    conn.execute("""
+        INSERT INTO ohlcv_ranges (network, pool_address, timeframe, first_ts, last_ts)
+        VALUES (?, ?, ?, ?, ?)
+    """, key + (first_ts, last_ts))
+
+
+def _gaps(conn, key: Tuple[str, str, str], start: int, end: int) -> List[Tuple[int, int]]:
+    """Parts of [start, end) not inside a complete range, newest first"""
+    ranges = conn.execute("""
+        SELECT first_ts, last_ts FROM ohlcv_ranges
+        WHERE network = ? AND pool_address = ? AND timeframe = ?
+          AND first_ts < ? AND last_ts > ?
+        ORDER BY first_ts
+    """, key + (end, start)).fetchall()
+    gaps, cursor = [], start
+    for first_ts, last_ts in ranges:
+        if first_ts > cursor:
+            gaps.append((cursor, first_ts))
+        cursor = max(cursor, last_ts)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps[::-1]
+
+
+def _rollup(conn, network: str, pool_address: str, candles: List[Candle]) -> None:
+    """Rebuild the hour/day rollups of every bucket the new minute candles touch"""
+    for timeframe, step in ROLLUP_LEVELS:
+        for bucket in {int(c[0]) // step * step for c in candles}:
+            rows = conn.execute("""
+                SELECT timestamp, open, high, low, close, volume FROM ohlcv_candles
+                WHERE network = ? AND pool_address = ? AND timeframe = 'minute'
+                  AND timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp
+            """, (network, pool_address, bucket, bucket + step)).fetchall()
+            highs = [row for row in rows if row[2] is not None]
+            if not highs:
+                continue
+            peak = max(highs, key=lambda row: (row[2], -row[0]))
+            conn.execute("""
+                INSERT OR REPLACE INTO ohlcv_rollups
+                    (network, pool_address, timeframe, timestamp, open, high, high_ts, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (network, pool_address, timeframe, bucket, rows[0][1], peak[2], peak[0],
+                  min((row[3] for row in rows if row[3] is not None), default=None),
+                  rows[-1][4], sum(row[5] or 0 for row in rows)))
+
+
+def _record(conn, key: Tuple[str, str, str], candles: List[Candle], requested: int, final_bound: int) -> None:
+    """Store downloaded candles and extend the series' complete range"""
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO ohlcv_candles
+                (network, pool_address, timeframe, timestamp, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [key + tuple(candle[:6]) for candle in candles])
+
+        # A short page means there is nothing older to fetch
+        first_ts = min(c[0] for c in candles) if len(candles) >= requested else 0
+        last_ts = final_bound
+        if first_ts > last_ts:
+            return
+
+        _add_range(conn, key, first_ts, last_ts)
+        if key[2] == 'minute' and candles:
+            _rollup(conn, key[0], key[1], candles)
+
+        old = _coverage(conn, key)
+        if old:
+            if first_ts <= old[1] and last_ts >= old[0]:
+                first_ts, last_ts = min(first_ts, old[0]), max(last_ts, old[1])
+            elif old[1] > last_ts:
+                # Disjoint older window; keep the more recent range
+                return
+
+        conn.execute("""
+            INSERT OR REPLACE INTO ohlcv_coverage (network, pool_address, timeframe, first_ts, last_ts)
+            VALUES (?, ?, ?, ?, ?)
+        """, key + (first_ts, last_ts))
+
+
+def get_ohlcv(network: str, pool_address: str, timeframe: str, limit: int,
+              before_timestamp: Optional[int], download: Downloader) -> Optional[List[Candle]]:
+    """OHLCV candles read through the local store.
+
+    Same contract as a direct API call: the newest `limit` candles before
+    `before_timestamp` (or now), newest first, or None if a download failed.
+    """
+    step = TIMEFRAME_SECONDS.get(timeframe)
+    if step is None or limit > MAX_LIMIT:
+        return download(network, pool_address, timeframe, limit, before_timestamp)
+
+    key = (network, pool_address, timeframe)
+    now = int(time.time())
+    current = now // step * step               # the unfinished candle
+    bound = min(before_timestamp, now + 1) if before_timestamp else now + 1
+    final_bound = min(bound, current)          # candles before this are final
+
+    conn = _connection()
+    cov = _coverage(conn, key)
+
+    # Only the tail is missing: download just the candles after the cached ones
+    tail_fetched = False
+    if cov and cov[1] < bound:
+        tail_limit = (bound - cov[1] + step - 1) // step + 1
+        if tail_limit < limit:
+            candles = download(network, pool_address, timeframe, tail_limit, before_timestamp)
+            if candles is None:
+                return None
+            _record(conn, key, candles, tail_limit, final_bound)
+            cov = _coverage(conn, key)
+            tail_fetched = True
+
+    if cov and cov[1] >= final_bound and (bound <= current or tail_fetched):
+        rows = _cached(conn, key, cov[0], bound, limit)
+        if len(rows) == limit or cov[0] == 0:
+            return rows
+
+    candles = download(network, pool_address, timeframe, limit, before_timestamp)
+    if candles is None:
+        return None
+    _record(conn, key, candles, limit, final_bound)
+    return candles
+
+
+def load_minutes(network: str, pool_address: str, start_ts: int, end_ts: int,
+                 download: Downloader) -> bool:
+    """Make sure every minute candle in [start_ts, end_ts) is cached.
+
+    Only the gaps between already complete ranges are downloaded, a full
+    page at a time. Returns False if a download failed.
+    """
+    key = (network, pool_address, 'minute')
+    current = int(time.time()) // 60 * 60
+    end_ts = min(end_ts, current)
+    conn = _connection()
+
+    for gap_start, gap_end in _gaps(conn, key, start_ts, end_ts):
+        cursor = gap_end
+        while cursor > gap_start:
+            candles = download(network, pool_address, 'minute', MAX_LIMIT, cursor)
+            if candles is None:
+                return False
+            _record(conn, key, candles, MAX_LIMIT, cursor)
+            if len(candles) < MAX_LIMIT:
+                break
+            cursor = min(c[0] for c in candles)
+    return True
+
+
+def price_at(network: str, pool_address: str, timestamp: int, download: Downloader,
+             tolerance: int = PRICE_TOLERANCE_SECONDS) -> Optional[Tuple[float, int]]:
+    """(close, candle timestamp) of the minute candle closest to `timestamp`.
+
+    None if no candle lies within `tolerance` seconds or a download failed.
+    """
+    if not load_minutes(network, pool_address, timestamp - tolerance, timestamp + tolerance + 60, download):
+        return None
+    return _connection().execute("""
+        SELECT close, timestamp FROM ohlcv_candles
+        WHERE network = ? AND pool_address = ? AND timeframe = 'minute'
+          AND timestamp >= ? AND timestamp <= ? AND close > 0
+        ORDER BY ABS(timestamp - ?), timestamp
+        LIMIT 1
+    """, (network, pool_address, timestamp - tolerance, timestamp + tolerance, timestamp)).fetchone()
+
+
+def _max_high(conn, network: str, pool_address: str, start_ts: int, end_ts: int,
+              levels=ROLLUP_LEVELS) -> Optional[Tuple[float, int]]:
+    """Highest high in [start_ts, end_ts): whole days/hours from the rollups,
+    the partial ones at either end from finer levels"""
+    if start_ts >= end_ts:
+        return None
+    if not levels:
+        return conn.execute("""
+            SELECT high, timestamp FROM ohlcv_candles
+            WHERE network = ? AND pool_address = ? AND timeframe = 'minute'
+              AND timestamp >= ? AND timestamp < ? AND high > 0
+            ORDER BY high DESC, timestamp
+            LIMIT 1
+        """, (network, pool_address, start_ts, end_ts)).fetchone()
+
+    timeframe, step = levels[0]
+    first = -(-start_ts // step) * step
+    last = end_ts // step * step
+    if first >= last:
+        return _max_high(conn, network, pool_address, start_ts, end_ts, levels[1:])
+
+    candidates = [
+        conn.execute("""
+            SELECT high, high_ts FROM ohlcv_rollups
+            WHERE network = ? AND pool_address = ? AND timeframe = ?
+              AND timestamp >= ? AND timestamp < ? AND high > 0
+            ORDER BY high DESC, high_ts
+            LIMIT 1
+        """, (network, pool_address, timeframe, first, last)).fetchone(),
+        _max_high(conn, network, pool_address, start_ts, first, levels[1:]),
+        _max_high(conn, network, pool_address, last, end_ts, levels[1:]),
+    ]
+    candidates = [c for c in candidates if c]
+    # Highest high; ties go to the earliest minute
+    return max(candidates, key=lambda c: (c[0], -c[1])) if candidates else None
+
+
+def max_high(network: str, pool_address: str, start_ts: int, end_ts: int,
+             download: Downloader) -> Optional[Tuple[float, int]]:
+    """(high, minute timestamp) of the highest minute high in [start_ts, end_ts).
+
+    None if there are no candles in the range or a download failed. The
+    first query over a long range downloads its minutes (1000 per call);
+    after that it is answered from the day/hour rollups.
+    """
+    if not load_minutes(network, pool_address, start_ts, end_ts, download):
+        return None
+    return _max_high(_connection(), network, pool_address, start_ts, end_ts)
+
+
+def get_ath_mark(token_id: str) -> Optional[Tuple[float, int]]:
+    """(ath_price, checked_ts) from the last incremental check of a token"""
+    return _connection().execute(
+        "SELECT ath_price, checked_ts FROM ath_marks WHERE token_id = ?", (token_id,)
+    ).fetchone()
+
+
+def set_ath_mark(token_id: str, ath_price: float, checked_ts: int) -> None:
+    conn = _connection()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO ath_marks (token_id, ath_price, checked_ts)
+            VALUES (?, ?, ?)
+        """, (token_id, ath_price, checked_ts))
@@ -9,7 +9,13 @@ import os
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+import math
 import random
+import socket
+import sys
+from ohlcv_cache import get_ohlcv, get_ath_mark, set_ath_mark
+from bulk_writer import BulkWriter, bulk_update_sql, json_literal
+from ath_math import TS, HIGH, CLOSE, candle_array, select, peak, body_high, roi_percent
 
 load_dotenv()
 
@@ -19,6 +25,11 @@ PROJECT_REF = "eucfoommxxvqmmwdbkdv"
 GECKO_API_KEY = os.getenv("GECKO_TERMINAL_API_KEY", "")
 NUM_WORKERS = 6  # Number of parallel workers
 BATCH_SIZE = 50  # Tokens per batch
+LEASE_MINUTES = 30  # A claimed batch is handed out again after this (crashed workers)
+MAX_ATTEMPTS = 3  # Claims per token before it is left alone
+
+# --incremental: re-check tokens that already have an ATH, using only new candles
+INCREMENTAL = '--incremental' in sys.argv
 
 # Use Pro API
 API_BASE = "https://pro-api.coingecko.com/api/v3/onchain"
@@ -37,7 +48,7 @@ NETWORK_MAP = {
 lock = threading.Lock()
 total_processed = 0
 total_failed = 0
-processing_tokens = set()  # Track tokens being processed
+total_raised = 0  # Incremental mode: tokens with a new ATH
 
 def run_query(query):
     """Execute query via Supabase Management API"""
@@ -53,8 +64,15 @@ def run_query(query):
         print(f"Database error: {e}")
         return []
 
-def fetch_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
-    """Fetch OHLCV data with retry logic"""
+def execute_write(query):
+    """Run a write; raises if the Management API returns an error instead of rows"""
+    result = run_query(query)
+    if not isinstance(result, list):
+        raise RuntimeError(f"Query failed: {result}")
+    return result
+
+def download_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
+    """Download raw OHLCV candles with retry logic; None if the API call failed"""
     url = f"{API_BASE}/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}"
     params = {'aggregate': 1, 'limit': limit}
     if before_timestamp:
@@ -69,27 +87,95 @@ def fetch_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=N
                 continue
                 
             if response.status_code != 200:
-                return []
+                return None
             
             data = response.json()
-            ohlcv_list = data.get('data', {}).get('attributes', {}).get('ohlcv_list', [])
-            
-            return [{
-                'timestamp': candle[0],
-                'open': candle[1] or 0,
-                'high': candle[2] or 0,
-                'low': candle[3] or 0,
-                'close': candle[4] or 0,
-                'volume': candle[5] or 0
-            } for candle in ohlcv_list]
+            return data.get('data', {}).get('attributes', {}).get('ohlcv_list', [])
             
         except Exception:
             if attempt < 2:
                 time.sleep(1)
                 continue
-            return []
+            return None
+    
+    return None
+
+def fetch_ohlcv(network, pool_address, timeframe, limit=1000, before_timestamp=None):
+    """Fetch OHLCV candles through the local candle cache as an ath_math candle array"""
+    return candle_array(get_ohlcv(network, pool_address, timeframe, limit, before_timestamp, download_ohlcv))
+
+def get_call_timestamp(token):
+    """Unix timestamp of the call, or None"""
+    if token['buy_timestamp']:
+        return int(datetime.fromisoformat(token['buy_timestamp'].replace('Z', '+00:00')).timestamp())
+    elif token['raw_data'] and 'timestamp' in token['raw_data']:
+        return token['raw_data']['timestamp']
+    return None
+
+def refine_hour(network, pool_address, hourly_ath):
+    """TIER 3: minute precision around the peak hour -> (ath_price, ath_timestamp)"""
+    minute_before_ts = int(hourly_ath[TS]) + 3600
+    minute_data = fetch_ohlcv(network, pool_address, 'minute', 120, minute_before_ts)
+    
+    minute_ath = peak(minute_data, around=hourly_ath[TS], window=3600, positive=(HIGH, CLOSE))
+    if minute_ath is not None:
+        return body_high(minute_ath), int(minute_ath[TS])
+    return float(hourly_ath[HIGH]), int(hourly_ath[TS])
+
+def refine_day(network, pool_address, daily_ath):
+    """TIER 2 + 3: hourly then minute precision around the peak day -> (ath_price, ath_timestamp)"""
+    before_ts = int(daily_ath[TS]) + (86400 + 43200)
+    hourly_data = fetch_ohlcv(network, pool_address, 'hour', 72, before_ts)
+    
+    hourly_ath = peak(hourly_data, around=daily_ath[TS], window=86400)
+    if hourly_ath is None:
+        return float(daily_ath[HIGH]), int(daily_ath[TS])
+    
+    return refine_hour(network, pool_address, hourly_ath)
+
+def ath_update_sql(rows):
+    """One UPDATE of crypto_calls for the buffered ATH rows"""
+    columns = ['ath_price', 'ath_timestamp', 'ath_roi_percent']
+    return bulk_update_sql('crypto_calls', 'id', columns,
+                           [{name: row[name] for name in ['id'] + columns} for row in rows])
+
+def advance_marks(rows):
+    """High-water marks move only once their ATH is in crypto_calls, so a
+    failed or lost flush is found again by the next incremental run"""
+    for row in rows:
+        set_ath_mark(row['id'], row['ath_price'], row['checked_ts'])
+
+def write_aths(rows):
+    """Incremental mode: write buffered ATHs in one request"""
+    execute_write(ath_update_sql(rows))
+    advance_marks(rows)
+
+def write_aths_and_dequeue(rows):
+    """Full pass: write buffered ATHs and drop the finished tokens from the work queue"""
+    token_ids = [row['id'] for row in rows]
+    execute_write(ath_update_sql(rows) + f""";
+    DELETE FROM ath_work_queue
+    WHERE call_id IN (SELECT jsonb_array_elements_text({json_literal(token_ids)}))
+    """)
+    advance_marks(rows)
+
+# One Management API request per BATCH_SIZE ATHs (or every 10s); only the
+# full pass uses (and creates) ath_work_queue
+ath_writer = BulkWriter(write_aths if INCREMENTAL else write_aths_and_dequeue, max_rows=BATCH_SIZE)
+
+def save_ath(token, ath_price, ath_timestamp, checked_ts):
+    """Queue ATH and ROI for a token for the next bulk write; the token's
+    high-water mark moves to checked_ts once the write succeeds"""
+    # Calculate ROI
+    ath_roi = roi_percent(ath_price, float(token['price_at_call']))
     
-    return []
+    ath_writer.add({
+        'id': token['id'],
+        'ath_price': ath_price,
+        'ath_timestamp': datetime.fromtimestamp(ath_timestamp).isoformat(),
+        'ath_roi_percent': ath_roi if math.isfinite(ath_roi) else None,
+        'checked_ts': checked_ts
+    })
 
 def process_token(token, worker_id):
     """Process a single token"""
@@ -99,71 +185,89 @@ def process_token(token, worker_id):
         network = NETWORK_MAP.get(token['network'], token['network'])
         
         # Get call timestamp
-        call_timestamp = None
-        if token['buy_timestamp']:
-            call_timestamp = int(datetime.fromisoformat(token['buy_timestamp'].replace('Z', '+00:00')).timestamp())
-        elif token['raw_data'] and 'timestamp' in token['raw_data']:
-            call_timestamp = token['raw_data']['timestamp']
-        
+        call_timestamp = get_call_timestamp(token)
         if not call_timestamp:
             return False
         
         # TIER 1: Daily
         daily_data = fetch_ohlcv(network, token['pool_address'], 'day', 1000)
-        daily_after_call = [c for c in daily_data if c['timestamp'] >= call_timestamp and c['high'] > 0]
+        daily_ath = peak(daily_data, since=call_timestamp)
         
-        if not daily_after_call:
+        if daily_ath is None:
             return False
         
-        daily_ath = max(daily_after_call, key=lambda x: x['high'])
+        # TIER 2 + 3: Hourly, minute
+        ath_price, ath_timestamp = refine_day(network, token['pool_address'], daily_ath)
+        save_ath(token, ath_price, ath_timestamp, int(time.time()) // 3600 * 3600)
         
-        # TIER 2: Hourly
-        before_ts = daily_ath['timestamp'] + (86400 + 43200)
-        hourly_data = fetch_ohlcv(network, token['pool_address'], 'hour', 72, before_ts)
+        with lock:
+            total_processed += 1
+            if total_processed % 10 == 0:
+                print(f"[Worker {worker_id}] Progress: {total_processed} processed")
         
-        hourly_around_ath = [c for c in hourly_data 
-                            if abs(c['timestamp'] - daily_ath['timestamp']) <= 86400 and c['high'] > 0]
+        return True
+        
+    except Exception as e:
+        with lock:
+            total_failed += 1
+        return False
+
+def refresh_token(token, worker_id):
+    """Incremental mode: check only candles newer than the token's high-water mark.
+    
+    The minute-level drill-down runs only if one of them beats the stored ATH.
+    """
+    global total_processed, total_failed, total_raised
+    
+    try:
+        network = NETWORK_MAP.get(token['network'], token['network'])
+        ath_price = float(token['ath_price'])
         
-        if not hourly_around_ath:
-            ath_price = daily_ath['high']
-            ath_timestamp = daily_ath['timestamp']
+        mark = get_ath_mark(token['id'])
+        if mark:
+            since = mark[1]
+            ath_price = max(ath_price, mark[0])
+        elif token['ath_timestamp']:
+            # Everything before the stored ATH was already below it
+            since = int(datetime.fromisoformat(token['ath_timestamp'].replace('Z', '+00:00')).timestamp())
         else:
-            hourly_ath = max(hourly_around_ath, key=lambda x: x['high'])
-            
-            # TIER 3: Minute
-            minute_before_ts = hourly_ath['timestamp'] + 3600
-            minute_data = fetch_ohlcv(network, token['pool_address'], 'minute', 120, minute_before_ts)
-            
-            minute_around_ath = [c for c in minute_data 
-                                if abs(c['timestamp'] - hourly_ath['timestamp']) <= 3600 
-                                and c['high'] > 0 and c['close'] > 0]
-            
-            if minute_around_ath:
-                minute_ath = max(minute_around_ath, key=lambda x: x['high'])
-                ath_price = max(minute_ath['open'], minute_ath['close'])
-                ath_timestamp = minute_ath['timestamp']
-            else:
-                ath_price = hourly_ath['high']
-                ath_timestamp = hourly_ath['timestamp']
+            since = get_call_timestamp(token)
+            if not since:
+                return False
+        
+        # Hourly candles since the mark; daily if the gap is too long for one request
+        now = int(time.time())
+        timeframe, step = ('hour', 3600) if now - since <= 1000 * 3600 else ('day', 86400)
+        since = since // step * step
+        limit = min(1000, (now - since) // step + 1)
+        candles = select(fetch_ohlcv(network, token['pool_address'], timeframe, limit), since=since)
         
-        # Calculate ROI
-        ath_roi = ((ath_price - float(token['price_at_call'])) / float(token['price_at_call'])) * 100
-        ath_roi = max(0, ath_roi)
+        checked_ts = int(candles[:, TS].max()) if len(candles) else since
+        new_peak = peak(candles)
+        raised = False
         
-        # Update database
-        update_query = f"""
-        UPDATE crypto_calls 
-        SET ath_price = {ath_price}, 
-            ath_timestamp = '{datetime.fromtimestamp(ath_timestamp).isoformat()}',
-            ath_roi_percent = {ath_roi}
-        WHERE id = '{token['id']}'
-        """
-        run_query(update_query)
+        if new_peak is not None and new_peak[HIGH] > ath_price:
+            if timeframe == 'hour':
+                new_price, new_timestamp = refine_hour(network, token['pool_address'], new_peak)
+            else:
+                new_price, new_timestamp = refine_day(network, token['pool_address'], new_peak)
+            
+            # A wick above the ATH can still close below it at minute precision
+            if new_price > ath_price:
+                raised = True
+                # The newest candle may still be forming, so the next check starts at it
+                save_ath(token, new_price, new_timestamp, checked_ts)
+                with lock:
+                    total_raised += 1
+        
+        if not raised:
+            # Nothing to write: the mark keeps the already-stored ATH
+            set_ath_mark(token['id'], ath_price, checked_ts)
         
         with lock:
             total_processed += 1
-            if total_processed % 10 == 0:
-                print(f"[Worker {worker_id}] Progress: {total_processed} processed")
+            if total_processed % 100 == 0:
+                print(f"[Worker {worker_id}] Progress: {total_processed} checked, {total_raised} new ATHs")
         
         return True
         
@@ -172,53 +276,141 @@ def process_token(token, worker_id):
             total_failed += 1
         return False
 
+def setup_work_queue():
+    """Create the work queue if needed and enqueue every token still missing an ATH"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'add_ath_work_queue.sql')) as f:
+        run_query(f.read())
+    
+    # Drop tokens another script has finished since the last run
+    run_query("""
+    DELETE FROM ath_work_queue q
+    USING crypto_calls c
+    WHERE c.id::text = q.call_id AND c.ath_price IS NOT NULL
+    """)
+    # Tokens that used up their attempts in an earlier run get a fresh start
+    run_query("""
+    INSERT INTO ath_work_queue (call_id, call_created_at)
+    SELECT id::text, created_at
+    FROM crypto_calls
+    WHERE pool_address IS NOT NULL 
+    AND price_at_call IS NOT NULL
+    AND ath_price IS NULL
+    ON CONFLICT (call_id) DO UPDATE SET attempts = 0
+    WHERE ath_work_queue.lease_until < NOW()
+    """)
+
+def claim_batch(worker_name):
+    """Lease up to BATCH_SIZE unclaimed tokens; concurrent workers on any machine get disjoint batches"""
+    tokens_data = run_query(f"""
+    WITH claimable AS (
+        SELECT call_id FROM ath_work_queue
+        WHERE lease_until < NOW()
+        AND attempts < {MAX_ATTEMPTS}
+        ORDER BY call_created_at
+        LIMIT {BATCH_SIZE}
+        FOR UPDATE SKIP LOCKED
+    ), leased AS (
+        UPDATE ath_work_queue q
+        SET lease_until = NOW() + INTERVAL '{LEASE_MINUTES} minutes',
+            leased_by = '{worker_name}',
+            attempts = q.attempts + 1
+        FROM claimable
+        WHERE q.call_id = claimable.call_id
+        RETURNING q.call_id
+    )
+    SELECT c.id, c.ticker, c.network, c.pool_address, c.buy_timestamp, c.price_at_call, c.raw_data
+    FROM crypto_calls c
+    JOIN leased ON c.id::text = leased.call_id
+    ORDER BY c.created_at ASC
+    """)
+    # run_query returns an error object instead of rows when the query fails
+    return tokens_data if isinstance(tokens_data, list) else []
+
+def release_tokens(call_ids):
+    """Make failed tokens claimable again right away (until they run out of attempts)"""
+    if call_ids:
+        run_query(f"""
+        UPDATE ath_work_queue SET lease_until = NOW(), leased_by = NULL
+        WHERE call_id IN (SELECT jsonb_array_elements_text({json_literal(call_ids)}))
+        """)
+
 def worker_process_batch(worker_id):
     """Worker function that processes tokens"""
+    worker_name = f"{socket.gethostname()}:{os.getpid()}:{worker_id}"
     print(f"[Worker {worker_id}] Started")
     
     while True:
-        # Get batch of tokens to process
-        # Build exclusion clause
-        if processing_tokens:
-            token_list = ','.join([f"'{tid}'" for tid in processing_tokens])
-            exclusion = f"AND id NOT IN ({token_list})"
-        else:
-            exclusion = ""
-        
-        tokens_query = f"""
-        SELECT id, ticker, network, pool_address, buy_timestamp, price_at_call, raw_data
-        FROM crypto_calls
-        WHERE pool_address IS NOT NULL 
-        AND price_at_call IS NOT NULL
-        AND ath_price IS NULL
-        {exclusion}
-        ORDER BY created_at ASC
-        LIMIT {BATCH_SIZE}
-        """
-        
-        with lock:
-            tokens_data = run_query(tokens_query)
-            if not tokens_data:
-                print(f"[Worker {worker_id}] No more tokens to process")
-                break
-            
-            # Mark tokens as being processed
-            for token in tokens_data:
-                processing_tokens.add(token['id'])
+        tokens_data = claim_batch(worker_name)
+        if not tokens_data:
+            print(f"[Worker {worker_id}] No more tokens to process")
+            break
         
         # Process tokens
+        failed_ids = []
         for token in tokens_data:
-            success = process_token(token, worker_id)
-            
-            # Remove from processing set
-            with lock:
-                processing_tokens.discard(token['id'])
+            # Finished tokens leave the queue with their ATH write; failed
+            # ones are released for another attempt in this run
+            if not process_token(token, worker_id):
+                failed_ids.append(str(token['id']))
             
             # Small random delay to avoid thundering herd
             time.sleep(random.uniform(0.1, 0.3))
         
+        release_tokens(failed_ids)
         print(f"[Worker {worker_id}] Completed batch of {len(tokens_data)} tokens")
 
+def load_tokens_with_ath():
+    """All tokens that already have an ATH, paged by id"""
+    tokens = []
+    last_id = ''
+    while True:
+        batch = run_query(f"""
+        SELECT id, ticker, network, pool_address, buy_timestamp, price_at_call, raw_data,
+               ath_price, ath_timestamp
+        FROM crypto_calls
+        WHERE pool_address IS NOT NULL 
+        AND price_at_call IS NOT NULL
+        AND ath_price IS NOT NULL
+        AND id > '{last_id}'
+        ORDER BY id
+        LIMIT 1000
+        """)
+        if not batch:
+            break
+        tokens.extend(batch)
+        last_id = batch[-1]['id']
+    return tokens
+
+def run_incremental():
+    """Refresh ATHs of already-processed tokens from their high-water marks"""
+    print(f"🔁 Incremental ATH refresh with {NUM_WORKERS} workers")
+    
+    tokens = load_tokens_with_ath()
+    print(f"Tokens to check: {len(tokens)}\n")
+    
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        futures = [executor.submit(refresh_token, token, i % NUM_WORKERS + 1) for i, token in enumerate(tokens)]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Worker error: {e}")
+    
+    ath_writer.close()
+    
+    elapsed = time.time() - start_time
+    print(f"\n🎉 INCREMENTAL REFRESH COMPLETE!")
+    if ath_writer.failed:
+        print(f"⚠️  {ath_writer.failed} ATH writes failed; those tokens are re-checked next run")
+    print(f"Time elapsed: {elapsed/60:.1f} minutes")
+    print(f"Tokens checked: {total_processed} (failed: {total_failed})")
+    print(f"New ATHs found: {total_raised}")
+
+if INCREMENTAL:
+    run_incremental()
+    sys.exit(0)
+
 # Main execution
 print(f"🚀 Starting parallel ATH processing with {NUM_WORKERS} workers")
 print(f"Using CoinGecko Pro API")
@@ -230,6 +422,8 @@ total_count = run_query("SELECT COUNT(*) FROM crypto_calls WHERE pool_address IS
 print(f"Starting count: {initial_count}/{total_count}")
 print(f"Tokens to process: {total_count - initial_count}\n")
 
+setup_work_queue()
+
 start_time = time.time()
 
 # Create thread pool
@@ -244,6 +438,8 @@ with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
         except Exception as e:
             print(f"Worker error: {e}")
 
+ath_writer.close()
+
 # Final summary
 elapsed = time.time() - start_time
 final_count = run_query("SELECT COUNT(*) FROM crypto_calls WHERE ath_price IS NOT NULL")[0]['count']
@@ -251,6 +447,8 @@ new_processed = final_count - initial_count
 
 print(f"\n🎉 PARALLEL PROCESSING COMPLETE!")
 print(f"Time elapsed: {elapsed/60:.1f} minutes")
+if ath_writer.failed:
+    print(f"⚠️  {ath_writer.failed} ATH writes failed; those tokens stay queued")
 print(f"New tokens processed: {new_processed}")
 print(f"Total with ATH: {final_count}/{total_count} ({final_count/total_count*100:.1f}%)")
 print(f"Processing rate: {new_processed/(elapsed/60):.1f} tokens/minute")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Token -> best pool index for GeckoTerminal price lookups
+
+Price scripts used to list every pool of a token (/tokens/{address}/pools)
+and sort by reserve_in_usd whenever a token was missing on DexScreener.
+The most liquid pool changes far more slowly than the price, so it is
+kept here in SQLite with its dex, liquidity and when it was last
+verified, and only re-listed after POOL_TTL_SECONDS.
+
+Hot price paths then read prices straight from the cached pools, 30 pools
+per /pools/multi request:
+
+    from pool_index import pool_prices
+    prices = pool_prices('solana', addresses)   # {address: usd price}
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set
+
+import rate_limiter
+
+POOL_INDEX_PATH = os.getenv(
+    "POOL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pool_index.db")
+)
+
+GECKO_API = "https://api.geckoterminal.com/api/v2"
+
+POOL_TTL_SECONDS = 24 * 3600     # re-rank a token's pools daily
+NO_POOL_TTL_SECONDS = 6 * 3600   # tokens without any pool are re-listed sooner
+MULTI_POOL_LIMIT = 30            # addresses per /pools/multi request
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS best_pools (
+    network TEXT NOT NULL,
+    token_address TEXT NOT NULL,
+    pool_address TEXT,              -- NULL: the token has no pools
+    token_side TEXT,                -- 'base' or 'quote' side of the pair
+    dex TEXT,
+    liquidity_usd REAL,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (network, token_address)
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(POOL_INDEX_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def download_pools(network: str, token_address: str, headers: Optional[dict] = None) -> Optional[List[dict]]:
+    """GeckoTerminal pool listing for a token; None if the call failed"""
+    try:
+        response = rate_limiter.get(f"{GECKO_API}/networks/{network}/tokens/{token_address}/pools",
+                                    headers=headers, timeout=15)
+    except Exception:
+        return None
+    if response.status_code == 404:
+        return []
+    if response.status_code != 200:
+        return None
+    return response.json().get('data', [])
+
+
+def rank_pools(token_address: str, pools: List[dict]) -> Optional[Dict]:
+    """Most liquid pool of a listing as an index entry, or None"""
+    if not pools:
+        return None
+    best = max(pools, key=lambda p: float(p['attributes'].get('reserve_in_usd') or 0))
+    relationships = best.get('relationships', {})
+    base_id = relationships.get('base_token', {}).get('data', {}).get('id', '')
+    return {
+        'pool_address': best['attributes']['address'],
+        'token_side': 'base' if base_id.lower().endswith(token_address.lower()) else 'quote',
+        'dex': relationships.get('dex', {}).get('data', {}).get('id'),
+        'liquidity_usd': float(best['attributes'].get('reserve_in_usd') or 0),
+    }
+
+
+def remember_pools(network: str, token_address: str, pools: List[dict]) -> Optional[Dict]:
+    """Rank a pool listing the caller already has and store the winner"""
+    entry = rank_pools(token_address, pools)
+    record = entry or {'pool_address': None, 'token_side': None, 'dex': None, 'liquidity_usd': None}
+    conn = _connection()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO best_pools
+                (network, token_address, pool_address, token_side, dex, liquidity_usd, verified_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (network, token_address, record['pool_address'], record['token_side'],
+              record['dex'], record['liquidity_usd'], time.time()))
+    return entry
+
+
+def forget_pool(network: str, token_address: str) -> None:
+    """Drop a token's entry, e.g. after its pool stopped answering"""
+    conn = _connection()
+    with conn:
+        conn.execute("DELETE FROM best_pools WHERE network = ? AND token_address = ?",
+                     (network, token_address))
+
+
+def best_pool(network: str, token_address: str, headers: Optional[dict] = None) -> Optional[Dict]:
+    """Cached best pool of a token, re-listed once stale.
+
+    Returns {'pool_address', 'token_side', 'dex', 'liquidity_usd', ...} or None
+    if the token has no pools. A stale entry is still used if re-listing
+    fails.
+    """
+    row = _connection().execute("""
+        SELECT pool_address, token_side, dex, liquidity_usd, verified_at FROM best_pools
+        WHERE network = ? AND token_address = ?
+    """, (network, token_address)).fetchone()
+
+    if row:
+        ttl = POOL_TTL_SECONDS if row['pool_address'] else NO_POOL_TTL_SECONDS
+        if time.time() - row['verified_at'] < ttl:
+            return dict(row) if row['pool_address'] else None
+
+    pools = download_pools(network, token_address, headers)
+    if pools is None:
+        return dict(row) if row and row['pool_address'] else None
+    return remember_pools(network, token_address, pools)
+
+
+def pool_prices(network: str, token_addresses: List[str], headers: Optional[dict] = None,
+                failed: Optional[Set[str]] = None) -> Dict[str, float]:
+    """USD price of each token from its best pool, in /pools/multi batches.
+
+    Tokens without a pool or price are left out. A pool that no longer
+    answers is forgotten so the next lookup re-ranks the token's pools.
+    If `failed` is given, tokens whose request errored are added to it, so
+    callers can tell "no price" from "couldn't ask".
+    """
+    # Keyed by lowercased address for matching; Solana addresses are
+    # case-sensitive, so requests use the address as stored
+    by_pool: Dict[str, List] = {}
+    pool_addresses = []
+    for token_address in token_addresses:
+        entry = best_pool(network, token_address, headers)
+        if entry:
+            key = entry['pool_address'].lower()
+            if key not in by_pool:
+                pool_addresses.append(entry['pool_address'])
+            by_pool.setdefault(key, []).append((token_address, entry['token_side']))
+
+    prices = {}
+    for i in range(0, len(pool_addresses), MULTI_POOL_LIMIT):
+        chunk = pool_addresses[i:i + MULTI_POOL_LIMIT]
+        try:
+            response = rate_limiter.get(f"{GECKO_API}/networks/{network}/pools/multi/{','.join(chunk)}",
+                                        headers=headers, timeout=15)
+        except Exception:
+            response = None
+        if response is None or response.status_code != 200:
+            if failed is not None:
+                failed.update(token_address for address in chunk for token_address, _ in by_pool[address.lower()])
+            continue
+
+        answered = set()
+        for pool in response.json().get('data', []):
+            attributes = pool.get('attributes', {})
+            address = (attributes.get('address') or '').lower()
+            answered.add(address)
+            for token_address, side in by_pool.get(address, []):
+                price = float(attributes.get(f'{side}_token_price_usd') or 0)
+                if price > 0:
+                    prices[token_address] = price
+
+        for address in {address.lower() for address in chunk} - answered:
+            for token_address, _ in by_pool[address]:
+                forget_pool(network, token_address)
+
+    return prices
@@ -5,9 +5,13 @@ Comprehensive Market Cap Populator
 1. Fetches supply data from DexScreener for all non-dead tokens
 2. Populates market_cap_at_call (price_at_call × total_supply)
 3. Populates ath_market_cap (ath_price × total_supply)
+
+Resumable: progress is checkpointed per batch (see batch_runner.py);
+pass --restart to start from the first token again.
 """
 
 import os
+import sys
 import time
 import warnings
 warnings.filterwarnings("ignore")
@@ -15,6 +19,7 @@ import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
+from batch_runner import BatchRunner, ItemFailed
 
 load_dotenv()
 
@@ -68,60 +73,39 @@ def process_tokens():
     print("Market Cap Comprehensive Populator")
     print("=" * 60)
     
-    # Get ALL non-dead tokens without supply data using pagination
-    print("\nFetching ALL non-dead tokens needing supply data...")
-    all_tokens = []
-    offset = 0
-    limit = 1000  # Process 1000 at a time
-    
-    while True:
-        result = supabase.table('crypto_calls').select(
+    # Tokens are read page by page in id order from the last checkpoint,
+    # so an interrupted run resumes where it stopped (--restart starts over)
+    def fetch_tokens(after_id, limit):
+        query = supabase.table('crypto_calls').select(
             'id,ticker,contract_address,price_at_call,current_price,ath_price,circulating_supply,total_supply'
-        ).neq('is_dead', True).is_('total_supply', 'null').not_.is_('contract_address', 'null').range(offset, offset + limit - 1).execute()
-        
-        if not result.data:
-            break
-            
-        all_tokens.extend(result.data)
-        print(f"  Fetched batch: {len(result.data)} tokens (total so far: {len(all_tokens)})")
-        
-        if len(result.data) < limit:
-            break  # Last batch
-            
-        offset += limit
-    
-    tokens = all_tokens
-    print(f"\nTotal tokens to process: {len(tokens)}")
-    
-    if not tokens:
-        print("No tokens need processing")
-        return
+        ).neq('is_dead', True).is_('total_supply', 'null').not_.is_('contract_address', 'null')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data
     
-    # Process in batches
-    total_updated = 0
-    total_mcap_calculated = 0
-    total_current_mcap_calculated = 0
-    total_ath_mcap_calculated = 0
+    totals = {'updated': 0, 'mcap': 0, 'current_mcap': 0, 'ath_mcap': 0}
     
-    for i in range(0, len(tokens), BATCH_SIZE):
-        batch = tokens[i:i+BATCH_SIZE]
-        batch_num = (i // BATCH_SIZE) + 1
-        total_batches = (len(tokens) + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        print(f"\n[Batch {batch_num}/{total_batches}] Processing {len(batch)} tokens...")
+    def update_batch(batch):
+        """One DexScreener call per page; returns the tokens that failed"""
+        print(f"\nProcessing {len(batch)} tokens...")
         
         # Extract contract addresses
         addresses = [t['contract_address'].lower() for t in batch if t['contract_address']]
         
         if not addresses:
-            continue
+            return []
         
         # Fetch supply data from DexScreener
         supply_data = fetch_supply_data_batch(addresses)
         
+        # Rate limiting
+        time.sleep(1)  # 1 second between batches
+        
         if not supply_data:
             print(f"  ⚠️ No data returned from DexScreener")
-            continue
+            return [(token, ItemFailed("No data returned from DexScreener")) for token in batch]
+        
+        failed = []
         
         # Update each token
         for token in batch:
@@ -142,6 +126,7 @@ def process_tokens():
                 circ = data['circulating_supply']
                 total = data['total_supply']
                 supply_similar = False
+                diff_percent = 0
                 
                 if circ and total and total > 0:
                     diff_percent = abs(circ - total) / total * 100
@@ -152,11 +137,11 @@ def process_tokens():
                     # Supplies are similar, safe to use total supply for historical calculations
                     if token['price_at_call'] and total:
                         update_fields['market_cap_at_call'] = float(token['price_at_call']) * total
-                        total_mcap_calculated += 1
+                        totals['mcap'] += 1
                     
                     if token['ath_price'] and total:
                         update_fields['ath_market_cap'] = float(token['ath_price']) * total
-                        total_ath_mcap_calculated += 1
+                        totals['ath_mcap'] += 1
                 else:
                     # Supplies are different, can't assume they were same at launch
                     print(f"    ⚠️ {token['ticker']}: Supply mismatch ({diff_percent:.1f}% diff), skipping historical MCaps")
@@ -164,7 +149,7 @@ def process_tokens():
                 # Current market cap can always use current circulating supply
                 if token['current_price'] and circ:
                     update_fields['current_market_cap'] = float(token['current_price']) * circ
-                    total_current_mcap_calculated += 1
+                    totals['current_mcap'] += 1
                 
                 # Update database
                 try:
@@ -176,24 +161,28 @@ def process_tokens():
                     else:
                         print(f"  ✅ {ticker}: Supply updated")
                     
-                    total_updated += 1
+                    totals['updated'] += 1
                 except Exception as e:
                     print(f"  ❌ {token['ticker']}: {e}")
+                    failed.append((token, e))
         
-        # Rate limiting
-        time.sleep(1)  # 1 second between batches
+        return failed
+    
+    runner = BatchRunner('populate-all-marketcaps', fetch_tokens, update_batch,
+                         page_size=BATCH_SIZE, restart='--restart' in sys.argv)
+    runner.run()
     
     # Summary
     print("\n" + "=" * 60)
     print("Processing Complete!")
-    print(f"Tokens updated: {total_updated}")
-    print(f"Market cap at call calculated: {total_mcap_calculated}")
-    print(f"Current market cap calculated: {total_current_mcap_calculated}")
-    print(f"ATH market cap calculated: {total_ath_mcap_calculated}")
+    print(f"Tokens updated: {totals['updated']}")
+    print(f"Market cap at call calculated: {totals['mcap']}")
+    print(f"Current market cap calculated: {totals['current_mcap']}")
+    print(f"ATH market cap calculated: {totals['ath_mcap']}")
     print("=" * 60)
     
     # Show sample results
-    if total_updated > 0:
+    if totals['updated'] > 0:
         print("\nSample of updated tokens:")
         sample = supabase.table('crypto_calls').select(
             'ticker,total_supply,market_cap_at_call,current_market_cap,ath_market_cap'
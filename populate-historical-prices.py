@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Historical (at-call) price backfill from the local candle store
+
+Replaces the archived populate-historical-prices-*.py scripts, which asked
+the crypto-price-historical edge function for a fresh window of minute
+candles per call. Prices now come from ohlcv_cache.price_at: minute
+candles are downloaded once per pool and shared with the ATH scripts, so
+calls on the same pool (and later ATH queries) need no new API calls.
+
+Same rules as the edge function: the close of the minute candle closest to
+the call, within 5 minutes. A KROM buy price in raw_data still wins.
+
+Resumable (see batch_runner.py); pass --restart to start over.
+"""
+
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+from supabase import create_client
+
+import rate_limiter
+from batch_runner import BatchRunner, ItemFailed, per_item
+from ohlcv_cache import load_minutes, price_at, PRICE_TOLERANCE_SECONDS
+
+load_dotenv()
+
+supabase = create_client(
+    os.getenv('SUPABASE_URL'),
+    os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+)
+
+GECKO_API = "https://api.geckoterminal.com/api/v2"
+
+NETWORK_MAP = {
+    'ethereum': 'eth',
+    'solana': 'solana',
+    'bsc': 'bsc',
+    'polygon': 'polygon',
+    'arbitrum': 'arbitrum',
+    'base': 'base'
+}
+
+counts = {'krom': 0, 'gecko': 0, 'dead': 0}
+
+def download_ohlcv(network, pool_address, timeframe, limit, before_timestamp=None):
+    """Raw GeckoTerminal ohlcv_list; None if the API call failed"""
+    params = {'aggregate': 1, 'limit': limit, 'currency': 'usd'}
+    if before_timestamp:
+        params['before_timestamp'] = before_timestamp
+    try:
+        response = rate_limiter.get(f"{GECKO_API}/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}",
+                                    params=params, timeout=30)
+    except Exception:
+        return None
+    if response.status_code == 404:
+        return []
+    if response.status_code != 200:
+        return None
+    return response.json().get('data', {}).get('attributes', {}).get('ohlcv_list', [])
+
+def fetch_tokens(after_krom_id, limit):
+    """Next page of calls without a historical price, by krom_id"""
+    query = supabase.table('crypto_calls').select(
+        'krom_id,ticker,network,pool_address,buy_timestamp,raw_data'
+    ).is_('historical_price_usd', 'null').not_.is_('buy_timestamp', 'null').not_.is_('pool_address', 'null')
+    if after_krom_id is not None:
+        query = query.gt('krom_id', after_krom_id)
+    return query.order('krom_id').limit(limit).execute().data
+
+def save_price(token, update_data):
+    update_data['price_updated_at'] = datetime.now().isoformat()
+    supabase.table('crypto_calls').update(update_data).eq('krom_id', token['krom_id']).execute()
+
+def populate_token(token):
+    ticker = token.get('ticker', 'Unknown')
+
+    # A KROM buy price is used as is
+    try:
+        krom_price = float(((token.get('raw_data') or {}).get('trade') or {}).get('buyPrice') or 0)
+    except (TypeError, ValueError):
+        krom_price = 0
+    if krom_price > 0:
+        save_price(token, {'historical_price_usd': krom_price, 'price_source': 'KROM'})
+        print(f"{ticker}: ✅ KROM ${krom_price:.8f}")
+        counts['krom'] += 1
+        return
+
+    network = NETWORK_MAP.get(token['network'], token['network'])
+    pool = token['pool_address']
+    call_ts = int(datetime.fromisoformat(token['buy_timestamp'].replace('Z', '+00:00')).timestamp())
+
+    # Separate the download from the lookup so a failed call is retried
+    # instead of marking the token dead
+    if not load_minutes(network, pool, call_ts - PRICE_TOLERANCE_SECONDS,
+                        call_ts + PRICE_TOLERANCE_SECONDS + 60, download_ohlcv):
+        raise ItemFailed("GeckoTerminal OHLCV download failed")
+
+    found = price_at(network, pool, call_ts, download_ohlcv)
+    if not found:
+        save_price(token, {'price_source': 'DEAD_TOKEN'})
+        print(f"{ticker}: 💀 Dead token")
+        counts['dead'] += 1
+        return
+
+    price, candle_ts = found
+    save_price(token, {'historical_price_usd': price, 'price_source': 'GECKO'})
+    print(f"{ticker}: 🦎 Gecko ${price:.8f} ({candle_ts - call_ts:+d}s)")
+    counts['gecko'] += 1
+
+def main():
+    print("=" * 60)
+    print("Historical Price Backfill (local candle store)")
+    print("=" * 60)
+
+    runner = BatchRunner('populate-historical-prices', fetch_tokens, per_item(populate_token),
+                         key=lambda token: token['krom_id'], restart='--restart' in sys.argv)
+    runner.run()
+
+    print(f"\n📊 Summary:")
+    print(f"   KROM prices: {counts['krom']}")
+    print(f"   Gecko prices: {counts['gecko']}")
+    print(f"   Dead tokens: {counts['dead']}")
+    print(f"   Failed: {len(runner.failures())}")
+
+if __name__ == "__main__":
+    main()
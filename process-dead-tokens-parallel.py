@@ -4,18 +4,21 @@ Process Dead Tokens - PARALLEL VERSION
 =======================================
 Uses GeckoTerminal API with parallel processing (100-200 req/min)
 Checks dead tokens and revives them if trading again
+Tokens that keep coming back empty are re-probed with exponential backoff
+(see dead_tokens.py)
 """
 
 import os
 import time
 import warnings
 warnings.filterwarnings("ignore")
-import requests
+import rate_limiter
+import dead_tokens
+from pool_index import best_pool
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Semaphore
 import threading
 
 load_dotenv()
@@ -26,15 +29,16 @@ supabase = create_client(
     os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 )
 
-# Rate limiting - 150 requests per minute (conservative for paid API)
-REQUESTS_PER_MINUTE = 150
-RATE_LIMIT_SEMAPHORE = Semaphore(REQUESTS_PER_MINUTE)
+# Rate limiting - shared with every other script through rate_limiter
+# (these requests carry no API key, so they count against the free tier)
+REQUESTS_PER_MINUTE = rate_limiter.LIMITS_PER_MINUTE['geckoterminal:free']
 PARALLEL_WORKERS = 20  # Number of parallel threads
 
 # Thread-safe counters
 stats_lock = threading.Lock()
 stats = {
     'updated': 0,  # Tokens with supply/market cap data added
+    'revived': 0,  # Tokens trading again (is_dead cleared)
     'no_data': 0,  # Tokens with no GeckoTerminal data
     'errors': 0,
     'processed': 0
@@ -52,16 +56,6 @@ NETWORK_MAP = {
     'avalanche': 'avalanche'
 }
 
-def rate_limited_request(func):
-    """Decorator to rate limit API requests"""
-    def wrapper(*args, **kwargs):
-        RATE_LIMIT_SEMAPHORE.acquire()
-        # Schedule release after 60 seconds
-        threading.Timer(60.0, RATE_LIMIT_SEMAPHORE.release).start()
-        return func(*args, **kwargs)
-    return wrapper
-
-@rate_limited_request
 def fetch_token_from_geckoterminal(network, pool_address, contract_address=None):
     """Fetch token data from GeckoTerminal API (rate limited) - tries pool first, then contract"""
     gecko_network = NETWORK_MAP.get(network.lower())
@@ -72,33 +66,14 @@ def fetch_token_from_geckoterminal(network, pool_address, contract_address=None)
     url = f"https://api.geckoterminal.com/api/v2/networks/{gecko_network}/pools/{pool_address}"
     
     try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+        response = rate_limiter.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
         
-        # If pool fails and we have contract address, try that
+        # If pool fails and we have contract address, use the token's most liquid pool
         if response.status_code == 404 and contract_address:
-            # Try fetching by token contract address instead
-            url = f"https://api.geckoterminal.com/api/v2/networks/{gecko_network}/tokens/{contract_address}"
-            response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-            
-            if response.status_code == 200:
-                # Get the token's top pool
-                data = response.json()
-                token_attrs = data.get('data', {}).get('attributes', {})
-                
-                # Get the top pool for this token
-                pools_url = f"https://api.geckoterminal.com/api/v2/networks/{gecko_network}/tokens/{contract_address}/pools"
-                pools_response = requests.get(pools_url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-                
-                if pools_response.status_code == 200:
-                    pools_data = pools_response.json()
-                    if pools_data.get('data'):
-                        # Use the first (top) pool
-                        pool_data = pools_data['data'][0]
-                        attributes = pool_data.get('attributes', {})
-                        
-                        # Process pool data below
-                        response = pools_response
-                        data = {'data': pool_data}
+            best = best_pool(gecko_network, contract_address, headers={'User-Agent': 'Mozilla/5.0'})
+            if best and best['pool_address'] != pool_address:
+                url = f"https://api.geckoterminal.com/api/v2/networks/{gecko_network}/pools/{best['pool_address']}"
+                response = rate_limiter.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -134,7 +109,12 @@ def fetch_token_from_geckoterminal(network, pool_address, contract_address=None)
                     'liquidity_usd': liquidity
                 }
         
-        return {'is_trading': False}
+        # 200 without a price, or no such pool: a real "no data" answer
+        if response.status_code in (200, 404):
+            return {'is_trading': False}
+        
+        # Rate limited or upstream error - says nothing about the token
+        return None
     
     except Exception as e:
         return None
@@ -165,11 +145,15 @@ def process_single_token(token):
             stats['errors'] += 1
         return f"Error: {ticker}"
     
+    revived = gecko_data['is_trading'] and dead_tokens.is_trading(gecko_data['liquidity_usd'])
+    if not revived:
+        # No data or too little liquidity: back off before probing again
+        dead_tokens.record_miss(token['id'])
+    
     if gecko_data['is_trading']:
-        # Token has data on GeckoTerminal - update supply and market cap ONLY
-        # DO NOT change is_dead flag - that's managed by DexScreener availability
+        # Token has data on GeckoTerminal - update supply and market cap;
+        # only clear is_dead once it has real liquidity again
         update_data = {
-            # Remove is_dead update - keep tokens marked as dead
             'current_price': gecko_data['current_price'],
             'volume_24h': gecko_data['volume_24h'],
             'liquidity_usd': gecko_data['liquidity_usd'],
@@ -195,13 +179,20 @@ def process_single_token(token):
             # Calculate current market cap
             update_data['current_market_cap'] = gecko_data['current_price'] * gecko_data['circulating_supply']
         
+        if revived:
+            update_data['is_dead'] = False
+        
         # Update database
         try:
             supabase.table('crypto_calls').update(update_data).eq('id', token['id']).execute()
             with stats_lock:
                 stats['updated'] += 1
+                if revived:
+                    stats['revived'] += 1
+            if revived:
+                dead_tokens.record_alive([token['id']])
             
-            result_msg = f"✅ UPDATED: {ticker} ({network}) - "
+            result_msg = f"✅ {'REVIVED' if revived else 'UPDATED'}: {ticker} ({network}) - "
             result_msg += f"Price: ${gecko_data['current_price']:.8f}, "
             result_msg += f"Vol: ${gecko_data['volume_24h']:,.0f}, "
             result_msg += f"Liq: ${gecko_data['liquidity_usd']:,.0f}"
@@ -238,11 +229,12 @@ def process_dead_tokens():
         'total_supply,circulating_supply,is_dead'
     ).eq('is_dead', True).not_.is_('pool_address', 'null').is_('total_supply', 'null').execute()  # Process all remaining dead tokens on retry
     
-    dead_tokens = result.data
-    total_tokens = len(dead_tokens)
-    print(f"Found {total_tokens} dead tokens to check")
+    # Skip tokens still backing off from earlier empty probes
+    tokens_to_check = dead_tokens.due(result.data)
+    total_tokens = len(tokens_to_check)
+    print(f"Found {len(result.data)} dead tokens, {total_tokens} due for a probe")
     
-    if not dead_tokens:
+    if not tokens_to_check:
         print("No dead tokens to process")
         return
     
@@ -260,7 +252,7 @@ def process_dead_tokens():
     # Process tokens in parallel
     with ThreadPoolExecutor(max_workers=PARALLEL_WORKERS) as executor:
         # Submit all tasks
-        futures = {executor.submit(process_single_token, token): token for token in dead_tokens}
+        futures = {executor.submit(process_single_token, token): token for token in tokens_to_check}
         
         # Process completed tasks
         for future in as_completed(futures):
@@ -277,6 +269,7 @@ def process_dead_tokens():
     print(f"Total time: {elapsed_time/60:.1f} minutes")
     print(f"Tokens checked: {stats['processed']}")
     print(f"Updated with supply/MC data: {stats['updated']} 🎉")
+    print(f"Revived (liquidity >= ${dead_tokens.LIQUIDITY_THRESHOLD}): {stats['revived']}")
     print(f"No GeckoTerminal data: {stats['no_data']}")
     print(f"Errors: {stats['errors']}")
     print(f"Processing rate: {stats['processed']/(elapsed_time/60):.1f} tokens/minute")
@@ -286,7 +279,7 @@ def process_dead_tokens():
         print("  - Current price and volume data")
         print("  - Supply data (total & circulating)")
         print("  - Market cap calculations")
-        print("  - Tokens remain marked as 'dead' for DexScreener tracking")
+        print("  - is_dead cleared only where liquidity is back")
         print("\nMarket caps are now available for analysis and reporting!")
     
     print("=" * 60)
@@ -4,6 +4,8 @@ Process Dead Tokens - Check if they're trading again and backfill data
 =====================================================================
 Uses GeckoTerminal API (1 token at a time) to check dead tokens
 If trading again: fetches supply data and revives the token
+Tokens that keep coming back empty are re-probed with exponential backoff
+(see dead_tokens.py)
 """
 
 import os
@@ -14,6 +16,7 @@ import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
+import dead_tokens
 
 load_dotenv()
 
@@ -79,7 +82,12 @@ def fetch_token_from_geckoterminal(network, pool_address):
                     'liquidity_usd': liquidity
                 }
         
-        return {'is_trading': False}
+        # 200 without a price, or no such pool: a real "no data" answer
+        if response.status_code in (200, 404):
+            return {'is_trading': False}
+        
+        # Rate limited or upstream error - says nothing about the token
+        return None
     
     except Exception as e:
         print(f"    Error fetching from GeckoTerminal: {e}")
@@ -98,10 +106,11 @@ def process_dead_tokens():
         'total_supply,circulating_supply,is_dead'
     ).eq('is_dead', True).not_.is_('pool_address', 'null').limit(5000).execute()  # Process all dead tokens
     
-    dead_tokens = result.data
-    print(f"Found {len(dead_tokens)} dead tokens to check")
+    # Skip tokens still backing off from earlier empty probes
+    tokens_to_check = dead_tokens.due(result.data)
+    print(f"Found {len(result.data)} dead tokens, {len(tokens_to_check)} due for a probe")
     
-    if not dead_tokens:
+    if not tokens_to_check:
         print("No dead tokens to process")
         return
     
@@ -113,12 +122,12 @@ def process_dead_tokens():
     print("\nProcessing dead tokens (1 token per API call)...")
     print("-" * 60)
     
-    for i, token in enumerate(dead_tokens, 1):
+    for i, token in enumerate(tokens_to_check, 1):
         # Progress indicator every 10 tokens
         if i % 10 == 0:
             elapsed = (i * 2) / 60  # minutes elapsed
-            remaining = ((len(dead_tokens) - i) * 2) / 60  # minutes remaining
-            print(f"\nProgress: {i}/{len(dead_tokens)} tokens ({elapsed:.1f} min elapsed, ~{remaining:.1f} min remaining)")
+            remaining = ((len(tokens_to_check) - i) * 2) / 60  # minutes remaining
+            print(f"\nProgress: {i}/{len(tokens_to_check)} tokens ({elapsed:.1f} min elapsed, ~{remaining:.1f} min remaining)")
             print(f"  Revived: {revived_count}, Still dead: {still_dead_count}, Errors: {error_count}")
         
         ticker = token['ticker']
@@ -135,7 +144,7 @@ def process_dead_tokens():
             error_count += 1
             continue
         
-        if gecko_data['is_trading']:
+        if gecko_data['is_trading'] and dead_tokens.is_trading(gecko_data['liquidity_usd']):
             # Token is trading again! Revive it
             print(f"\n✅ REVIVED: {ticker} ({network})")
             print(f"   Price: ${gecko_data['current_price']:.8f}")
@@ -173,6 +182,7 @@ def process_dead_tokens():
             # Update database
             try:
                 supabase.table('crypto_calls').update(update_data).eq('id', token['id']).execute()
+                dead_tokens.record_alive([token['id']])
                 revived_count += 1
                 
                 if gecko_data['total_supply']:
@@ -186,7 +196,8 @@ def process_dead_tokens():
                 print(f"   ❌ Failed to update database: {e}")
                 error_count += 1
         else:
-            # Still dead
+            # Still dead - wait longer before the next probe
+            dead_tokens.record_miss(token['id'])
             still_dead_count += 1
             # Optionally show progress dots for dead tokens
             print(".", end="", flush=True)
@@ -195,7 +206,7 @@ def process_dead_tokens():
     print("\n\n" + "=" * 60)
     print("Processing Complete!")
     print("=" * 60)
-    print(f"Tokens checked: {len(dead_tokens)}")
+    print(f"Tokens checked: {len(tokens_to_check)}")
     print(f"Revived tokens: {revived_count} 🎉")
     print(f"Still dead: {still_dead_count}")
     print(f"Errors: {error_count}")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Shared rate limiter for GeckoTerminal / CoinGecko / DexScreener / GoPlus
+
+One token bucket per upstream host and API tier, stored in a local SQLite
+file so every thread of every script on this machine draws from the same
+quota. A 429 blocks the bucket for everyone until Retry-After (or an
+exponential backoff when the header is missing).
+
+Usage:
+
+    import rate_limiter
+    response = rate_limiter.get(url, headers=headers, timeout=10)
+
+or, around an existing client:
+
+    rate_limiter.acquire('dexscreener')
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Mapping, Optional
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DB_PATH = os.getenv(
+    "RATE_LIMIT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_limits.db")
+)
+
+# Requests per minute for each bucket
+LIMITS_PER_MINUTE = {
+    'geckoterminal:free': 30,
+    'coingecko:pro': 500,
+    'dexscreener': 300,
+    'dexscreener:profiles': 60,   # token-profiles / token-boosts / orders
+    'goplus': 30,
+}
+
+# Requests that may go out back to back. The refill rate is lowered by the
+# same amount, so burst + one minute of refill never exceeds the quota.
+BURST_SECONDS = 2
+
+MAX_BACKOFF_SECONDS = 120
+MAX_RETRIES = 3
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(RATE_LIMIT_DB_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0,
+                strikes INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def bucket_for(url: str, headers: Optional[dict] = None) -> Optional[str]:
+    """Bucket a request counts against, or None for hosts we don't limit"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    has_pro_key = bool(headers and headers.get('x-cg-pro-api-key'))
+
+    if host == 'pro-api.coingecko.com' or (host == 'api.geckoterminal.com' and has_pro_key):
+        return 'coingecko:pro'
+    if host == 'api.geckoterminal.com':
+        return 'geckoterminal:free'
+    if host == 'api.dexscreener.com':
+        if parsed.path.startswith(('/token-profiles', '/token-boosts', '/orders')):
+            return 'dexscreener:profiles'
+        return 'dexscreener'
+    if host == 'api.gopluslabs.io':
+        return 'goplus'
+    return None
+
+
+def reserve(bucket: str) -> float:
+    """Take a token from `bucket` and return how long to wait before sending.
+
+    The balance may go negative as a reservation, so each call is a single
+    short write transaction.
+    """
+    per_minute = LIMITS_PER_MINUTE[bucket]
+    capacity = max(1.0, per_minute * BURST_SECONDS / 60.0)
+    rate = (per_minute - capacity) / 60.0
+
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = conn.execute(
+            "SELECT tokens, updated_at, blocked_until FROM buckets WHERE name = ?", (bucket,)
+        ).fetchone()
+        tokens, updated_at, blocked_until = row if row else (capacity, now, 0.0)
+
+        # Refill from when the bucket unblocks, not from when it was drained
+        refill_from = max(updated_at, min(blocked_until, now))
+        tokens = min(capacity, tokens + max(0.0, now - refill_from) * rate) - 1
+        conn.execute("""
+            INSERT INTO buckets (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+        """, (bucket, tokens, now, blocked_until))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return max(blocked_until - now, 0.0) + (max(-tokens, 0.0) / rate)
+
+
+def acquire(bucket: str) -> None:
+    """Block until one request may be sent against `bucket`"""
+    wait = reserve(bucket)
+    if wait > 0:
+        time.sleep(wait)
+
+
+def report_throttled(bucket: str, retry_after: Optional[float] = None) -> float:
+    """Record a 429: block the bucket for every client and return the pause"""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = conn.execute(
+            "SELECT strikes, blocked_until FROM buckets WHERE name = ?", (bucket,)
+        ).fetchone()
+        strikes = (row[0] if row else 0) + 1
+        pause = retry_after if retry_after else min(MAX_BACKOFF_SECONDS, 2 ** strikes)
+        blocked_until = max(now + pause, row[1] if row else 0.0)
+        conn.execute("""
+            INSERT INTO buckets (name, tokens, updated_at, blocked_until, strikes) VALUES (?, 0, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                tokens = MIN(tokens, 0),
+                blocked_until = excluded.blocked_until,
+                strikes = excluded.strikes
+        """, (bucket, now, blocked_until, strikes))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    logger.warning(f"{bucket} rate limited, pausing {pause:.0f}s")
+    return pause
+
+
+def report_success(bucket: str) -> None:
+    """Reset the backoff after a request went through"""
+    conn = _connection()
+    conn.execute("UPDATE buckets SET strikes = 0 WHERE name = ? AND strikes > 0", (bucket,))
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds from a response's Retry-After header, None if absent or not a number.
+
+    `headers` is any header mapping (requests, httpx and aiohttp headers
+    are all case-insensitive).
+    """
+    value = headers.get('Retry-After')
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def request(method: str, url: str, session=None, max_retries: int = MAX_RETRIES, **kwargs):
+    """requests.request() under the shared limiter, retrying 429s.
+
+    Returns the last response; a 429 is only returned once retries are used up.
+    """
+    bucket = bucket_for(url, kwargs.get('headers'))
+    client = session or requests
+
+    for attempt in range(max_retries + 1):
+        if bucket:
+            acquire(bucket)
+        response = client.request(method, url, **kwargs)
+        if not bucket:
+            return response
+        if response.status_code != 429:
+            report_success(bucket)
+            return response
+        report_throttled(bucket, retry_after_seconds(response.headers))
+    return response
+
+
+def get(url: str, **kwargs):
+    return request('GET', url, **kwargs)
@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 import requests
 import json
-import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import concurrent.futures
 from threading import Lock
+from ohlcv_cache import get_ohlcv
+from ath_math import candle_array, batch_ath
+import rate_limiter
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +16,7 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 GECKO_API_KEY = os.getenv('GECKO_TERMINAL_API_KEY')
+CHUNK_SIZE = 300  # tokens per load -> batch_ath -> write round
 
 print("Fast ATH Recalculation Script")
 print("=" * 60)
@@ -38,103 +41,82 @@ stats = {
     'processed': 0
 }
 
-def process_token(token):
-    """Process a single token and return result"""
-    global stats
-    
-    ticker = token['ticker']
-    network = token['network']
-    pool_address = token['pool_address']
-    price_at_call = token['price_at_call']
-    current_ath = token.get('ath_price', 0)
-    current_ath_roi = token.get('ath_roi_percent', 0)
+class GeckoAPIError(Exception):
+    pass
+
+def download_ohlcv(network, pool_address, timeframe, limit, before_timestamp=None):
+    """Download raw OHLCV data from GeckoTerminal with API key"""
+    url = f"https://api.geckoterminal.com/api/v2/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}"
+    params = {"aggregate": 1, "limit": limit, "currency": "usd"}
+    if before_timestamp:
+        params["before_timestamp"] = before_timestamp
+    gecko_headers = {"x-cg-pro-api-key": GECKO_API_KEY} if GECKO_API_KEY else {}
     
-    # Map network names for GeckoTerminal
-    network_map = {
-        'ethereum': 'eth',
-        'solana': 'solana',
-        'bsc': 'bsc',
-        'polygon': 'polygon',
-        'arbitrum': 'arbitrum',
-        'base': 'base',
-        'avalanche': 'avalanche-c'
-    }
+    response = rate_limiter.get(url, params=params, headers=gecko_headers, timeout=10)
+    if response.status_code != 200:
+        raise GeckoAPIError(response.status_code)
     
-    gecko_network = network_map.get(network, network)
+    data = response.json()
+    return data.get("data", {}).get("attributes", {}).get("ohlcv_list", [])
+
+# Map network names for GeckoTerminal
+NETWORK_MAP = {
+    'ethereum': 'eth',
+    'solana': 'solana',
+    'bsc': 'bsc',
+    'polygon': 'polygon',
+    'arbitrum': 'arbitrum',
+    'base': 'base',
+    'avalanche': 'avalanche-c'
+}
+
+def call_unix_timestamp(token):
+    """Call time as a unix timestamp, 0 if unknown"""
+    call_timestamp = token.get('buy_timestamp') or token.get('created_at')
+    if not call_timestamp:
+        return 0
+    call_str = call_timestamp.replace("+00:00", "").split(".")[0]
+    call_dt = datetime.strptime(call_str, "%Y-%m-%dT%H:%M:%S")
+    return int(call_dt.timestamp())
+
+def load_candles(token):
+    """Daily candles through the local candle cache -> (candle array, call timestamp, error message)"""
+    gecko_network = NETWORK_MAP.get(token['network'], token['network'])
+    try:
+        ohlcv_list = get_ohlcv(gecko_network, token['pool_address'], 'day', 1000, None, download_ohlcv)
+        return candle_array(ohlcv_list), call_unix_timestamp(token), None
+    except GeckoAPIError as e:
+        return candle_array(None), 0, f"⚠️ {token['ticker']}: API error {e}"
+    except Exception as e:
+        return candle_array(None), 0, f"❌ {token['ticker']}: {str(e)[:50]}"
+
+def update_ath(token, ath_price, ath_roi, ath_timestamp):
+    """Write a token's new ATH and return the result line"""
+    ticker = token['ticker']
+    current_ath = token.get('ath_price') or 0
     
     try:
-        # Fetch OHLCV data from GeckoTerminal with API key
-        url = f"https://api.geckoterminal.com/api/v2/networks/{gecko_network}/pools/{pool_address}/ohlcv/day"
-        params = {"aggregate": 1, "limit": 1000, "currency": "usd"}
-        headers = {"x-cg-pro-api-key": GECKO_API_KEY} if GECKO_API_KEY else {}
+        update_url = f"{SUPABASE_URL}/rest/v1/crypto_calls?id=eq.{token['id']}"
+        update_data = {
+            "ath_price": ath_price,
+            "ath_roi_percent": ath_roi,  # Never negative
+            "ath_timestamp": datetime.fromtimestamp(ath_timestamp).isoformat() + "Z"
+        }
         
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code != 200:
-            with stats_lock:
-                stats['errors'] += 1
-            return f"  ⚠️ {ticker}: API error {response.status_code}"
-        
-        data = response.json()
-        ohlcv_list = data.get("data", {}).get("attributes", {}).get("ohlcv_list", [])
+        update_response = requests.patch(update_url, headers=headers, json=update_data)
         
-        if not ohlcv_list:
+        if update_response.status_code in [200, 204]:
             with stats_lock:
-                stats['skipped'] += 1
-            return f"  ⏭️ {ticker}: No OHLCV data"
-        
-        # Parse call timestamp
-        call_timestamp = token.get('buy_timestamp') or token.get('created_at')
-        if call_timestamp:
-            call_str = call_timestamp.replace("+00:00", "").split(".")[0]
-            call_dt = datetime.strptime(call_str, "%Y-%m-%dT%H:%M:%S")
-            call_unix = int(call_dt.timestamp())
-        else:
-            call_unix = 0
-        
-        # Find ATH after call
-        max_high = 0
-        max_timestamp = None
-        
-        for candle in ohlcv_list:
-            timestamp, open_price, high, low, close, volume = candle
-            
-            if timestamp >= call_unix and high > max_high:
-                max_high = high
-                max_timestamp = timestamp
-        
-        if max_high > 0 and max_high > current_ath * 1.01:  # 1% tolerance
-            calculated_roi = ((max_high - price_at_call) / price_at_call) * 100
-            
-            # Update the database
-            update_url = f"{SUPABASE_URL}/rest/v1/crypto_calls?id=eq.{token['id']}"
-            update_data = {
-                "ath_price": max_high,
-                "ath_roi_percent": max(0, calculated_roi),  # Never negative
-                "ath_timestamp": datetime.fromtimestamp(max_timestamp).isoformat() + "Z"
-            }
-            
-            update_response = requests.patch(update_url, headers=headers, json=update_data)
-            
-            if update_response.status_code in [200, 204]:
-                with stats_lock:
-                    stats['updated'] += 1
-                return f"  ✅ {ticker}: Updated ATH ${current_ath:.6f} → ${max_high:.6f} ({calculated_roi:.0f}% ROI)"
-            else:
-                with stats_lock:
-                    stats['errors'] += 1
-                return f"  ❌ {ticker}: Update failed"
+                stats['updated'] += 1
+            return f"  ✅ {ticker}: Updated ATH ${current_ath:.6f} → ${ath_price:.6f} ({ath_roi:.0f}% ROI)"
         else:
             with stats_lock:
-                stats['skipped'] += 1
-            return f"  ✓ {ticker}: ATH OK (${current_ath:.6f})"
-            
+                stats['errors'] += 1
+            return f"  ❌ {ticker}: Update failed"
     except Exception as e:
         with stats_lock:
             stats['errors'] += 1
         return f"  ❌ {ticker}: {str(e)[:50]}"
-    finally:
-        with stats_lock:
-            stats['processed'] += 1
 
 # Fetch all non-dead tokens with pool addresses
 print("Fetching tokens from database...")
@@ -163,38 +145,50 @@ while True:
 print(f"Found {len(all_tokens)} tokens to process")
 print("-" * 60)
 
-# Process tokens in parallel with rate limiting
+# Load candles in parallel; rate_limiter paces requests to the API tier
 if GECKO_API_KEY:
-    print("Processing tokens with PAID API (500 req/min rate limit)...")
-    batch_size = 80  # Process 80 at a time (500/min = ~8/sec, so 80 per 10 seconds)
-    delay_between_batches = 10  # 10 seconds between batches
+    print("Loading candles with PAID API (500 req/min rate limit)...")
 else:
-    print("Processing tokens with FREE API (30 req/min rate limit)...")
-    batch_size = 30
-    delay_between_batches = 60  # 60 seconds between batches
+    print("Loading candles with FREE API (30 req/min rate limit)...")
 
-results = []
-
-# Process in batches
-for i in range(0, len(all_tokens), batch_size):
-    batch = all_tokens[i:i+batch_size]
-    
-    # Process batch in parallel
+def process_chunk(tokens):
+    """Load candles, compute ATHs in one vectorized pass and write the updates for one chunk"""
     with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        batch_results = list(executor.map(process_token, batch))
+        loaded = list(executor.map(load_candles, tokens))
     
-    # Print results
-    for result in batch_results:
-        if "✅" in result or "⚠️" in result or "❌" in result:
-            print(result)
+    # ATH after the call for every token in the chunk
+    aths = batch_ath(
+        [candles for candles, _, _ in loaded],
+        [call_timestamp for _, call_timestamp, _ in loaded],
+        [float(token['price_at_call']) for token in tokens]
+    )
     
-    # Progress update
-    if stats['processed'] % 100 == 0 or stats['processed'] == len(all_tokens):
-        print(f"\n📊 Progress: {stats['processed']}/{len(all_tokens)} | Updated: {stats['updated']} | Skipped: {stats['skipped']} | Errors: {stats['errors']}\n")
+    to_update = []
+    for i, (token, (candles, _, error)) in enumerate(zip(tokens, loaded)):
+        stats['processed'] += 1
+        current_ath = token.get('ath_price') or 0
+        ath_price = float(aths['ath_price'][i])
+        
+        if error:
+            stats['errors'] += 1
+            print(f"  {error}")
+        elif not len(candles):
+            stats['skipped'] += 1  # No OHLCV data
+        elif ath_price > 0 and ath_price > current_ath * 1.01:  # 1% tolerance
+            to_update.append((token, ath_price, float(aths['ath_roi_percent'][i]), int(aths['ath_timestamp'][i])))
+        else:
+            stats['skipped'] += 1  # ATH OK
     
-    # Rate limiting based on API tier
-    if i + batch_size < len(all_tokens):
-        time.sleep(delay_between_batches)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+        for result in executor.map(lambda update: update_ath(*update), to_update):
+            print(result)
+    return len(to_update)
+
+# Chunks keep memory bounded, and each chunk's updates land before the next one loads
+for start in range(0, len(all_tokens), CHUNK_SIZE):
+    chunk = all_tokens[start:start + CHUNK_SIZE]
+    updates = process_chunk(chunk)
+    print(f"📥 Processed {start + len(chunk)}/{len(all_tokens)} tokens ({updates} ATH updates in this chunk)")
 
 print("\n" + "=" * 60)
 print("FINAL SUMMARY")
@@ -1,9 +1,13 @@
 import os
 from supabase import create_client
 from dotenv import load_dotenv
-import requests
+import rate_limiter
+from bulk_writer import BulkWriter
+from pool_index import pool_prices
+import refresh_scheduler
+import dead_tokens
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 import threading
 from queue import Queue
 import sys
@@ -12,6 +16,9 @@ load_dotenv()
 url = os.environ.get('SUPABASE_URL')
 key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
 
+# Tokens fetched per run; the scheduler hands out the most overdue first
+TOKENS_PER_RUN = 3000
+
 # Global counters (thread-safe)
 stats_lock = threading.Lock()
 stats = {
@@ -21,14 +28,22 @@ stats = {
     'updated_via_gecko': 0,
     'start_time': time.time()
 }
+revived_ids = []  # dead tokens seen trading again, revived in one update at the end
 
 def create_supabase_client():
     """Create a new Supabase client for each thread"""
     return create_client(url, key)
 
+def write_prices(rows):
+    """One bulk_update_prices RPC for all buffered rows (add_bulk_update_functions.sql)"""
+    # Flushes never overlap, so this client is only used by one thread at a time
+    writer_client.rpc('bulk_update_prices', {'updates': rows}).execute()
+
+writer_client = create_supabase_client()
+price_writer = BulkWriter(write_prices)
+
 def process_batch(batch_tokens, worker_id):
     """Process a batch of tokens"""
-    supabase = create_supabase_client()
     local_updated = 0
     local_failed = 0
     local_dex = 0
@@ -42,15 +57,18 @@ def process_batch(batch_tokens, worker_id):
     # Prepare addresses for DexScreener
     addresses = ','.join([t['contract_address'] for t in batch_tokens])
     
-    # Track which tokens were found
+    # Track which tokens were found; a token only counts as having no price
+    # if every source asked actually answered
     found_in_dexscreener = set()
+    dexscreener_answered = False
     
     # Try DexScreener batch API
     try:
-        response = requests.get(f"https://api.dexscreener.com/latest/dex/tokens/{addresses}")
+        response = rate_limiter.get(f"https://api.dexscreener.com/latest/dex/tokens/{addresses}")
         
         if response.status_code == 200:
             data = response.json()
+            dexscreener_answered = True
             
             # Process DexScreener results
             if data.get('pairs'):
@@ -61,8 +79,9 @@ def process_batch(batch_tokens, worker_id):
                         token = tokens_by_address[contract]
                         new_price = float(pair['priceUsd'])
                         
-                        # Update database
+                        # Queue database update
                         update_data = {
+                            'krom_id': token['krom_id'],
                             'current_price': new_price,
                             'price_updated_at': datetime.utcnow().isoformat()
                         }
@@ -71,11 +90,15 @@ def process_batch(batch_tokens, worker_id):
                             roi = ((new_price - token['price_at_call']) / token['price_at_call']) * 100
                             update_data['roi_percent'] = roi
                         
-                        result = supabase.table('crypto_calls').update(update_data).eq('krom_id', token['krom_id']).execute()
-                        
-                        if result.data:
-                            local_updated += 1
-                            local_dex += 1
+                        price_writer.add(update_data)
+                        liquidity = (pair.get('liquidity') or {}).get('usd')
+                        tier = refresh_scheduler.record(token['token_id'], new_price, liquidity,
+                                                        (pair.get('volume') or {}).get('h24'))
+                        if token['is_dead'] and tier != 'dead':
+                            with stats_lock:
+                                revived_ids.append(token['token_id'])
+                        local_updated += 1
+                        local_dex += 1
     except Exception as e:
         print(f"[Worker {worker_id}] DexScreener error: {str(e)[:50]}")
     
@@ -85,61 +108,51 @@ def process_batch(batch_tokens, worker_id):
         if address not in found_in_dexscreener:
             missing_tokens.append(token)
     
-    # Process missing tokens with GeckoTerminal
+    # Price missing tokens from their cached best GeckoTerminal pool
+    missing_by_network = {}
     for token in missing_tokens:
         if token['network']:
             network_map = {'ethereum': 'eth', 'solana': 'solana', 'bsc': 'bsc', 'polygon': 'polygon', 'arbitrum': 'arbitrum', 'base': 'base'}
             api_network = network_map.get(token['network'], token['network'])
-            
-            # Rate limit for GeckoTerminal
-            time.sleep(0.3)
-            
-            try:
-                gecko_response = requests.get(
-                    f"https://api.geckoterminal.com/api/v2/networks/{api_network}/tokens/{token['contract_address']}/pools"
-                )
-                
-                if gecko_response.status_code == 200:
-                    gecko_data = gecko_response.json()
-                    pools = gecko_data.get('data', [])
-                    
-                    if pools:
-                        # Sort by liquidity (FIXED logic)
-                        sorted_pools = sorted(pools, key=lambda p: float(p['attributes'].get('reserve_in_usd', 0)), reverse=True)
-                        best_pool = sorted_pools[0]
-                        best_price = float(best_pool['attributes'].get('token_price_usd', 0))
-                        
-                        if best_price > 0:
-                            # Update database
-                            update_data = {
-                                'current_price': best_price,
-                                'price_updated_at': datetime.utcnow().isoformat()
-                            }
-                            
-                            if token['price_at_call'] and token['price_at_call'] > 0:
-                                roi = ((best_price - token['price_at_call']) / token['price_at_call']) * 100
-                                update_data['roi_percent'] = roi
-                            
-                            result = supabase.table('crypto_calls').update(update_data).eq('krom_id', token['krom_id']).execute()
-                            
-                            if result.data:
-                                local_updated += 1
-                                local_gecko += 1
-                        else:
-                            local_failed += 1
-                    else:
-                        local_failed += 1
-                elif gecko_response.status_code == 429:
-                    print(f"[Worker {worker_id}] GeckoTerminal rate limit - waiting...")
-                    time.sleep(30)  # Wait on rate limit
-                    local_failed += 1
-                else:
-                    local_failed += 1
-            except Exception as e:
-                local_failed += 1
+            missing_by_network.setdefault(api_network, []).append(token)
         else:
+            refresh_scheduler.record(token['token_id'], failed=not dexscreener_answered)
             local_failed += 1
     
+    for api_network, network_tokens in missing_by_network.items():
+        lookup_failed = set()
+        try:
+            prices = pool_prices(api_network, [t['contract_address'] for t in network_tokens], failed=lookup_failed)
+        except Exception as e:
+            print(f"[Worker {worker_id}] GeckoTerminal error: {str(e)[:50]}")
+            prices = {}
+            lookup_failed.update(t['contract_address'] for t in network_tokens)
+        
+        for token in network_tokens:
+            best_price = prices.get(token['contract_address'])
+            if not best_price:
+                # A failed request is rescheduled, not counted as a dead-token miss
+                refresh_scheduler.record(token['token_id'], failed=not dexscreener_answered
+                                         or token['contract_address'] in lookup_failed)
+                local_failed += 1
+                continue
+            
+            # Queue database update
+            update_data = {
+                'krom_id': token['krom_id'],
+                'current_price': best_price,
+                'price_updated_at': datetime.utcnow().isoformat()
+            }
+            
+            if token['price_at_call'] and token['price_at_call'] > 0:
+                roi = ((best_price - token['price_at_call']) / token['price_at_call']) * 100
+                update_data['roi_percent'] = roi
+            
+            price_writer.add(update_data)
+            refresh_scheduler.record(token['token_id'], best_price)
+            local_updated += 1
+            local_gecko += 1
+    
     # Update global stats
     with stats_lock:
         stats['updated'] += local_updated
@@ -171,11 +184,16 @@ def main():
     # Get initial Supabase client for queries
     supabase = create_supabase_client()
     
-    # Get count of tokens to update
-    count_result = supabase.table('crypto_calls').select('id', count='exact').not_.is_('current_price', 'null').not_.is_('contract_address', 'null').lt('price_updated_at', datetime.utcnow() - timedelta(hours=2)).execute()
-    total_to_update = count_result.count
+    # Pick up new tokens and fresh volume/liquidity/is_dead, then take the due ones
+    if refresh_scheduler.sync_from_supabase(supabase):
+        print("Refresh schedule synced from crypto_calls")
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else TOKENS_PER_RUN
+    due_tokens = refresh_scheduler.due(budget)
     
-    print(f"Found {total_to_update} tokens needing updates")
+    for tier, counts in refresh_scheduler.tier_counts().items():
+        print(f"  {tier:>6}: {counts['tokens']} tokens, {counts['due']} still due "
+              f"(every {refresh_scheduler.TIER_INTERVALS[tier] // 60} min)")
+    print(f"Found {len(due_tokens)} tokens due for a refresh (budget {budget})")
     print(f"Using {NUM_WORKERS} parallel workers")
     print("Processing in batches of 30...\n")
     
@@ -192,16 +210,8 @@ def main():
     offset = 0
     batch_count = 0
     
-    while offset < total_to_update:
-        # Get next batch
-        tokens = supabase.table('crypto_calls').select(
-            'krom_id, ticker, contract_address, network, price_at_call'
-        ).not_.is_('current_price', 'null').not_.is_('contract_address', 'null').order('price_updated_at', desc=False).range(offset, offset + 29).execute()
-        
-        if not tokens.data:
-            break
-        
-        queue.put(tokens.data)
+    while offset < len(due_tokens):
+        queue.put(due_tokens[offset:offset + 30])
         batch_count += 1
         offset += 30
         
@@ -226,6 +236,15 @@ def main():
     for t in threads:
         t.join()
     
+    price_writer.close()
+    
+    if revived_ids:
+        try:
+            dead_tokens.revive(supabase, revived_ids)
+            print(f"Revived {len(revived_ids)} dead tokens trading again")
+        except Exception as e:
+            print(f"Failed to revive dead tokens: {e}")
+    
     # Final summary
     elapsed_total = time.time() - stats['start_time']
     print(f"\n\n=== FINAL SUMMARY ===")
@@ -236,6 +255,8 @@ def main():
     print(f"  - Via DexScreener: {stats['updated_via_dex']}")
     print(f"  - Via GeckoTerminal: {stats['updated_via_gecko']}")
     print(f"Failed/Dead tokens: {stats['failed']}")
+    if price_writer.failed:
+        print(f"Database writes failed: {price_writer.failed}")
     print(f"Success rate: {stats['updated']/(stats['updated']+stats['failed'])*100:.1f}%" if stats['updated']+stats['failed'] > 0 else "N/A")
     print(f"Average rate: {stats['updated']/elapsed_total*60:.1f} tokens/minute")
 
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Tiered refresh scheduler for current prices
+
+Every token gets a refresh interval from how alive it is: 24h volume,
+liquidity, how much its price has been moving between refreshes, how old
+the call is, and is_dead. The price fetchers ask for due tokens instead of
+walking the whole table, so the API budget goes to the tokens that are
+moving while quiet and dead ones are still refreshed within their tier's
+interval.
+
+Tiers (max staleness): hot 2m, active 10m, warm 1h, cold 6h, dead 24h.
+
+Due tokens are handed out most-overdue-relative-to-their-interval first,
+so when the budget is short every tier falls behind in proportion rather
+than cold tokens starving. Dead tokens that still show no liquidity are
+pushed further out with dead_tokens' exponential backoff; one seen with
+liquidity again leaves the dead tier straight away.
+
+Usage in a price fetcher:
+
+    import refresh_scheduler
+    refresh_scheduler.sync_from_supabase(supabase)     # at most every SYNC_SECONDS
+    for token in refresh_scheduler.due(limit=3000):
+        ...
+        refresh_scheduler.record(token['token_id'], price, liquidity_usd, volume_24h)
+"""
+
+import os
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import dead_tokens
+
+SCHEDULE_DB_PATH = os.getenv(
+    "REFRESH_SCHEDULE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "refresh_schedule.db")
+)
+
+TIER_INTERVALS = {
+    'hot': 120,
+    'active': 600,
+    'warm': 3600,
+    'cold': 6 * 3600,
+    'dead': 24 * 3600,
+}
+
+HOT_VOLUME_USD = 100_000
+ACTIVE_VOLUME_USD = 10_000
+MIN_LIQUIDITY_USD = 5_000        # below this volume is mostly noise
+HOT_VOLATILITY = 0.05            # mean |log return| between refreshes
+ACTIVE_VOLATILITY = 0.02
+HOT_CALL_AGE_SECONDS = 6 * 3600
+ACTIVE_CALL_AGE_SECONDS = 3 * 86400
+
+VOLATILITY_SMOOTHING = 0.3       # weight of the newest move in the average
+LEASE_SECONDS = 300              # a handed-out token is due again after this if not recorded
+SYNC_SECONDS = 15 * 60           # how often token metadata is re-read from crypto_calls
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_schedule (
+    token_id TEXT PRIMARY KEY,
+    krom_id TEXT,
+    contract_address TEXT,
+    network TEXT,
+    price_at_call REAL,
+    called_at REAL,
+    is_dead INTEGER NOT NULL DEFAULT 0,
+    volume_24h REAL,
+    liquidity_usd REAL,
+    last_price REAL,
+    volatility REAL NOT NULL DEFAULT 0,
+    tier TEXT NOT NULL,
+    interval_seconds INTEGER NOT NULL,
+    refreshed_at REAL,
+    next_due_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_token_schedule_due ON token_schedule(next_due_at);
+
+CREATE TABLE IF NOT EXISTS schedule_meta (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(SCHEDULE_DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _unix(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def assign_tier(is_dead: bool, volume_24h: Optional[float], liquidity_usd: Optional[float],
+                volatility: float, call_age_seconds: Optional[float]) -> str:
+    """Tier for a token from its liveness signals"""
+    if is_dead:
+        return 'dead'
+    volume = volume_24h or 0
+    liquidity = liquidity_usd or 0
+    age = call_age_seconds if call_age_seconds is not None else math.inf
+
+    if (volume >= HOT_VOLUME_USD and liquidity >= MIN_LIQUIDITY_USD) \
+            or volatility >= HOT_VOLATILITY or age < HOT_CALL_AGE_SECONDS:
+        return 'hot'
+    if (volume >= ACTIVE_VOLUME_USD and liquidity >= MIN_LIQUIDITY_USD) \
+            or volatility >= ACTIVE_VOLATILITY or age < ACTIVE_CALL_AGE_SECONDS:
+        return 'active'
+    if liquidity >= MIN_LIQUIDITY_USD or volume > 0:
+        return 'warm'
+    return 'cold'
+
+
+def _tier_for_row(row: Dict[str, Any], now: float) -> str:
+    age = now - row['called_at'] if row.get('called_at') else None
+    return assign_tier(bool(row.get('is_dead')), row.get('volume_24h'), row.get('liquidity_usd'),
+                       row.get('volatility') or 0, age)
+
+
+def sync(tokens: List[Dict[str, Any]]) -> None:
+    """Add or update tokens from crypto_calls rows and re-tier them.
+
+    Rows need id, krom_id, contract_address, network, price_at_call,
+    created_at, is_dead, volume_24h, liquidity_usd, current_price and
+    price_updated_at. A token moved to a faster tier becomes due sooner.
+    """
+    now = time.time()
+    conn = _connection()
+    with conn:
+        for token in tokens:
+            token_id = str(token['id'])
+            old = conn.execute("SELECT * FROM token_schedule WHERE token_id = ?", (token_id,)).fetchone()
+            row = dict(old) if old else {'volatility': 0, 'last_price': token.get('current_price')}
+            row.update({
+                'token_id': token_id,
+                'krom_id': token.get('krom_id'),
+                'contract_address': token.get('contract_address'),
+                'network': token.get('network'),
+                'price_at_call': token.get('price_at_call'),
+                'called_at': _unix(token.get('buy_timestamp') or token.get('created_at')),
+                'is_dead': int(bool(token.get('is_dead'))),
+                'volume_24h': token.get('volume_24h'),
+                'liquidity_usd': token.get('liquidity_usd'),
+            })
+            if not old:
+                row['refreshed_at'] = _unix(token.get('price_updated_at'))
+
+            row['tier'] = _tier_for_row(row, now)
+            row['interval_seconds'] = TIER_INTERVALS[row['tier']]
+            due_by_tier = (row.get('refreshed_at') or 0) + row['interval_seconds']
+            row['next_due_at'] = min(row['next_due_at'], due_by_tier) if old else due_by_tier
+
+            conn.execute("""
+                INSERT OR REPLACE INTO token_schedule
+                    (token_id, krom_id, contract_address, network, price_at_call, called_at, is_dead,
+                     volume_24h, liquidity_usd, last_price, volatility, tier, interval_seconds,
+                     refreshed_at, next_due_at)
+                VALUES (:token_id, :krom_id, :contract_address, :network, :price_at_call, :called_at, :is_dead,
+                        :volume_24h, :liquidity_usd, :last_price, :volatility, :tier, :interval_seconds,
+                        :refreshed_at, :next_due_at)
+            """, row)
+
+
+def sync_from_supabase(supabase, force: bool = False, page_size: int = 1000) -> bool:
+    """Re-read token metadata from crypto_calls if the last sync is older than SYNC_SECONDS"""
+    conn = _connection()
+    last = conn.execute("SELECT value FROM schedule_meta WHERE name = 'synced_at'").fetchone()
+    if not force and last and time.time() - last['value'] < SYNC_SECONDS:
+        return False
+
+    after_id = None
+    while True:
+        query = supabase.table('crypto_calls').select(
+            'id, krom_id, contract_address, network, price_at_call, buy_timestamp, created_at, is_dead, '
+            'volume_24h, liquidity_usd, current_price, price_updated_at'
+        ).not_.is_('contract_address', 'null').not_.is_('current_price', 'null')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        tokens = query.order('id').limit(page_size).execute().data
+        if not tokens:
+            break
+        sync(tokens)
+        after_id = tokens[-1]['id']
+
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO schedule_meta (name, value) VALUES ('synced_at', ?)", (time.time(),))
+    return True
+
+
+def due(limit: int) -> List[Dict[str, Any]]:
+    """Up to `limit` due tokens, most overdue relative to their interval first.
+
+    Handed-out tokens are leased for LEASE_SECONDS so overlapping runs
+    don't fetch them twice; record() sets their real next due time.
+    """
+    now = time.time()
+    conn = _connection()
+    with conn:
+        rows = conn.execute("""
+            SELECT * FROM token_schedule
+            WHERE next_due_at <= ?
+            ORDER BY (? - next_due_at) / interval_seconds DESC
+            LIMIT ?
+        """, (now, now, limit)).fetchall()
+        conn.executemany("UPDATE token_schedule SET next_due_at = ? WHERE token_id = ?",
+                         [(now + min(LEASE_SECONDS, row['interval_seconds']), row['token_id']) for row in rows])
+    return [dict(row) for row in rows]
+
+
+def record(token_id: Any, price: Optional[float] = None, liquidity_usd: Optional[float] = None,
+           volume_24h: Optional[float] = None, failed: bool = False) -> Optional[str]:
+    """Record a refresh attempt (price None if none was found) and reschedule.
+
+    failed=True means the lookup itself errored (rate limit, outage): the
+    token is just due again after its interval, without counting as a
+    dead-token miss or touching its price history.
+
+    Returns the token's new tier; a dead token whose liquidity is back
+    comes out of the 'dead' tier (the caller clears is_dead, see
+    dead_tokens.revive).
+    """
+    now = time.time()
+    conn = _connection()
+    with conn:
+        old = conn.execute("SELECT * FROM token_schedule WHERE token_id = ?", (str(token_id),)).fetchone()
+        if not old:
+            return None
+        row = dict(old)
+
+        if failed:
+            conn.execute("UPDATE token_schedule SET next_due_at = ? WHERE token_id = ?",
+                         (now + row['interval_seconds'], row['token_id']))
+            return row['tier']
+
+        if price and price > 0:
+            if row['last_price'] and row['last_price'] > 0:
+                move = abs(math.log(price / row['last_price']))
+                row['volatility'] = VOLATILITY_SMOOTHING * move + (1 - VOLATILITY_SMOOTHING) * row['volatility']
+            row['last_price'] = price
+        if liquidity_usd is not None:
+            row['liquidity_usd'] = liquidity_usd
+        if volume_24h is not None:
+            row['volume_24h'] = volume_24h
+        if row['is_dead'] and dead_tokens.is_trading(liquidity_usd):
+            row['is_dead'] = 0
+
+        row['tier'] = _tier_for_row(row, now)
+        row['interval_seconds'] = TIER_INTERVALS[row['tier']]
+        next_due_at = now + row['interval_seconds']
+        if row['tier'] == 'dead':
+            next_due_at = max(next_due_at, dead_tokens.record_miss(row['token_id']))
+        conn.execute("""
+            UPDATE token_schedule SET
+                last_price = ?, volatility = ?, liquidity_usd = ?, volume_24h = ?, is_dead = ?,
+                tier = ?, interval_seconds = ?, refreshed_at = ?, next_due_at = ?
+            WHERE token_id = ?
+        """, (row['last_price'], row['volatility'], row['liquidity_usd'], row['volume_24h'], row['is_dead'],
+              row['tier'], row['interval_seconds'], now, next_due_at, row['token_id']))
+    return row['tier']
+
+
+def tier_counts() -> Dict[str, Dict[str, int]]:
+    """Tokens and currently due tokens per tier"""
+    now = time.time()
+    counts = {tier: {'tokens': 0, 'due': 0} for tier in TIER_INTERVALS}
+    for row in _connection().execute("""
+        SELECT tier, COUNT(*) AS tokens, SUM(next_due_at <= ?) AS due FROM token_schedule GROUP BY tier
+    """, (now,)):
+        counts[row['tier']] = {'tokens': row['tokens'], 'due': row['due'] or 0}
+    return counts
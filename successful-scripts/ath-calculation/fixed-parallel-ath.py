@@ -7,6 +7,10 @@ import os
 from multiprocessing import Pool, current_process
 import sys
 
+# Shared candle cache lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from ohlcv_cache import get_ohlcv
+
 # Flush output immediately
 sys.stdout = sys.__stdout__
 sys.stderr = sys.__stderr__
@@ -32,8 +36,8 @@ def run_query(query):
     except:
         return []
 
-def fetch_ohlcv(network, pool, timeframe, limit=1000, before_timestamp=None):
-    """Fetch OHLCV data"""
+def download_ohlcv(network, pool, timeframe, limit=1000, before_timestamp=None):
+    """Download raw OHLCV data; None if the API call failed"""
     url = f"{API_BASE}/networks/{network}/pools/{pool}/ohlcv/{timeframe}"
     params = {'aggregate': 1, 'limit': limit}
     if before_timestamp:
@@ -42,12 +46,16 @@ def fetch_ohlcv(network, pool, timeframe, limit=1000, before_timestamp=None):
     try:
         response = requests.get(url, params=params, headers=HEADERS, timeout=30)
         if response.status_code != 200:
-            return []
+            return None
         
         data = response.json()
         return data.get('data', {}).get('attributes', {}).get('ohlcv_list', [])
     except:
-        return []
+        return None
+
+def fetch_ohlcv(network, pool, timeframe, limit=1000, before_timestamp=None):
+    """Fetch OHLCV data through the local candle cache"""
+    return get_ohlcv(network, pool, timeframe, limit, before_timestamp, download_ohlcv) or []
 
 def process_single_token(token_data):
     """Process one token with fixed ATH logic"""
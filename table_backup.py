@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Streaming, incremental table backups
+
+Pages through a table by primary key (keyset pagination, so page cost
+doesn't grow with the offset) and writes each page to disk as it
+arrives, so memory stays at one page whatever the table size:
+
+- 'ndjson': one gzip-compressed JSON object per line (<name>.ndjson.gz)
+- 'parquet': a directory of part files, one per page (needs pyarrow);
+  nested values are stored as JSON strings
+
+Each backup is appended to manifest.json in the backup directory. A full
+snapshot is taken when there is none yet or the last one is older than
+FULL_BACKUP_DAYS; otherwise only rows whose updated_at changed since the
+previous backup started are exported (see add_crypto_calls_updated_at.sql),
+with OVERLAP_SECONDS of slack for transactions still in flight. Restore
+the latest full snapshot, then apply the later incrementals in order.
+Deleted rows only disappear with the next full snapshot.
+
+Files are written under a .partial name and only renamed and recorded in
+the manifest once the last page is in, so a failed run never looks like a
+complete backup.
+
+Usage:
+
+    from table_backup import backup
+    entry = backup('crypto_calls', fetch_page, 'database-backups')
+
+where fetch_page(after_key, limit, changed_since) returns up to `limit`
+rows with key > after_key (all rows when None) ordered by key, restricted
+to updated_at >= changed_since (an ISO timestamp) when that is not None,
+and raises on errors. The first argument names the backup set (usually
+the table); full and incremental backups are chained per name.
+"""
+
+import os
+import gzip
+import json
+import shutil
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+BACKUP_DIR = "database-backups"
+MANIFEST_NAME = "manifest.json"
+PAGE_SIZE = 1000
+FULL_BACKUP_DAYS = 7      # start a new full snapshot after this long
+OVERLAP_SECONDS = 300     # incrementals re-read this much before the last start
+
+
+def load_manifest(backup_dir: str = BACKUP_DIR) -> Dict[str, Any]:
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'backups': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(backup_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class NdjsonWriter:
+    suffix = '.ndjson.gz'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._file.write(json.dumps(row, default=str) + '\n')
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """One part file per page, all cast to a common schema on close.
+
+    A column that is entirely null in an early page only gets its type
+    from a later one, so parts written before that are rewritten (one at a
+    time) with the unified schema.
+    """
+    suffix = '.parquet'
+
+    def __init__(self, path: str):
+        if pa is None:
+            raise RuntimeError("Parquet backups need pyarrow (pip install pyarrow)")
+        self.path = path
+        self._schema = None
+        self._part_schemas = []
+        os.makedirs(path)
+
+    def _part(self, index: int) -> str:
+        return os.path.join(self.path, f"part-{index:05d}.parquet")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        flat = [{name: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                 for name, value in row.items()} for row in rows]
+        table = pa.Table.from_pylist(flat)
+        self._schema = table.schema if self._schema is None else \
+            pa.unify_schemas([self._schema, table.schema], promote_options='permissive')
+        pq.write_table(table, self._part(len(self._part_schemas)), compression='zstd')
+        self._part_schemas.append(table.schema)
+
+    def close(self) -> None:
+        for index, schema in enumerate(self._part_schemas):
+            if schema.equals(self._schema):
+                continue
+            table = pq.read_table(self._part(index))
+            columns = [table[field.name].cast(field.type) if field.name in table.column_names
+                       else pa.nulls(table.num_rows, field.type) for field in self._schema]
+            pq.write_table(pa.Table.from_arrays(columns, schema=self._schema), self._part(index),
+                           compression='zstd')
+            self._part_schemas[index] = self._schema
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'parquet': ParquetWriter}
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def backup(name: str, fetch_page: Callable[[Any, int, Optional[str]], List[Dict[str, Any]]],
+           backup_dir: str = BACKUP_DIR, fmt: str = 'ndjson', full: Optional[bool] = None,
+           key: str = 'id', page_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Stream the rows from `fetch_page` to a new backup file and record it in the manifest.
+
+    full=None picks a full snapshot or an incremental as described above;
+    full=False still takes a full snapshot when `name` has none to build
+    on. Returns the manifest entry.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+    previous = [entry for entry in manifest['backups'] if entry['name'] == name]
+    fulls = [entry for entry in previous if entry['kind'] == 'full']
+
+    started_at = datetime.now(timezone.utc)
+    if not fulls:
+        full = True
+    elif full is None:
+        full = started_at - datetime.fromisoformat(fulls[-1]['started_at']) \
+            > timedelta(days=FULL_BACKUP_DAYS)
+    changed_since = None
+    if not full:
+        changed_since = (datetime.fromisoformat(previous[-1]['started_at'])
+                         - timedelta(seconds=OVERLAP_SECONDS)).isoformat()
+
+    kind = 'full' if full else 'incremental'
+    writer_class = WRITERS[fmt]
+    file_name = f"{name}_{kind}_{started_at.strftime('%Y%m%d_%H%M%S')}{writer_class.suffix}"
+    path = os.path.join(backup_dir, file_name)
+    partial = path + '.partial'
+    _remove(partial)
+
+    print(f"{kind.capitalize()} backup of {name} to {path}"
+          + (f" (rows changed since {changed_since})" if changed_since else ""))
+
+    writer = writer_class(partial)
+    records = 0
+    after_key = None
+    try:
+        while True:
+            rows = fetch_page(after_key, page_size, changed_since)
+            if not rows:
+                break
+            writer.write(rows)
+            records += len(rows)
+            after_key = rows[-1][key]
+            print(f"  {records} records written")
+            if len(rows) < page_size:
+                break
+        writer.close()
+    except BaseException:
+        writer.close()
+        _remove(partial)
+        raise
+    os.replace(partial, path)
+
+    entry = {
+        'name': name,
+        'kind': kind,
+        'format': fmt,
+        'file': file_name,
+        'records': records,
+        'bytes': _size(path),
+        'started_at': started_at.isoformat(),
+        'finished_at': datetime.now(timezone.utc).isoformat(),
+        'changed_since': changed_since,
+        'base': None if full else fulls[-1]['file'],
+    }
+    manifest['backups'].append(entry)
+    _save_manifest(backup_dir, manifest)
+    return entry
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Single-pass token enrichment from DexScreener
+
+refresh-prices-parallel.py, batch-fetch-socials.py, the market cap updaters
+and the liquidity checks each downloaded the same
+/latest/dex/tokens/{addresses} payload for the same contracts. This
+fetches every 30-address batch once and fans the most liquid pair of each
+token out into all the columns those scripts maintain:
+
+    current_price, roi_percent, price_updated_at
+    liquidity_usd, volume_24h
+    total_supply, circulating_supply, current_market_cap, supply_updated_at
+    website_url, twitter_url, telegram_url, discord_url, socials_fetched_at
+
+Tokens DexScreener doesn't know are priced from their cached GeckoTerminal
+pool (pool_index). Each page of tokens is written with one
+bulk_enrich_tokens RPC (add_bulk_update_functions.sql).
+
+Run it directly for a full refresh; every run goes over all tokens, an
+interrupted run resumes from its checkpoint (see batch_runner.py), and
+--restart starts from the first token regardless:
+
+    python3 token_enrichment.py
+"""
+
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from async_fetch import fetch_json_many
+from batch_runner import BatchRunner, ItemFailed
+from pool_index import pool_prices
+
+DEXSCREENER_TOKENS_URL = "https://api.dexscreener.com/latest/dex/tokens/"
+BATCH_SIZE = 30           # addresses per DexScreener request
+BATCHES_PER_PAGE = 10     # requests in flight per page (one DB write per page)
+
+NETWORK_MAP = {
+    'ethereum': 'eth',
+    'solana': 'solana',
+    'bsc': 'bsc',
+    'polygon': 'polygon',
+    'arbitrum': 'arbitrum',
+    'base': 'base'
+}
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def best_pairs(data: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Most liquid pair per base token address (lowercased) of a tokens response"""
+    pairs = {}
+    for pair in (data or {}).get('pairs') or []:
+        address = (pair.get('baseToken') or {}).get('address', '').lower()
+        if not address:
+            continue
+        liquidity = _number((pair.get('liquidity') or {}).get('usd')) or 0
+        if address not in pairs or liquidity > (_number((pairs[address].get('liquidity') or {}).get('usd')) or 0):
+            pairs[address] = pair
+    return pairs
+
+
+def parse_socials(pair: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """First website/twitter/telegram/discord link of a pair"""
+    info = pair.get('info') or {}
+    links = {'website': None, 'twitter': None, 'telegram': None, 'discord': None}
+    for social in info.get('socials') or []:
+        social_type = social.get('type', '')
+        if social_type in links and not links[social_type]:
+            links[social_type] = social.get('url')
+
+    # Also check for direct website in info
+    websites = info.get('websites')
+    if not links['website'] and isinstance(websites, list) and websites:
+        links['website'] = websites[0].get('url') if isinstance(websites[0], dict) else websites[0]
+
+    return {f'{name}_url': url for name, url in links.items()}
+
+
+def enrichment_row(token: Dict[str, Any], pair: Optional[Dict[str, Any]], now: str) -> Dict[str, Any]:
+    """crypto_calls update for one token from its best pair; None values keep the old column"""
+    row = {'id': token['id'], 'socials_fetched_at': now}
+    if not pair:
+        return row
+
+    price = _number(pair.get('priceUsd'))
+    if price and price > 0:
+        row['current_price'] = price
+        row['price_updated_at'] = now
+        price_at_call = _number(token.get('price_at_call'))
+        if price_at_call and price_at_call > 0:
+            row['roi_percent'] = (price - price_at_call) / price_at_call * 100
+
+        fdv = _number(pair.get('fdv'))
+        market_cap = _number(pair.get('marketCap'))
+        if fdv:
+            row['total_supply'] = fdv / price
+            row['supply_updated_at'] = now
+        if market_cap:
+            row['circulating_supply'] = market_cap / price
+            row['current_market_cap'] = market_cap
+            row['supply_updated_at'] = now
+
+    row['liquidity_usd'] = _number((pair.get('liquidity') or {}).get('usd'))
+    row['volume_24h'] = _number((pair.get('volume') or {}).get('h24'))
+    row.update(parse_socials(pair))
+    return row
+
+
+def enrich_page(tokens: List[Dict[str, Any]], write) -> List[tuple]:
+    """Enrich a page of tokens with one DexScreener call per 30 and one write.
+
+    Returns (token, error) for tokens that could not be enriched.
+    """
+    batches = [tokens[i:i + BATCH_SIZE] for i in range(0, len(tokens), BATCH_SIZE)]
+    payloads = fetch_json_many([
+        DEXSCREENER_TOKENS_URL + ','.join(t['contract_address'] for t in batch) for batch in batches
+    ])
+
+    now = datetime.utcnow().isoformat()
+    rows, failed, unpriced = [], [], []
+    for batch, payload in zip(batches, payloads):
+        if payload is None:
+            failed.extend((token, ItemFailed("DexScreener request failed")) for token in batch)
+            continue
+        pairs = best_pairs(payload)
+        for token in batch:
+            row = enrichment_row(token, pairs.get(token['contract_address'].lower()), now)
+            rows.append(row)
+            if 'current_price' not in row and token.get('network'):
+                unpriced.append((token, row))
+
+    # Price tokens missing on DexScreener from their best GeckoTerminal pool
+    by_network: Dict[str, list] = {}
+    for token, row in unpriced:
+        by_network.setdefault(NETWORK_MAP.get(token['network'], token['network']), []).append((token, row))
+    for network, entries in by_network.items():
+        try:
+            prices = pool_prices(network, [token['contract_address'] for token, _ in entries])
+        except Exception as e:
+            print(f"GeckoTerminal error: {str(e)[:50]}")
+            prices = {}
+        for token, row in entries:
+            price = prices.get(token['contract_address'])
+            if price:
+                row['current_price'] = price
+                row['price_updated_at'] = now
+                price_at_call = _number(token.get('price_at_call'))
+                if price_at_call and price_at_call > 0:
+                    row['roi_percent'] = (price - price_at_call) / price_at_call * 100
+
+    if rows:
+        try:
+            write(rows)
+        except Exception as e:
+            written = {row['id'] for row in rows}
+            return failed + [(token, e) for token in tokens if token['id'] in written]
+
+    priced = sum(1 for row in rows if 'current_price' in row)
+    print(f"  {len(rows)} tokens enriched ({priced} priced), {len(failed)} failed")
+    return failed
+
+
+def main():
+    from supabase import create_client
+
+    load_dotenv()
+    supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY'))
+
+    def fetch_tokens(after_id, limit):
+        query = supabase.table('crypto_calls').select(
+            'id, ticker, contract_address, network, price_at_call'
+        ).neq('is_dead', True).not_.is_('contract_address', 'null')
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data
+
+    def write(rows):
+        supabase.rpc('bulk_enrich_tokens', {'updates': rows}).execute()
+
+    print("=== TOKEN ENRICHMENT (price, supply, liquidity, volume, socials) ===")
+    print(f"Starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    runner = BatchRunner('token-enrichment', fetch_tokens, lambda tokens: enrich_page(tokens, write),
+                         page_size=BATCH_SIZE * BATCHES_PER_PAGE, restart='--restart' in sys.argv,
+                         recurring=True)
+    runner.run()
+
+
+if __name__ == "__main__":
+    main()
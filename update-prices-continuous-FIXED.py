@@ -9,6 +9,7 @@ import requests
 import time
 from datetime import datetime, timezone
 from dotenv import load_dotenv
+from pool_index import pool_prices
 
 load_dotenv()
 
@@ -61,32 +62,12 @@ def fetch_price_dexscreener(contract_address):
     return None, None
 
 def fetch_price_geckoterminal(contract_address, network):
-    """Try to fetch price from GeckoTerminal pools"""
+    """Try to fetch price from the token's most liquid GeckoTerminal pool (cached by pool_index)"""
     try:
         api_network = NETWORK_MAP.get(network, network)
-        resp = requests.get(f"https://api.geckoterminal.com/api/v2/networks/{api_network}/tokens/{contract_address}/pools")
-        
-        if resp.status_code == 429:
-            print(f"   ⏳ GeckoTerminal rate limited, waiting 10s...")
-            time.sleep(10)
-            return None, None
-        
-        if resp.status_code == 200:
-            data = resp.json()
-            pools = data.get('data', [])
-            
-            if pools:
-                # Find the pool with highest price
-                best_price = 0
-                for pool in pools:
-                    pool_price_str = pool['attributes'].get('token_price_usd')
-                    if pool_price_str:
-                        pool_price = float(pool_price_str)
-                        if pool_price > best_price:
-                            best_price = pool_price
-                
-                if best_price > 0:
-                    return best_price, "GeckoTerminal"
+        price = pool_prices(api_network, [contract_address]).get(contract_address)
+        if price:
+            return price, "GeckoTerminal"
     except Exception as e:
         pass
     
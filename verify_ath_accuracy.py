@@ -2,9 +2,11 @@ import requests
 from datetime import datetime, timedelta
 import time
 import sys
+from ohlcv_cache import get_ohlcv
+from ath_math import TS, OPEN, HIGH, CLOSE, candle_array, peak, body_high, roi_percent
 
-def get_ohlcv_data(network, pool_address, timeframe, limit=1000, before_timestamp=None):
-    """Fetch OHLCV data from GeckoTerminal"""
+def download_ohlcv_data(network, pool_address, timeframe, limit, before_timestamp=None):
+    """Download OHLCV data from GeckoTerminal; None if the API call failed"""
     url = f"https://api.geckoterminal.com/api/v2/networks/{network}/pools/{pool_address}/ohlcv/{timeframe}"
     params = {'aggregate': 1, 'limit': limit}
     if before_timestamp:
@@ -15,83 +17,51 @@ def get_ohlcv_data(network, pool_address, timeframe, limit=1000, before_timestam
         data = response.json()
         if 'data' in data and 'attributes' in data['data']:
             return data['data']['attributes']['ohlcv_list']
-        return []
+        return None
     except Exception as e:
         print(f"Error fetching {timeframe} data: {e}")
-        return []
+        return None
+
+def get_ohlcv_data(network, pool_address, timeframe, limit=1000, before_timestamp=None):
+    """Fetch OHLCV data through the local candle cache"""
+    return get_ohlcv(network, pool_address, timeframe, limit, before_timestamp, download_ohlcv_data) or []
 
 def find_ath_3tier(network, pool_address, call_timestamp, ticker):
     """3-tier approach: daily -> hourly -> minute"""
     
     # TIER 1: Daily candles
-    daily_candles = get_ohlcv_data(network, pool_address, 'day', limit=1000)
-    
-    if not daily_candles:
-        return None
+    daily_candles = candle_array(get_ohlcv_data(network, pool_address, 'day', limit=1000))
     
     # Find highest daily candle after call
-    daily_highs = []
-    for candle in daily_candles:
-        if candle[0] >= call_timestamp and candle[2]:
-            daily_highs.append({
-                'timestamp': candle[0],
-                'high': float(candle[2])
-            })
-    
-    if not daily_highs:
+    daily_ath = peak(daily_candles, since=call_timestamp)
+    if daily_ath is None:
         return None
     
-    daily_highs.sort(key=lambda x: x['high'], reverse=True)
-    daily_ath = daily_highs[0]
+    # TIER 2: Hourly candles around ATH day (±1 day)
+    before_ts = int(daily_ath[TS]) + (3 * 24 * 3600)  # 3 days after
+    hourly_candles = candle_array(get_ohlcv_data(network, pool_address, 'hour', limit=168, before_timestamp=before_ts))
     
-    # TIER 2: Hourly candles around ATH day
-    before_ts = daily_ath['timestamp'] + (3 * 24 * 3600)  # 3 days after
-    hourly_candles = get_ohlcv_data(network, pool_address, 'hour', limit=168, before_timestamp=before_ts)
-    
-    hourly_highs = []
-    for candle in hourly_candles:
-        # Only look at candles around the ATH day (±1 day)
-        if abs(candle[0] - daily_ath['timestamp']) <= 86400 and candle[2]:
-            hourly_highs.append({
-                'timestamp': candle[0],
-                'high': float(candle[2])
-            })
-    
-    if not hourly_highs:
+    hourly_ath = peak(hourly_candles, around=daily_ath[TS], window=86400)
+    if hourly_ath is None:
         return None
-        
-    hourly_highs.sort(key=lambda x: x['high'], reverse=True)
-    hourly_ath = hourly_highs[0]
-    
-    # TIER 3: Minute candles around ATH hour
-    before_ts = hourly_ath['timestamp'] + (2 * 3600)  # 2 hours after
-    minute_candles = get_ohlcv_data(network, pool_address, 'minute', limit=240, before_timestamp=before_ts)
     
-    minute_data = []
-    for candle in minute_candles:
-        # Only look at candles around the ATH hour (±1 hour)
-        if abs(candle[0] - hourly_ath['timestamp']) <= 3600 and candle[1] and candle[2] and candle[4]:
-            minute_data.append({
-                'timestamp': candle[0],
-                'open': float(candle[1]),
-                'high': float(candle[2]),
-                'close': float(candle[4])
-            })
+    # TIER 3: Minute candles around ATH hour (±1 hour)
+    before_ts = int(hourly_ath[TS]) + (2 * 3600)  # 2 hours after
+    minute_candles = candle_array(get_ohlcv_data(network, pool_address, 'minute', limit=240, before_timestamp=before_ts))
     
-    if not minute_data:
-        return None
-        
     # Find the minute with highest high
-    minute_data.sort(key=lambda x: x['high'], reverse=True)
-    minute_ath = minute_data[0]
+    minute_ath = peak(minute_candles, around=hourly_ath[TS], window=3600, positive=(OPEN, HIGH, CLOSE))
+    if minute_ath is None:
+        return None
     
     # ATH price is max(open, close) from that minute
-    ath_price = max(minute_ath['open'], minute_ath['close'])
+    ath_price = body_high(minute_ath)
+    ath_timestamp = int(minute_ath[TS])
     
     return {
         'ath_price': ath_price,
-        'ath_timestamp': minute_ath['timestamp'],
-        'ath_datetime': datetime.fromtimestamp(minute_ath['timestamp']).strftime('%Y-%m-%d %H:%M')
+        'ath_timestamp': ath_timestamp,
+        'ath_datetime': datetime.fromtimestamp(ath_timestamp).strftime('%Y-%m-%d %H:%M')
     }
 
 # Verification test cases from database
@@ -170,7 +140,7 @@ for i, token in enumerate(test_tokens):
     
     if manual_result:
         # Calculate manual ROI
-        manual_roi = max(0, ((manual_result['ath_price'] - token['price_at_call']) / token['price_at_call']) * 100)
+        manual_roi = roi_percent(manual_result['ath_price'], token['price_at_call'])
         
         # Compare with database values
         price_diff_pct = abs(manual_result['ath_price'] - token['db_ath_price']) / token['db_ath_price'] * 100